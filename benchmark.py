@@ -0,0 +1,460 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:47:19 2026
+
+@author: danie
+"""
+
+'''
+    Benchmarks for every stage of the project, run offline against a
+    fixture corpus: the game summary pages in fixtures/pages and
+    raw_data.csv.
+
+    The parse benchmark (--pages or --cache) reads the corpus of pages either
+    from a directory containing one saved page per file, named by game ID
+    (fixtures/pages if --pages is given without a directory), or from the
+    page cache written by dataframe_builder.py. The pages in fixtures/pages
+    are written by fixtures/make_pages.py: copied from a page cache where it
+    holds them, else rendered from the games' rows of raw_data.csv. Each page is
+    parsed with every available BeautifulSoup parser, both as a whole page
+    and keeping only the page regions read by the Game class, and the
+    per-page parse time is reported. The first row (html.parser, whole page)
+    is how pages were parsed before the parser became configurable.
+
+    The stage benchmark (--stages) times, on raw_data.csv:
+        load - reading the data file into a GameStore and building every Game
+        features - assembling the feature matrix of every game
+        fit - building the headline index (knn_model.train), given the games
+        model_load - opening the saved index in a new program
+        query_single - generate_headlines for one game at a time
+        query_features - the scaled feature vector of one game, written by
+                         the compiled feature schema into a preallocated row
+        query_search - the nearest neighbour search for one scaled vector
+        query_batch - generate_headlines for batches of games (per game)
+        find_replace - compiling and rendering a headline template
+        render - rendering an already compiled template
+    With --scale the same stages are also run on synthetic datasets 10 or 100
+    times the size of raw_data.csv, made of copies of its games with jittered
+    scores, to expose costs that grow faster than the data.
+
+    The startup benchmark (--startup) times short runs of
+    nba_headline_generator.py in fresh Python processes: printing the help,
+    importing the module, generating headlines for a few stored game
+    records, and the default single game run (-id), with the game's page
+    read offline from a page cache holding a page of the fixture corpus.
+    For each run it reports the wall-clock time, the modules that took
+    longest to import (from python -X importtime), and which of the heavy
+    libraries (NumPy, pandas, BeautifulSoup, urllib3, SciKit-Learn) were
+    imported.
+
+    Times are reported as latency percentiles (in milliseconds) and
+    throughput (per second).  With -o the results are saved as JSON, along
+    with the git commit, Python version and machine they were measured on
+    and the page corpus parsed, and --compare prints the change of each
+    result against an earlier JSON file. The earlier file is the baseline:
+    the same benchmarks run with -o at the commit before the change, on the
+    same machine and corpus. --compare warns when the baseline was measured
+    on another machine, Python version or page corpus.
+
+    Usage:
+        benchmark.py --stages [--scale 1 10 100] [-o results.json]
+        benchmark.py --pages [<directory of saved pages>]
+        benchmark.py --cache <page cache directory>
+        benchmark.py --startup
+        benchmark.py --stages --compare old_results.json
+'''
+
+import argparse
+import copy
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import games as g
+import page_cache
+
+
+#the project directory, where the programs timed by the startup benchmark are
+project_dir = os.path.dirname(os.path.abspath(__file__))
+
+#libraries that short runs should only import if they need them
+heavy_modules = ['numpy', 'pandas', 'bs4', 'lxml', 'urllib3', 'sklearn']
+
+#target wall-clock time of a short run, in milliseconds
+startup_target_ms = 100
+
+#the fixture corpus of saved game summary pages (see fixtures/make_pages.py)
+fixture_pages_dir = os.path.join(project_dir, 'fixtures', 'pages')
+
+
+def load_corpus(pages_dir = None, cache_dir = None):
+    '''
+        returns a list of (game_id, html) pairs of saved game summary pages
+    '''
+    corpus = []
+    if pages_dir is not None:
+        for file_name in sorted(os.listdir(pages_dir)):
+            if file_name.strip().isdigit():
+                with open(os.path.join(pages_dir, file_name), 'rb') as page_file:
+                    corpus.append((int(file_name), page_file.read()))
+    if cache_dir is not None:
+        cache = page_cache.PageCache(cache_dir, offline = True)
+        index_dir = os.path.join(cache_dir, 'index')
+        for file_name in sorted(os.listdir(index_dir)):
+            with open(os.path.join(index_dir, file_name), 'r') as index_file:
+                url = json.load(index_file)['url']
+            #only game summary pages, not schedule pages
+            if url.startswith(g.game_summary_root):
+                corpus.append((int(url[len(g.game_summary_root):]), cache.get(url)))
+    return corpus
+
+
+def available_parsers():
+    parsers = ['html.parser']
+    try:
+        import lxml
+        parsers.append('lxml')
+    except ImportError:
+        pass
+    return parsers
+
+
+def summarize(times):
+    #latency percentiles, in milliseconds, and throughput of a list of times
+    #in seconds
+    times = sorted(times)
+    if not times:
+        return {'n' : 0}
+
+    def percentile(q):
+        return 1000 * times[min(len(times) - 1, int(q * len(times)))]
+
+    return {'n' : len(times),
+            'mean_ms' : 1000 * sum(times) / len(times),
+            'p50_ms' : percentile(0.50),
+            'p95_ms' : percentile(0.95),
+            'p99_ms' : percentile(0.99),
+            'per_second' : len(times) / sum(times) if sum(times) > 0 else float('inf')}
+
+
+def time_parse(corpus, parser, regions):
+    '''
+        time parsing every page of the corpus with the given parser, keeping
+        only the given page regions (None for the whole page). Pages that fail
+        to parse are not timed.
+    '''
+    saved_regions = g.page_regions
+    g.page_regions = regions
+    times = []
+    try:
+        for game_id, html in corpus:
+            start = time.perf_counter()
+            try:
+                g.Game.from_html(game_id, html, parser)
+            except Exception:
+                continue
+            times.append(time.perf_counter() - start)
+    finally:
+        g.page_regions = saved_regions
+    return times
+
+
+def parse_benchmark(corpus):
+    results = {}
+    for parser in available_parsers():
+        for label, regions in [('whole page', None), ('regions only', g.page_regions)]:
+            results[parser + ', ' + label] = summarize(time_parse(corpus, parser, regions))
+    return results
+
+
+def time_calls(fcn, items):
+    #the time, in seconds, of calling fcn on each item
+    times = []
+    for item in items:
+        start = time.perf_counter()
+        fcn(item)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def synthetic_records(records, factor, seed = 0):
+    '''
+        a dataset 'factor' times the size of 'records' (game records as
+        written by dataframe_builder.py). Copy i of each game gets the game ID
+        i * 10**9 + game ID; the quarterly scores and points leaders' points
+        of the copies are jittered, with the totals and the winner kept
+        consistent. The first copy is the original data.
+    '''
+    rng = random.Random(seed)
+    synthetic = []
+    for i in range(factor):
+        for record in records:
+            record = copy.deepcopy(record)
+            record['game_id'] = i * 10**9 + record['game_id']
+            if i > 0:
+                for side in ['home', 'away']:
+                    scores = record['scores'][side]
+                    for q in range(1, len(scores)):
+                        scores[q] = max(0, scores[q] + rng.randint(-3, 3))
+                    scores[0] = sum(scores[1:])
+                    record['pts'][side]['pts'] = max(0, record['pts'][side]['pts'] + rng.randint(-3, 3))
+                if record['scores']['home'][0] == record['scores']['away'][0]:
+                    record['scores']['home'][-1] += 1
+                    record['scores']['home'][0] += 1
+                record['winner'] = 'home' if record['scores']['home'][0] > record['scores']['away'][0] else 'away'
+            synthetic.append(record)
+    return synthetic
+
+
+def stage_benchmark(csv_path, work_dir, n_queries = 200, batch_size = 64, repeat = 3):
+    '''
+        time each stage of training and generating headlines on the data file
+        at csv_path. The index is built in work_dir.
+    '''
+    import game_store
+    import features as f
+    import knn_model
+    import templates
+    import nba_headline_generator as nhg
+
+    results = {}
+    results['load'] = summarize(time_calls(lambda _: game_store.GameStore(csv_path).games(), range(repeat)))
+
+    store = game_store.load_store(csv_path)
+    games = store.games()
+    results['load']['games'] = len(games)
+    results['features'] = summarize(time_calls(lambda _: f.assemble_feature_matrix(games), range(repeat)))
+
+    index_path = os.path.join(work_dir, 'index')
+    results['fit'] = summarize(time_calls(lambda _: knn_model.train(csv_path, index_path, cache_path = None), range(1)))
+
+    def load_model(_):
+        nhg._models.pop(index_path, None)
+        nhg._finders.pop(index_path, None)
+        nhg.load_model(index_path).templates()
+    results['model_load'] = summarize(time_calls(load_model, range(repeat)))
+
+    rng = random.Random(0)
+    sample = [games[rng.randrange(len(games))] for _ in range(n_queries)]
+    nhg.generate_headlines(sample[:1], index_path, csv_path)
+    results['query_single'] = summarize(time_calls(lambda game: nhg.generate_headlines([game], index_path, csv_path), sample))
+
+    #the two steps of the single game query path
+    finder = nhg.load_finder(index_path)
+    results['query_features'] = summarize(time_calls(finder._query_row, sample))
+    rows = [finder._query_row(game)[0].copy() for game in sample]
+    results['query_search'] = summarize(time_calls(finder.index.kneighbors_one, rows))
+
+    batches = [[games[rng.randrange(len(games))] for _ in range(batch_size)] for _ in range(max(1, n_queries // batch_size))]
+    batch_times = time_calls(lambda batch: nhg.generate_headlines(batch, index_path, csv_path), batches)
+    results['query_batch'] = summarize([batch_time / batch_size for batch_time in batch_times])
+    results['query_batch']['batch_size'] = batch_size
+
+    pairs = [(sample[i], sample[-1 - i]) for i in range(len(sample))]
+    results['find_replace'] = summarize(time_calls(lambda pair: nhg.find_replace(*pair), pairs))
+    compiled = [(templates.compile_template(historical), new) for historical, new in pairs]
+    results['render'] = summarize(time_calls(lambda pair: templates.render(*pair), compiled))
+
+    #let go of the shared store and model of this dataset
+    game_store._stores.pop(csv_path, None)
+    nhg._models.pop(index_path, None)
+    nhg._finders.pop(index_path, None)
+    return results
+
+
+def scaled_stage_benchmark(factors, csv_path = None, **kwargs):
+    '''
+        run the stage benchmark on raw_data.csv (factor 1) and on synthetic
+        datasets 'factor' times its size
+    '''
+    import game_store
+    import dataframe_builder
+
+    if csv_path is None:
+        csv_path = os.path.join(project_dir, dataframe_builder.raw_data_file_path)
+    records = [dataframe_builder.game_record(game) for game in game_store.GameStore(csv_path).games()]
+
+    results = {}
+    for factor in factors:
+        work_dir = tempfile.mkdtemp(prefix = 'benchmark_')
+        try:
+            if factor == 1:
+                path = csv_path
+            else:
+                path = os.path.join(work_dir, 'raw_data_x' + str(factor) + '.csv')
+                dataframe_builder.coalesce(synthetic_records(records, factor)).to_csv(path)
+            results[str(factor) + 'x'] = stage_benchmark(path, work_dir, **kwargs)
+        finally:
+            shutil.rmtree(work_dir)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd = project_dir, check = True,
+                              stdout = subprocess.PIPE, stderr = subprocess.DEVNULL, text = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, old_results, prefix = ''):
+    #print the change in the median time of every benchmark found in both
+    #sets of results
+    for name, stats in results.items():
+        old_stats = old_results.get(name)
+        if not isinstance(stats, dict) or not isinstance(old_stats, dict):
+            continue
+        if 'p50_ms' in stats and old_stats.get('p50_ms'):
+            print('   {0:<40} {1:10.3f} ms -> {2:10.3f} ms   x{3:.2f}'.format(prefix + name, old_stats['p50_ms'], stats['p50_ms'],
+                                                                        stats['p50_ms'] / old_stats['p50_ms']))
+        else:
+            compare(stats, old_stats, prefix + name + ' / ')
+
+
+def time_command(args, repeat = 5):
+    #wall-clock times, in seconds, of running python with the given arguments
+    #in a fresh process
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd = project_dir, check = True,
+                       stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def import_times(args):
+    '''
+        run python -X importtime with the given arguments. Returns a list of
+        (cumulative milliseconds, module) pairs for the modules imported 
+        directly by the program, slowest first, and the set of all imported
+        modules.
+    '''
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd = project_dir, check = True,
+                            stdout = subprocess.DEVNULL, stderr = subprocess.PIPE, text = True)
+    top_level = []
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.add(name.strip())
+        #nested imports are indented further
+        if len(name) - len(name.lstrip()) == 1:
+            top_level.append((int(cumulative) / 1000, name.strip()))
+    return sorted(top_level, reverse = True), modules
+
+
+def startup_commands(records_path, game_id, cache_dir):
+    return {'help' : ['nba_headline_generator.py', '-h'],
+            'import' : ['-c', 'import nba_headline_generator'],
+            'records' : ['nba_headline_generator.py', '-r', records_path],
+            'id' : ['nba_headline_generator.py', '-id', str(game_id), '-t', '--cache', cache_dir, '--offline']}
+
+
+def startup_benchmark(repeat = 5, n_records = 5, pages_dir = fixture_pages_dir):
+    '''
+        time short runs of nba_headline_generator.py. The 'records' run 
+        generates headlines for the first n_records games of raw_data.csv.
+        The 'id' run is the default single game run (-id, with -t), with the
+        game's page served offline from a page cache holding the first page
+        of pages_dir.
+    '''
+    import game_store
+    import dataframe_builder
+
+    games = game_store.load_store(os.path.join(project_dir, dataframe_builder.raw_data_file_path)).games()[:n_records]
+    with tempfile.NamedTemporaryFile('w', suffix = '.jsonl', delete = False) as records_file:
+        for game in games:
+            records_file.write(json.dumps(dataframe_builder.game_record(game)) + '\n')
+
+    cache_dir = tempfile.mkdtemp(prefix = 'benchmark_cache_')
+    game_id, html = load_corpus(pages_dir)[0]
+    page_cache.PageCache(cache_dir).put(g.game_summary_root + str(game_id), html, final = True)
+
+    results = {}
+    try:
+        for name, args in startup_commands(records_file.name, game_id, cache_dir).items():
+            top_level, modules = import_times(args)
+            stats = summarize(time_command(args, repeat))
+            stats['slowest_imports'] = [[module, ms] for ms, module in top_level[:5]]
+            stats['heavy_modules'] = [module for module in heavy_modules if module in modules]
+            results[name] = stats
+    finally:
+        os.remove(records_file.name)
+        shutil.rmtree(cache_dir)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--stages', action='store_true',
+                        help='time loading, feature assembly, fitting, queries and headline rendering on raw_data.csv')
+
+    parser.add_argument('--scale', type=int, nargs='+', default=[1],
+                        help='with --stages, also run on synthetic datasets this many times the size of raw_data.csv, e.g. --scale 1 10 100')
+
+    parser.add_argument('--pages', nargs='?', const=fixture_pages_dir,
+                        help='directory of saved game summary pages, one file per page named by game ID (default: fixtures/pages)')
+
+    parser.add_argument('--cache',
+                        help='page cache directory written by dataframe_builder.py')
+
+    parser.add_argument('--startup', action='store_true',
+                        help='time short runs of nba_headline_generator.py in fresh processes')
+
+    parser.add_argument('-o', '--output',
+                        help='save the results to this JSON file')
+
+    parser.add_argument('--compare',
+                        help='JSON file of earlier results to compare with')
+
+    args = parser.parse_args()
+
+    results = {'commit' : git_commit(),
+               'time' : time.strftime('%Y-%m-%d %H:%M:%S'),
+               'python' : platform.python_version(),
+               'machine' : platform.machine()}
+
+    if args.pages or args.cache:
+        corpus = load_corpus(args.pages, args.cache)
+        results['corpus'] = {'pages' : args.pages, 'cache' : args.cache, 'n' : len(corpus)}
+        results['parse'] = parse_benchmark(corpus)
+        print('\n Parsing ' + str(len(corpus)) + ' saved game pages\n')
+        for name, stats in results['parse'].items():
+            if stats['n']:
+                print('   {0:<28} {1:8.2f} ms/page   p95 {2:8.2f} ms'.format(name, stats['mean_ms'], stats['p95_ms']))
+
+    if args.stages:
+        results['stages'] = scaled_stage_benchmark(args.scale)
+        for scale, stages in results['stages'].items():
+            print('\n Stages, ' + scale + ' (' + str(stages['load']['games']) + ' games)\n')
+            for name, stats in stages.items():
+                print('   {0:<14} p50 {1:10.3f} ms   p99 {2:10.3f} ms   {3:12.1f} /s'.format(name, stats['p50_ms'], stats['p99_ms'], stats['per_second']))
+
+    if args.startup:
+        results['startup'] = startup_benchmark()
+        print('\n Startup of nba_headline_generator.py (target ' + str(startup_target_ms) + ' ms)\n')
+        for name, stats in results['startup'].items():
+            print('   {0:<10} {1:8.1f} ms   heavy imports: {2}'.format(name, stats['p50_ms'], ', '.join(stats['heavy_modules']) or 'none'))
+            for module, ms in stats['slowest_imports']:
+                print('       {0:<28} {1:8.1f} ms'.format(module, ms))
+
+    if args.compare:
+        with open(args.compare, 'r') as old_file:
+            old_results = json.load(old_file)
+        print('\n Compared with ' + args.compare + ' (commit ' + str(old_results.get('commit')) + ')\n')
+        for key in ['python', 'machine', 'corpus']:
+            if key in old_results and key in results and old_results[key] != results[key]:
+                print('   warning: the baseline was measured with ' + key + ' ' + json.dumps(old_results[key])
+                      + ', not ' + json.dumps(results[key]))
+        compare(results, old_results)
+
+    if args.output:
+        with open(args.output, 'w') as results_file:
+            json.dump(results, results_file, indent = 1)
@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 11:15:40 2026
+
+@author: danie
+"""
+
+'''
+    A typed, columnar on-disk format for raw game data, as an alternative to
+    the .csv file written by dataframe_builder.py.
+
+    The .csv file stores the nested 'names', 'scores', 'pts', 'reb' and 'ast'
+    dictionaries of each Game as Python repr strings, which have to be decoded
+    with ast.literal_eval every time the file is loaded.  Here every piece of
+    data gets its own flat column instead:
+
+        - integer data (scores, leader stats, series standings) is stored in
+          fixed-width integer columns.  The quarterly scores of each team are
+          stored as a 2D column with one row per game: the total score at
+          index 0 and quarterly scores at the following indices, padded with
+          -1 for quarters that were not played.
+        - text (headlines, team names, leader names, ...) is stored as int32
+          codes into a single string table.  The string table is one UTF-8
+          byte blob plus an array of offsets into it.
+        - field goals and free throws such as '7/14' are stored as two integer
+          columns, made and attempted.
+
+    A table is a directory containing one NumPy .npy file per column, the
+    string table, and a 'schema.json' file describing the columns.  Columns
+    are memory-mapped when the table is opened, so opening a table costs
+    almost nothing and only the pages that are read are loaded.
+
+    Functions:
+        export_table(games, out_dir) - write a list of Game objects as a table
+        convert_csv(csv_path, out_dir) - one-time conversion of a .csv file
+            written by dataframe_builder.py
+
+    Classes:
+        ColumnarTable(path, mmap = True) - an opened table.  Provides .ids(),
+            .row(game_id), .game(game_id) and .column(name)
+        GameView(table, i) - a Game backed by row i of a table.  Attributes
+            are decoded from the columns when they are accessed.
+
+    Run as a script to convert a .csv file:
+        python columnar.py [csv path] [output directory]
+'''
+
+import json
+import os
+import sys
+import numpy as np
+import games as g
+
+format_version = 1
+columnar_data_path = 'raw_data_columns'
+
+sides = ['away', 'home']
+team_fields = ['team', 'city', 'abbr']
+#for each leader category, the stats stored for the leader. 'fg' and 'ft' are
+#strings like '7/14' and are split into made and attempted columns.
+leader_fields = {'pts' : ['pts', 'fg', 'ft'],
+                 'reb' : ['reb', 'dreb', 'oreb'],
+                 'ast' : ['ast', 'to', 'min']}
+split_fields = ['fg', 'ft']
+
+
+'''
+    the flattened schema.  Each entry maps a column name to its dtype, with
+    'str' marking a column of codes into the string table.
+'''
+
+def _schema():
+    columns = {'game_id' : 'int64',
+               'headline' : 'str',
+               'round' : 'str',
+               'winner' : 'str',
+               'quarters' : 'int8',
+               'n_game' : 'int8',
+               'home_wins' : 'int8',
+               'away_wins' : 'int8'}
+    for side in sides:
+        for field in team_fields:
+            columns[side + '_' + field] = 'str'
+        columns[side + '_scores'] = 'int16'
+        for category in leader_fields:
+            columns[side + '_' + category + '_leader'] = 'str'
+            for field in leader_fields[category]:
+                if field in split_fields:
+                    columns[side + '_' + category + '_' + field + '_made'] = 'int16'
+                    columns[side + '_' + category + '_' + field + '_att'] = 'int16'
+                else:
+                    columns[side + '_' + category + '_' + field] = 'int16'
+    return columns
+
+schema = _schema()
+
+
+'''
+    exporting
+'''
+
+def _flatten(game):
+    #flatten a Game into a dictionary of column values
+    row = {'game_id' : int(game.game_id),
+           'headline' : game.headline,
+           'round' : game.round,
+           'winner' : game.winner,
+           'quarters' : int(game.quarters),
+           'n_game' : int(game.n_game),
+           'home_wins' : int(game.home_wins),
+           'away_wins' : int(game.away_wins)}
+    for side in sides:
+        for field in team_fields:
+            row[side + '_' + field] = game.names[side][field]
+        row[side + '_scores'] = [int(score) for score in game.scores[side]]
+        for category in leader_fields:
+            stats = getattr(game, category)[side]
+            row[side + '_' + category + '_leader'] = stats['leader']
+            for field in leader_fields[category]:
+                if field in split_fields:
+                    made, att = stats[field].split('/')
+                    row[side + '_' + category + '_' + field + '_made'] = int(made)
+                    row[side + '_' + category + '_' + field + '_att'] = int(att)
+                else:
+                    row[side + '_' + category + '_' + field] = int(stats[field])
+    return row
+
+
+def export_table(games, out_dir):
+    '''
+        write a list of Game objects to out_dir as a columnar table. Every
+        Game must have its game_id attribute set.
+    '''
+    rows = [_flatten(game) for game in games]
+    n_rows = len(rows)
+    width = max([len(row['home_scores']) for row in rows] + [1])
+
+    #build the string table, storing each distinct string once
+    string_codes = {}
+    string_list = []
+
+    def encode(text):
+        code = string_codes.get(text)
+        if code is None:
+            code = len(string_list)
+            string_codes[text] = code
+            string_list.append(text)
+        return code
+
+    os.makedirs(out_dir, exist_ok = True)
+
+    for name, dtype in schema.items():
+        if name.endswith('_scores'):
+            column = np.full((n_rows, width), -1, dtype = dtype)
+            for i, row in enumerate(rows):
+                column[i, :len(row[name])] = row[name]
+        elif dtype == 'str':
+            column = np.array([encode(row[name]) for row in rows], dtype = 'int32')
+        else:
+            column = np.array([row[name] for row in rows], dtype = dtype)
+        np.save(os.path.join(out_dir, name + '.npy'), column)
+
+    encoded = [text.encode('utf-8') for text in string_list]
+    offsets = np.zeros(len(encoded) + 1, dtype = 'int64')
+    offsets[1:] = np.cumsum([len(text) for text in encoded])
+    blob = np.frombuffer(b''.join(encoded), dtype = 'uint8')
+    np.save(os.path.join(out_dir, 'strings.npy'), blob)
+    np.save(os.path.join(out_dir, 'string_offsets.npy'), offsets)
+
+    with open(os.path.join(out_dir, 'schema.json'), 'w') as schema_file:
+        json.dump({'version' : format_version,
+                   'n_rows' : n_rows,
+                   'score_width' : width,
+                   'columns' : schema}, schema_file, indent = 1)
+
+
+def convert_csv(csv_path, out_dir):
+    '''
+        one-time conversion of a .csv file written by dataframe_builder.py to
+        a columnar table
+    '''
+    import game_store
+    store = game_store.GameStore(csv_path)
+    export_table(store.games(), out_dir)
+
+
+'''
+    importing
+'''
+
+class ColumnarTable:
+
+    def __init__(self, path, mmap = True):
+        self.path = path
+        with open(os.path.join(path, 'schema.json'), 'r') as schema_file:
+            self.schema = json.load(schema_file)
+        if self.schema['version'] != format_version:
+            raise ValueError('unsupported columnar format version ' + str(self.schema['version']) + ' in ' + path)
+
+        mmap_mode = 'r' if mmap else None
+        self._columns = {}
+        for name in self.schema['columns']:
+            self._columns[name] = np.load(os.path.join(path, name + '.npy'), mmap_mode = mmap_mode)
+        self._blob = np.load(os.path.join(path, 'strings.npy'), mmap_mode = mmap_mode)
+        self._offsets = np.load(os.path.join(path, 'string_offsets.npy'))
+
+        #strings are decoded from the blob the first time they are used
+        self._strings = [None] * (len(self._offsets) - 1)
+        self._index = {}
+        for i, game_id in enumerate(self._columns['game_id'].tolist()):
+            self._index[game_id] = i
+
+    def __len__(self):
+        return self.schema['n_rows']
+
+    def __contains__(self, game_id):
+        return int(game_id) in self._index
+
+    def ids(self):
+        return self._columns['game_id'].tolist()
+
+    def index(self, game_id):
+        return self._index[int(game_id)]
+
+    def column(self, name):
+        return self._columns[name]
+
+    def string(self, code):
+        text = self._strings[code]
+        if text is None:
+            text = self._blob[self._offsets[code]:self._offsets[code + 1]].tobytes().decode('utf-8')
+            self._strings[code] = text
+        return text
+
+    def value(self, name, i):
+        #the value of a single column at row i, decoding strings
+        value = self._columns[name][i]
+        if self.schema['columns'][name] == 'str':
+            return self.string(int(value))
+        return int(value)
+
+    def row(self, game_id):
+        #the data for a game in the nested format used by Game attributes
+        return _row_dict(self, self.index(game_id))
+
+    def game(self, game_id):
+        return GameView(self, self.index(game_id))
+
+
+def _names(table, i):
+    return {side : {field : table.value(side + '_' + field, i) for field in team_fields} for side in sides}
+
+def _scores(table, i):
+    quarters = table.value('quarters', i)
+    return {side : table.column(side + '_scores')[i, :quarters + 1].tolist() for side in sides}
+
+def _leaders(table, i, category):
+    stats = {}
+    for side in sides:
+        prefix = side + '_' + category + '_'
+        stats[side] = {'leader' : table.value(prefix + 'leader', i)}
+        for field in leader_fields[category]:
+            if field in split_fields:
+                stats[side][field] = str(table.value(prefix + field + '_made', i)) + '/' + str(table.value(prefix + field + '_att', i))
+            else:
+                stats[side][field] = table.value(prefix + field, i)
+    return stats
+
+def _row_dict(table, i):
+    return {'headline' : table.value('headline', i),
+            'round' : table.value('round', i),
+            'winner' : table.value('winner', i),
+            'names' : _names(table, i),
+            'scores' : _scores(table, i),
+            'quarters' : table.value('quarters', i),
+            'pts' : _leaders(table, i, 'pts'),
+            'reb' : _leaders(table, i, 'reb'),
+            'ast' : _leaders(table, i, 'ast'),
+            'n_game' : table.value('n_game', i),
+            'home_wins' : table.value('home_wins', i),
+            'away_wins' : table.value('away_wins', i)}
+
+
+def _decoded(slot, decode_fcn):
+    #a property of a GameView for nested data, which is decoded from the
+    #table by decode_fcn(table, i) the first time it is read and kept in
+    #'slot' (one of the slots of games.Game)
+    def get(self):
+        try:
+            return getattr(self, slot)
+        except AttributeError:
+            value = decode_fcn(self._table, self._i)
+            setattr(self, slot, value)
+            return value
+    
+    return property(get)
+
+
+class GameView(g.Game):
+
+    '''
+        a Game backed by row i of a ColumnarTable.  Nothing is copied when a
+        GameView is created; each attribute is decoded from the table's
+        columns when it is accessed.  The nested data (names, scores and
+        leaders) is decoded once, and kept in the slots of the Game.
+    '''
+
+    __slots__ = ['_table', '_i']
+
+    def __init__(self, table, i):
+        self._table = table
+        self._i = i
+
+    game_id = property(lambda self: self._table.value('game_id', self._i))
+    headline = property(lambda self: self._table.value('headline', self._i))
+    round = property(lambda self: self._table.value('round', self._i))
+    winner = property(lambda self: self._table.value('winner', self._i))
+    quarters = property(lambda self: self._table.value('quarters', self._i))
+    n_game = property(lambda self: self._table.value('n_game', self._i))
+    home_wins = property(lambda self: self._table.value('home_wins', self._i))
+    away_wins = property(lambda self: self._table.value('away_wins', self._i))
+    names = _decoded('_names', _names)
+    scores = _decoded('_scores', _scores)
+    pts = _decoded('_pts', lambda table, i: _leaders(table, i, 'pts'))
+    reb = _decoded('_reb', lambda table, i: _leaders(table, i, 'reb'))
+    ast = _decoded('_ast', lambda table, i: _leaders(table, i, 'ast'))
+
+
+if __name__ == '__main__':
+    import dataframe_builder
+
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else dataframe_builder.raw_data_file_path
+    out_dir = sys.argv[2] if len(sys.argv) > 2 else columnar_data_path
+
+    convert_csv(csv_path, out_dir)
+    print('converted ' + csv_path + ' to columnar table ' + out_dir)
@@ -5,44 +5,325 @@ Created on Sat May 18 21:08:21 2019
 @author: danie
 """
 '''
-    simple script to scrape basic NBA game data from ESPN using the'games' 
+    simple script to scrape basic NBA game data from ESPN using the'games'
     module and store the data in a pandas dataframe. Exports a .csv file at
     location specified by raw_data_file_path.
+
+    Pages are downloaded and parsed concurrently by the 'scraper' module. The
+    number of requests in flight, the rate limit and the number of parsing
+    processes can be set from the command line, e.g.
+        dataframe_builder.py -n 16 -r 10 -p 4
+
+    Each game is written to a checkpoint file (one JSON object per line, at
+    location checkpoint_file_path) as soon as it has been scraped, so memory
+    use stays flat and a crash does not lose the games scraped so far. When
+    the script is rerun, games already in the checkpoint file are not scraped
+    again. At the end of a run the checkpoint is turned into the .csv file in
+    a single step.
+
+    Downloaded pages are kept in an on-disk page cache (see page_cache.py),
+    so rebuilding the data after a change to the Game class does not download
+    them again. With --offline pages are only read from the cache.
+
+    The outcome of every scrape ('ok', 'fetch-failed' or 'parse-failed') is
+    logged per game ID to the status file at status_file_path.
+
+    With the -u option the existing .csv file is updated instead of rebuilt:
+    only the IDs in the ID file that are missing from the .csv file are
+    scraped, and the new games are added to it. IDs whose last scrape failed
+    are retried according to the --retry option; by default games that
+    failed to download are retried and games that failed to parse (which
+    usually needs a fix to the Game class) are not. E.g.
+        dataframe_builder.py -u -i espn_game_ids_postseason_2019-2019.txt
+
+    With --dataset the games are written into a dataset partitioned by season
+    (see dataset.py) instead, and only the partitions of the seasons scraped
+    are read and rewritten, e.g.
+        dataframe_builder.py -u -d raw_data -i espn_game_ids_postseason_2019-2019.txt
 '''
 
-import pandas as pd
-import games as g
+import argparse
+import json
+import os
+import time
+import metrics
+import scraper
+import page_cache
 import espn_id_finder
+import knn_model
 
 
-raw_data_file_path = 'raw_data.csv'
+raw_data_file_path = knn_model.raw_data_file_path
+checkpoint_file_path = 'raw_data_rows.jsonl'
+status_file_path = 'raw_data_status.jsonl'
 
-if __name__ == '__main__':
-    
-    #give the file path of the text file containing the list of espn game ids.
-    id_file_path = espn_id_finder.id_file_path
-    
-    #read the game ids from the text file.
-    with open(id_file_path , 'r') as id_file:
-        id_list = id_file.readlines()
+#which failed IDs are scraped again by an update, for each --retry option
+retry_statuses = {'none' : [],
+                  'fetch-failed' : ['fetch-failed'],
+                  'parse-failed' : ['parse-failed'],
+                  'all' : ['fetch-failed', 'parse-failed']}
+
+
+def game_record(game):
+    #the row of raw data for a game, as a JSON-serializable dictionary
+    record = {'game_id' : game.game_id}
+    for column, value in game.to_dict().items():
+        record[column] = value[0]
+    return record
+
+
+class RowWriter:
+
+    '''
+        appends game records to a checkpoint file, one JSON object per line.
+        Each record is flushed to disk as soon as it is written.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a', encoding = 'utf-8')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def write(self, game):
+        self._file.write(json.dumps(game_record(game)) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class StatusLog:
+
+    '''
+        appends the outcome of each scrape to a status file, one JSON object
+        per line. The last entry for a game ID is its current status.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a', encoding = 'utf-8')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def write(self, result):
+        self._file.write(json.dumps({'game_id' : result.game_id,
+                                     'status' : result.status,
+                                     'error' : result.error,
+                                     'time' : time.time()}) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def read_statuses(path):
+    #the current status entry of every game ID in a status file
+    statuses = {}
+    for record in read_rows(path):
+        statuses[record['game_id']] = record
+    return statuses
+
+
+def ids_to_scrape(id_list, done_ids, statuses, retry = 'fetch-failed'):
+    '''
+        the IDs in id_list that still need to be scraped: those not in
+        done_ids, and either never scraped before or last scraped with a
+        status selected by 'retry' (a key of retry_statuses).
+    '''
+    todo_list = []
+    for game_id in scraper.clean_ids(id_list):
+        if game_id in done_ids:
+            continue
+        status = statuses.get(game_id)
+        if status is None or status['status'] in retry_statuses[retry]:
+            todo_list.append(game_id)
+    return todo_list
+
+
+def read_rows(path):
+    '''
+        read the records in a checkpoint file. A partly written last line,
+        left behind by a crash, is ignored.
+    '''
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, 'r', encoding = 'utf-8') as checkpoint_file:
+        for line in checkpoint_file:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def coalesce(records, id_list = None, existing = None):
+    '''
+        build the raw data dataframe from a list of game records in one step.
+        The records are ordered as in id_list, if given; if a game appears
+        more than once, its last record is used. If 'existing' (the contents
+        of a .csv file being updated) is given, the records are added after
+        its rows, replacing any rows for the same games.
+    '''
+    import pandas as pd
     
-    #initialize the pandas dataframe that will hold all the raw game data
-    df = pd.DataFrame()
+    by_id = {}
+    for record in records:
+        by_id[record['game_id']] = record
+
+    new_ids = list(by_id)
+    if id_list is not None:
+        listed_ids = [game_id for game_id in scraper.clean_ids(id_list) if game_id in by_id]
+        new_ids = listed_ids + [game_id for game_id in new_ids if game_id not in set(listed_ids)]
+
+    rows = []
+    for game_id in new_ids:
+        row = dict(by_id[game_id])
+        del row['game_id']
+        rows.append(row)
+    df = pd.DataFrame(rows, index = new_ids)
+
+    if existing is not None:
+        existing = existing[~existing.index.isin(new_ids)]
+        df = pd.concat([existing, df])
+
+    return df
+
+
+if __name__ == '__main__':
+    #pandas is only imported where it is used, so that programs importing 
+    #this module for raw_data_file_path do not pay for it
+    import pandas as pd
     
-    #add raw game data row by row into the dataframe df
-    for game_id in id_list:
-        #a few game pages have variations in the standard html structure that 
-        #will not be parsed correctly by the BeautifulSoup code in the Game class.
-        #A simple try catch handles these exceptions.
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--max_in_flight', type=int, default=8,
+                        help='maximum number of page requests in progress at once')
+
+    parser.add_argument('-r', '--rate_limit', type=float,
+                        help='maximum number of requests per second to espn.com')
+
+    parser.add_argument('-p', '--parse_workers', type=int,
+                        help='number of processes used to parse pages (default: one per CPU)')
+
+    parser.add_argument('--root', default=scraper.g.game_summary_root,
+                        help='game summary url up to the game ID, e.g. a local server serving saved pages')
+
+    parser.add_argument('--cache', default='page_cache',
+                        help='directory of the on-disk page cache (default: page_cache)')
+
+    parser.add_argument('--no_cache', action='store_true',
+                        help='always download pages instead of using the page cache')
+
+    parser.add_argument('--offline', action='store_true',
+                        help='only read pages from the page cache, never from the network')
+
+    parser.add_argument('-i', '--id_file', nargs='+', default=[espn_id_finder.id_file_path],
+                        help='text file(s) containing the list of espn game ids')
+
+    parser.add_argument('-u', '--update', action='store_true',
+                        help='add the missing games to the existing .csv file instead of rebuilding it')
+
+    parser.add_argument('--retry', choices=sorted(retry_statuses), default='fetch-failed',
+                        help='which previously failed game ids to scrape again (default: fetch-failed)')
+
+    parser.add_argument('-d', '--dataset',
+                        help='write the games into the season partitions of this dataset directory (see dataset.py) instead of the .csv file')
+
+    parser.add_argument('-s', '--season_type', choices=sorted(espn_id_finder.season_type_names.values()),
+                        help='with --dataset: season type of the games (default: from the ID file name, else postseason)')
+
+    parser.add_argument('--season', type=int,
+                        help='with --dataset: season of all the games, given by the year it ends in (default: from single-season ID files, else from the game IDs)')
+
+    metrics.add_arguments(parser)
+
+    args = parser.parse_args()
+    metrics.start(args)
+
+    #read the game ids from the text file(s).
+    id_list = []
+    for id_file_path in args.id_file:
+        with open(id_file_path , 'r') as id_file:
+            id_list += id_file.readlines()
+
+    #with --dataset the games go into the partitions of their seasons, and
+    #only those partitions are read and written. The checkpoint and status
+    #files are kept in the dataset directory.
+    data = None
+    if args.dataset:
+        import dataset
         try:
-            game = g.Game(game_id)
-            
-            new_row = pd.DataFrame(game.to_dict() , index=[game_id])
-            
-            df = df.append(new_row)
-        except:
-            print('missing data at game id ' + game_id)
-    
-    #export the dataframe containing raw game data to a csv file
-    df.to_csv(raw_data_file_path)
-        
\ No newline at end of file
+            seasons = dataset.game_seasons(id_list, args.season, args.id_file)
+        except ValueError as error:
+            parser.error(str(error))
+        season_type = args.season_type
+        if season_type is None:
+            found = dataset.id_file_season(args.id_file[0])
+            season_type = found[0] if found is not None else 'postseason'
+        data = dataset.Dataset(args.dataset)
+        partition_names = [dataset.partition_name(season_type, season) for season in sorted(set(seasons.values()))]
+        os.makedirs(args.dataset, exist_ok = True)
+        checkpoint_file_path = os.path.join(args.dataset, checkpoint_file_path)
+        status_file_path = os.path.join(args.dataset, status_file_path)
+
+    #skip the games already saved to the checkpoint by an earlier run, and
+    #when updating, the games already in the .csv file (or partitions)
+    done_ids = set(record['game_id'] for record in read_rows(checkpoint_file_path))
+    existing = None
+    if args.update and data is not None:
+        existing = data.read_frame(partition_names)
+    elif args.update and os.path.exists(raw_data_file_path):
+        existing = pd.read_csv(raw_data_file_path, index_col = 0)
+    if existing is not None:
+        done_ids |= set(int(game_id) for game_id in existing.index)
+        statuses = read_statuses(status_file_path)
+    else:
+        #a full rebuild tries every game again
+        statuses = {}
+    todo_list = ids_to_scrape(id_list, done_ids, statuses, args.retry)
+    print('scraping ' + str(len(todo_list)) + ' games')
+
+    cache = None
+    if not args.no_cache:
+        cache = page_cache.PageCache(args.cache, offline = args.offline)
+
+    game_scraper = scraper.Scraper(root = args.root,
+                                   max_in_flight = args.max_in_flight,
+                                   rate_limit = args.rate_limit,
+                                   parse_workers = args.parse_workers,
+                                   cache = cache)
+
+    #stream raw game data row by row into the checkpoint file, as the games
+    #finish downloading and parsing
+    with RowWriter(checkpoint_file_path) as writer, StatusLog(status_file_path) as status_log:
+        for result in game_scraper.scrape(todo_list):
+            #a few game pages have variations in the standard html structure that
+            #will not be parsed correctly by the BeautifulSoup code in the Game class.
+            #The scraper reports these instead of raising, and they are logged
+            #so that they can be retried later.
+            status_log.write(result)
+            if result.status == 'ok':
+                writer.write(result.game)
+            else:
+                print('missing data at game id ' + str(result.game_id) + ' (' + result.status + ': ' + result.error + ')')
+
+    #build the dataframe containing raw game data in one step and export it to
+    #a csv file. The checkpointed games are now in the .csv file, so the
+    #checkpoint is no longer needed.
+    df = coalesce(read_rows(checkpoint_file_path), id_list, existing)
+    if data is not None:
+        data.write_games(df, season_type, seasons)
+    else:
+        df.to_csv(raw_data_file_path)
+    os.remove(checkpoint_file_path)
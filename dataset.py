@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 09:41:27 2026
+
+@author: danie
+"""
+
+'''
+    A game dataset partitioned by season type and season, for corpora too
+    large to read in full for every job (e.g. every regular season game).
+
+    A dataset is a directory holding one raw data file per partition (a .csv
+    file in the format written by dataframe_builder.py, or a columnar table
+    written by columnar.py) and a manifest:
+        raw_data/manifest.json
+        raw_data/postseason_2018.csv
+        raw_data/postseason_2019.csv
+        raw_data/regular_season_2019.csv
+    Partitions are named '<season type>_<season>', with the season type
+    names of espn_id_finder.py and seasons given by the year they end in.
+    The manifest lists each partition's name, season type, season, file,
+    SHA-256 hash and game IDs, so the games of a dataset can be found, and
+    a dataset can be hashed (see feature_cache.py), without reading any
+    partition.  Adding a season writes that season's file and the manifest;
+    the other partitions are not touched.
+
+    Wherever a raw data file path is accepted (game_store.load_store,
+    knn_model.train, nba_headline_generator.py, ...) a dataset may be given
+    instead, optionally followed by a colon and a comma-separated selection
+    of partitions. Each item of a selection is a partition name, a pattern
+    (as in fnmatch) or a range of seasons:
+        raw_data
+        raw_data:postseason_*
+        raw_data:postseason_2010-2018,regular_season_2019
+
+    The selected partitions are joined lazily by a PartitionedStore: a
+    partition is only read (through game_store.load_store) when one of its
+    games is requested, so serving only reads the partitions of the games it
+    looks up, and memory scales with the partitions used, not with the whole
+    history.
+
+    Parameters: Dataset(path)
+        path - the dataset directory (created when a partition is written)
+
+    Methods:
+        .partitions(selection = None) - the manifest entries of the
+            selected partitions (all of them by default), in order of season
+            type and season
+        .partition_path(entry) - path of a partition's raw data file
+        .store(selection = None) - a PartitionedStore of the selected
+            partitions
+        .read_frame(names) - a pandas dataframe of the rows of the named
+            partitions that exist, or None
+        .write_partition(season_type, season, df) - write a dataframe of raw
+            game data as a partition, replacing the partition's old file
+        .write_games(df, season_type, seasons) - split a dataframe of raw
+            game data into partitions by season and write each of them
+            ('seasons' maps each game ID to its season; games already in the
+            dataset may be left out)
+
+    PartitionedStore has the methods of game_store.GameStore: ids(), row(),
+    get(), games(), and also .paths() - the raw data files of its
+    partitions, with their hashes.
+
+    Functions:
+        is_dataset(path) - whether path is a dataset directory
+        split_path(data_path) - the path of the dataset (or data file) and
+            the selection in data_path
+        data_files(data_path) - the raw data files of a data path, in order,
+            with their hashes
+        file_hash(path) - SHA-256 hash of a data file, or of the files of a
+            columnar table
+        season_of(game_id) - the season of a game, for the ESPN game IDs that
+            begin with the game's date (until the 2012 season), else None
+        id_file_season(path) - the season type and season of an ID file
+            written by espn_id_finder.py for a single season, else None
+        game_seasons(game_ids, season = None, id_file_paths = []) - the
+            season of each game, from the given season, single-season ID
+            files or the game IDs
+        partition_name(season_type, season) - e.g. 'postseason_2019'
+
+    Usage:
+        dataset.py <dataset> - list the partitions of a dataset
+        dataset.py <dataset> --add <raw data file> [-s <season type>]
+                   [--season <season> | -i <ID files>] - add the games of a
+            raw data file to the dataset. Seasons are taken from --season,
+            or from the ID files of single seasons (espn_id_finder.py
+            --per_season) that list each game, or from the game ID itself.
+'''
+
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import threading
+import game_store
+import scraper
+
+
+manifest_name = 'manifest.json'
+
+#a range of seasons in a selection, e.g. 'postseason_2010-2018'
+_season_range = re.compile(r'^(\w+)_(\d{4})-(\d{4})$')
+
+#ID files of single seasons written by espn_id_finder.py
+_id_file_name = re.compile(r'espn_game_ids_(\w+)_(\d{4})-(\d{4})\.txt$')
+
+
+def is_dataset(path):
+    return os.path.isfile(os.path.join(path, manifest_name))
+
+
+def split_path(data_path):
+    #a colon only starts a selection if what comes before it is a dataset,
+    #so that paths such as C:\data\raw_data.csv are left alone
+    if ':' in data_path and not os.path.exists(data_path):
+        path, selection = data_path.rsplit(':', 1)
+        if is_dataset(path):
+            return path, selection.split(',')
+    return data_path, None
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        paths = [os.path.join(path, name) for name in sorted(os.listdir(path))]
+        paths = [file_path for file_path in paths if os.path.isfile(file_path)]
+    else:
+        paths = [path]
+    for file_path in paths:
+        digest.update(os.path.basename(file_path).encode('utf-8'))
+        with open(file_path, 'rb') as data_file:
+            for block in iter(lambda: data_file.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def data_files(data_path):
+    path, selection = split_path(data_path)
+    if is_dataset(path):
+        data = Dataset(path)
+        return [(data.partition_path(entry), entry['sha256']) for entry in data._selection(selection)]
+    return [(path, file_hash(path))]
+
+
+def season_of(game_id):
+    #IDs such as 230419006 (19 April 2003) begin with the year (less 1980),
+    #month and day of the game. Games from July on belong to the season that
+    #ends the next year.
+    text = str(game_id).strip()
+    if len(text) != 9 or text[0] not in '23':
+        return None
+    year = 1980 + int(text[:2])
+    return year + 1 if int(text[2:4]) >= 7 else year
+
+
+def id_file_season(path):
+    match = _id_file_name.search(os.path.basename(path))
+    if match is None or match.group(2) != match.group(3):
+        return None
+    return match.group(1), int(match.group(2))
+
+
+def partition_name(season_type, season):
+    return season_type + '_' + str(season)
+
+
+def _selected(entry, selection):
+    if selection is None:
+        return True
+    for item in selection:
+        match = _season_range.match(item)
+        if match is not None:
+            if entry['season_type'] == match.group(1) and int(match.group(2)) <= entry['season'] <= int(match.group(3)):
+                return True
+        elif fnmatch.fnmatchcase(entry['name'], item):
+            return True
+    return False
+
+
+class Dataset:
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = {}
+        if is_dataset(path):
+            with open(os.path.join(path, manifest_name), 'r') as manifest_file:
+                for entry in json.load(manifest_file)['partitions']:
+                    self._entries[entry['name']] = entry
+
+    def partitions(self, selection = None):
+        entries = sorted(self._entries.values(), key = lambda entry: (entry['season_type'], entry['season']))
+        return [entry for entry in entries if _selected(entry, selection)]
+
+    def _selection(self, selection):
+        entries = self.partitions(selection)
+        if not entries:
+            raise ValueError('no partitions of ' + self.path + ' match ' + ','.join(selection or ['*']))
+        return entries
+
+    def partition_path(self, entry):
+        return os.path.join(self.path, entry['file'])
+
+    def store(self, selection = None):
+        return PartitionedStore(self, self._selection(selection))
+
+    def read_frame(self, names):
+        import pandas as pd
+        frames = [pd.read_csv(self.partition_path(self._entries[name]), index_col = 0)
+                  for name in names if name in self._entries]
+        if not frames:
+            return None
+        return pd.concat(frames)
+
+    def _replace(self, path, write_fcn):
+        #write to a temporary file and rename it, so that readers never see
+        #a partly written file
+        temp_path = path + '.' + str(os.getpid()) + '.' + str(threading.get_ident()) + '.tmp'
+        write_fcn(temp_path)
+        os.replace(temp_path, path)
+
+    def _write_manifest(self):
+        def write(temp_path):
+            with open(temp_path, 'w') as manifest_file:
+                json.dump({'version' : 1, 'partitions' : self.partitions()}, manifest_file, indent = 1)
+        self._replace(os.path.join(self.path, manifest_name), write)
+
+    def _add(self, season_type, season, df):
+        name = partition_name(season_type, season)
+        entry = {'name' : name,
+                 'season_type' : season_type,
+                 'season' : season,
+                 'file' : name + '.csv',
+                 'n_games' : len(df),
+                 'game_ids' : scraper.clean_ids(df.index)}
+        path = self.partition_path(entry)
+        self._replace(path, df.to_csv)
+        entry['sha256'] = file_hash(path)
+        self._entries[name] = entry
+
+    def write_partition(self, season_type, season, df):
+        os.makedirs(self.path, exist_ok = True)
+        self._add(season_type, season, df)
+        self._write_manifest()
+
+    def write_games(self, df, season_type, seasons):
+        #games missing from 'seasons' stay in the season of the partition
+        #that already holds them
+        known = {game_id : entry['season'] for entry in self.partitions() if entry['season_type'] == season_type
+                 for game_id in entry['game_ids']}
+        known.update(seasons)
+        os.makedirs(self.path, exist_ok = True)
+        season_list = [known[game_id] for game_id in scraper.clean_ids(df.index)]
+        for season in sorted(set(season_list)):
+            self._add(season_type, season, df[[s == season for s in season_list]])
+        self._write_manifest()
+
+
+class PartitionedStore:
+
+    '''
+        the games of several partitions of a dataset, as one store. The game
+        IDs of every partition come from the manifest; the partitions
+        themselves are read the first time one of their games is requested.
+    '''
+
+    def __init__(self, data, entries):
+        self._paths = [(data.partition_path(entry), entry['sha256']) for entry in entries]
+        self._ids = []
+        self._partition = {}
+        for i, entry in enumerate(entries):
+            self._ids += entry['game_ids']
+            for game_id in entry['game_ids']:
+                self._partition[game_id] = i
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, game_id):
+        return _game_id(game_id) in self._partition
+
+    def _store(self, game_id):
+        game_id = _game_id(game_id)
+        return game_store.load_store(self._paths[self._partition[game_id]][0]), game_id
+
+    def paths(self):
+        return list(self._paths)
+
+    def ids(self):
+        return list(self._ids)
+
+    def row(self, game_id):
+        store, game_id = self._store(game_id)
+        return store.row(game_id)
+
+    def get(self, game_id):
+        store, game_id = self._store(game_id)
+        return store.get(game_id)
+
+    def games(self):
+        games = []
+        for path, _ in self._paths:
+            games += game_store.load_store(path).games()
+        return games
+
+
+def _game_id(game_id):
+    #game IDs may be given as integers or as strings read from an ID file
+    return int(str(game_id).strip())
+
+
+def _read_ids(id_file_path):
+    with open(id_file_path, 'r') as id_file:
+        return scraper.clean_ids(id_file.readlines())
+
+
+def game_seasons(game_ids, season = None, id_file_paths = []):
+    '''
+        map each game ID to its season: the given season, or the season of
+        the single-season ID file listing the game, or the season coded in
+        the game ID. Raises a ValueError naming the games whose season is not
+        known.
+    '''
+    seasons = {}
+    for id_file_path in id_file_paths:
+        found = id_file_season(id_file_path)
+        if found is not None:
+            for game_id in _read_ids(id_file_path):
+                seasons[game_id] = found[1]
+
+    result = {}
+    unknown = []
+    for game_id in scraper.clean_ids(game_ids):
+        result[game_id] = season or seasons.get(game_id) or season_of(game_id)
+        if result[game_id] is None:
+            unknown.append(game_id)
+    if unknown:
+        raise ValueError('the season of ' + str(len(unknown)) + ' games is not known (e.g. ' + str(unknown[0]) +
+                         '); give --season, or single-season ID files from espn_id_finder.py --per_season')
+    return result
+
+
+if __name__ == '__main__':
+    import espn_id_finder
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('dataset',
+                        help='dataset directory')
+
+    parser.add_argument('--add',
+                        help='raw data file (.csv) whose games are added to the dataset, replacing the partitions of their seasons')
+
+    parser.add_argument('-s', '--season_type', choices=sorted(espn_id_finder.season_type_names.values()), default='postseason',
+                        help='season type of the games added (default: postseason)')
+
+    parser.add_argument('--season', type=int,
+                        help='season of the games added, given by the year it ends in')
+
+    parser.add_argument('-i', '--id_file', nargs='+', default=[],
+                        help='single-season ID file(s) from espn_id_finder.py --per_season, giving the season of each game added')
+
+    args = parser.parse_args()
+
+    data = Dataset(args.dataset)
+    if args.add:
+        import pandas as pd
+        df = pd.read_csv(args.add, index_col = 0)
+        try:
+            seasons = game_seasons(df.index, args.season, args.id_file)
+        except ValueError as error:
+            parser.error(str(error))
+        data.write_games(df, args.season_type, seasons)
+
+    for entry in data.partitions():
+        print(entry['name'] + '\t' + str(entry['n_games']) + ' games\t' + entry['file'])
@@ -7,18 +7,30 @@ Created on Tue May  7 15:58:08 2019
 
 '''
     This program creates a list of ESPN NBA game ID numbers by visiting each
-    team's schedule page for each year in the selected range and scraping the 
+    team's schedule page for each year in the selected range and scraping the
     IDs for home games (to avoid double-counting).  Game IDs may be found for
-    either the regular season or the postseason. 
-    
-    The ID numbers are saved to a file: 
+    either the regular season or the postseason.
+
+    The schedule pages are downloaded concurrently by the 'scraper' module and
+    parsed in worker processes. IDs are written in year and team order, each
+    ID only once.
+
+    The ID numbers are saved to a file:
         "espn_game_ids_(season type)_(start year)-(end year).txt"
+
+    The season type and year range can be given on the command line, e.g.
+        espn_id_finder.py -s 2 --start 2010 --end 2019
+    With --per_season the IDs of each season are saved to a file of their own
+    ("espn_game_ids_(season type)_(year)-(year).txt"), from which
+    dataframe_builder.py and dataset.py take the season of each game.
 '''
 
-import urllib3
-from bs4 import BeautifulSoup
+import argparse
+import time
+import page_cache
+import scraper
 
-#parameters for the scope of the scrape
+#default parameters for the scope of the scrape
 start_year = 2003
 end_year = 2018
 season_type = 3     #see season_type_names below
@@ -27,45 +39,123 @@ season_type = 3     #see season_type_names below
 #http://www.espn.com/nba/team/schedule/_/name/wsh/season/2016/seasontype/2
 schedule_root = 'http://www.espn.com/nba/team/schedule/_/name/'
 team_abbreviations = ['atl', 'bos', 'bkn', 'cle', 'cha', 'chi', 'dal', 'den', 'det', 'gs', 'hou', 'ind', 'lac', 'lal', 'mem', 'mia', 'mil', 'min', 'no', 'ny', 'okc', 'orl', 'phi', 'phx', 'por', 'sac', 'sa', 'tor', 'utah', 'wsh']
-season_type_names = {1 : 'preseason', 2 : 'regular_season' , 3 : 'postseason'} 
+season_type_names = {1 : 'preseason', 2 : 'regular_season' , 3 : 'postseason'}
+
+
+def id_file_name(season_type, start_year, end_year):
+    return 'espn_game_ids_{0}_{1}-{2}.txt'.format(season_type_names[season_type],str(start_year),str(end_year))
+
+id_file_path = id_file_name(season_type, start_year, end_year)
+
+
+def schedule_url(key):
+    #key is a (year, team, season type) tuple
+    year, team, season_type = key
+    return schedule_root + team + '/season/' + str(year) + '/seasontype/' + str(season_type)
+
+
+def schedule_game_ids(key, html):
+    '''
+        the IDs of the home games listed on a schedule page, in the order they
+        appear
+    '''
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+
+    game_ids = []
+    #each 'a' tag in the tag with class 'ml4' links to a game in the season.
+    #The selector is evaluated once for the whole page.
+    for game_link_tag in soup.select('.ml4 a'):
+        #find the tag with the "vs" or "@" string indicating whether
+        #the game was at home or not
+        location_tag = game_link_tag.parent.parent.previous_sibling
+
+        #grab the game ID
+        game_id = game_link_tag.get('href')[-9:]
+        #grab the 'vs' or '@' string
+        game_location = location_tag.select('.pr2')[0].text
+
+        if game_location == 'vs':
+            game_ids.append(game_id)
+
+    return game_ids
+
+
+def find_game_ids(years, season_type, game_scraper, with_years = False):
+    '''
+        generator of the game IDs on the schedule pages of every team, for
+        each year in 'years'. Pages are crawled concurrently, but IDs are
+        produced in year and team order, and each ID is produced only once.
+        Schedule pages that could not be downloaded or parsed are reported.
+        If with_years is True, (year, game ID) pairs are produced.
+    '''
+    this_year = time.localtime().tm_year
+    keys = [(year, team, season_type) for year in years for team in team_abbreviations]
+    position = {key : i for i, key in enumerate(keys)}
+
+    #schedules of seasons that ended before this year will not change
+    def final(key):
+        return key[0] < this_year
+
+    finished = {}
+    next_position = 0
+    seen = set()
+    for result in game_scraper.crawl(keys, schedule_url, schedule_game_ids, final):
+        if result.status != 'ok':
+            print('missing schedule ' + schedule_url(result.game_id) + ' (' + result.status + ': ' + result.error + ')')
+        finished[position[result.game_id]] = result.game or []
+
+        #produce the IDs of every page whose turn has come
+        while next_position in finished:
+            for game_id in finished.pop(next_position):
+                if game_id not in seen:
+                    seen.add(game_id)
+                    yield (keys[next_position][0], game_id) if with_years else game_id
+            next_position += 1
 
-id_file_path = 'espn_game_ids_{0}_{1}-{2}.txt'.format(season_type_names[season_type],str(start_year),str(end_year))
 
 if __name__ == '__main__':
-    
-    #open up a connection pool
-    http = urllib3.PoolManager()
-    
-    #open up a text file to write the game IDs into
-    with open(id_file_path, 'w') as id_file:
-        
-        for year in range(start_year,end_year+1):
-            
-            for team in team_abbreviations:
-                #get the html from the appropriate url and parse it into a tree 
-                #called 'soup'
-                url = schedule_root + team + '/season/' + str(year) + '/seasontype/' + str(season_type)  
-                r = http.request('GET', url)
-                soup = BeautifulSoup(r.data, 'html.parser')
-                
-                #each 'a' tag in the tag with class 'ml4' links to a game in the 
-                #season
-                number_of_games_in_season = len(soup.select('.ml4 a'))
-                
-                for i in range(number_of_games_in_season):
-                    #find the tag with the href link to the i^th game
-                    game_link_tag = soup.select('.ml4 a')[i]
-                    #find the tag with the "vs" or "@" string indicating whether 
-                    #the game was at home or not
-                    location_tag = game_link_tag.parent.parent.previous_sibling
-                    
-                    #grab the game ID as an integer
-                    game_id = game_link_tag.get('href')[-9:]
-                    #grab the 'vs' or '@' string
-                    game_location = location_tag.select('.pr2')[0].text
-                    
-                    if game_location == 'vs':
-                        id_file.write(game_id + '\n')
-                        
-    
-    
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-s', '--season_type', type=int, choices=sorted(season_type_names), default=season_type,
+                        help='1 for the preseason, 2 for the regular season, 3 for the postseason (default: 3)')
+
+    parser.add_argument('--start', type=int, default=start_year,
+                        help='first season, given by the year it ends in (default: ' + str(start_year) + ')')
+
+    parser.add_argument('--end', type=int, default=end_year,
+                        help='last season, given by the year it ends in (default: ' + str(end_year) + ')')
+
+    parser.add_argument('-n', '--max_in_flight', type=int, default=8,
+                        help='maximum number of page requests in progress at once')
+
+    parser.add_argument('-r', '--rate_limit', type=float,
+                        help='maximum number of requests per second to espn.com')
+
+    parser.add_argument('-o', '--output',
+                        help='file to write the game IDs to (default: espn_game_ids_(season type)_(start year)-(end year).txt)')
+
+    parser.add_argument('--per_season', action='store_true',
+                        help='write one file per season, espn_game_ids_(season type)_(year)-(year).txt, e.g. for the partitions of a dataset (see dataset.py)')
+
+    args = parser.parse_args()
+
+    output_path = args.output or id_file_name(args.season_type, args.start, args.end)
+
+    #schedule pages are kept in the on-disk page cache
+    game_scraper = scraper.Scraper(max_in_flight = args.max_in_flight,
+                                   rate_limit = args.rate_limit,
+                                   cache = page_cache.PageCache())
+
+    if args.per_season:
+        #the IDs of each season go to a file of their own. Every season gets
+        #a file, even if no games were found.
+        id_files = {year : open(id_file_name(args.season_type, year, year), 'w') for year in range(args.start, args.end + 1)}
+        for year, game_id in find_game_ids(range(args.start, args.end + 1), args.season_type, game_scraper, with_years = True):
+            id_files[year].write(game_id + '\n')
+        for id_file in id_files.values():
+            id_file.close()
+    else:
+        #open up a text file to write the game IDs into
+        with open(output_path, 'w') as id_file:
+            for game_id in find_game_ids(range(args.start, args.end + 1), args.season_type, game_scraper):
+                id_file.write(game_id + '\n')
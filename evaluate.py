@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 13:26:50 2026
+
+@author: danie
+"""
+
+'''
+    Leave-one-out evaluation of the headline model over the whole corpus.
+    Each historical game is treated as a new game: its nearest other
+    historical game is found (the game itself excluded), that game's
+    headline template is rendered with the held-out game's data, and the
+    output is checked.
+
+    The nearest neighbours of all the games are found at once, from the
+    points of the headline index, in blocks of rows: each block is one
+    matrix product against every point, with the block's own rows masked
+    out.  Blocks are handed to a pool of threads (NumPy releases the GIL
+    during the product), so the search uses every core.
+
+    An output headline is checked for unresolved names: names from the
+    corpus (team names, cities, abbreviations, and the points leaders' full,
+    first and last names, of every game) that are in the output but are not
+    names of the held-out game.  These are names the template did not
+    replace, e.g. 'Celtics' in a headline about the Heat, or a player who
+    was not the points leader of the template game and so has no slot.
+
+    Summary (as JSON):
+        games - number of games evaluated
+        mean_distance, median_distance - distance to the nearest other game
+        unresolved_rate - fraction of headlines with an unresolved name
+        unresolved_names - number of unresolved names, and per kind
+            ('team', 'city', 'abbr', 'player') in unresolved_by_kind
+        similarity - mean Jaccard similarity of the words of each headline
+            and of the game's own headline: how well the templates chosen
+            fit the games (e.g. 'force Game 7' for a Game 6 win)
+        score - similarity less unresolved_rate, one number to compare
+            models by (higher is better; see tune.py)
+        exact_rate - fraction of headlines equal to the game's own headline
+        static_rate - fraction of headlines from templates with no slots,
+            which do not depend on the game at all
+        distinct_templates, max_template_uses - how many templates were
+            used, and the most any one template was used
+
+    Usage:
+        evaluate.py [-m <model>] [-d <raw data>] [-o <per-game JSON Lines
+                    file>] [-w <threads>] [-b <block size>]
+
+    Parameters: LeaveOneOut(games, headline_templates = None)
+        games - list of Game objects, in the order of the rows of the
+                points to be evaluated
+        headline_templates - compiled templates keyed by game ID (see
+                templates.py); compiled from the games if None
+
+    Methods:
+        .evaluate(points, block_size = 512, workers = None) - the summary
+            and the list of per-game results ('game_id', 'headline',
+            'template_id', 'template_headline', 'actual_headline',
+            'distance', 'unresolved', 'similarity') for the games at the rows
+            of points
+        .summary(distances, indices) - the summary, given the distance to
+            and row number of the nearest other game of every game (as
+            returned by nearest_others)
+        .outcome(i, j) - the headline rendered for game i from the template
+            of game j, its unresolved names and its similarity to game i's
+            own headline (cached)
+
+    Functions:
+        nearest_others(points, block_size = 512, workers = None) - the
+            distance to, and row number of, the nearest other row of every
+            row of points
+        name_vocabulary(games) - the names of a list of games, for
+            unresolved_names
+        unresolved_names(headline, new_game, vocabulary) - the names of the
+            vocabulary in a headline rendered for new_game that are not
+            new_game's own, as (kind, name) pairs
+        similarity(headline, actual_headline) - Jaccard similarity of the
+            words of two headlines
+        score(summary) - similarity less unresolved_rate
+'''
+
+import argparse
+import json
+import os
+import re
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import templates
+
+
+#parts of players' names that are not names by themselves: suffixes, and
+#words headlines use otherwise (e.g. 'West finals', not David West)
+_not_names = {'Jr.', 'Sr.', 'II', 'III', 'IV', 'East', 'West'}
+
+
+def nearest_others(points, block_size = 512, workers = None):
+    #the squared distances are expanded as |a|^2 - 2 a.b + |b|^2 in float32,
+    #like the brute force search of headline_index.py, so the neighbours
+    #found are those the model would find
+    points = np.asarray(points, dtype = 'float32')
+    norms = (points.astype('float64') ** 2).sum(axis = 1).astype('float32')
+    distances = np.empty(len(points))
+    indices = np.empty(len(points), dtype = 'int64')
+
+    def search_block(start):
+        block = points[start:start + block_size]
+        rows = np.arange(len(block))
+        squared = block @ points.T
+        squared *= -2
+        squared += norms
+        squared += norms[start:start + len(block), None]
+        #leave each game out of its own search
+        squared[rows, start + rows] = np.inf
+        nearest = squared.argmin(axis = 1)
+        indices[start:start + len(block)] = nearest
+        differences = block.astype('float64') - points[nearest]
+        distances[start:start + len(block)] = np.sqrt((differences ** 2).sum(axis = 1))
+
+    with ThreadPoolExecutor(workers or os.cpu_count()) as pool:
+        list(pool.map(search_block, range(0, len(points), block_size)))
+    return distances, indices
+
+
+#words of a headline: names such as "J.R.", "O'Neal" or "Jr." are kept whole,
+#and a possessive 's is dropped
+_word = re.compile(r"\w+(?:[.'\-]\w+)*\.?")
+
+#the longest names looked for, in words (e.g. 'Karl-Anthony Towns' is two)
+_max_words = 3
+
+
+def _words(text):
+    words = []
+    for word in _word.findall(text):
+        if word.endswith("'s"):
+            word = word[:-2]
+        words.append(word)
+    return words
+
+
+def _game_names(game):
+    #the (kind, name) pairs of a game: team names, cities, abbreviations, and
+    #the points leaders' full names and the parts of them
+    names = []
+    for side in ['away', 'home']:
+        for field in ['team', 'city', 'abbr']:
+            names.append((field, game.names[side][field]))
+        leader = game.pts[side]['leader']
+        names.append(('player', leader))
+        names += [('player', part) for part in leader.split(' ') if len(part) > 2 and part not in _not_names]
+    return [(kind, name) for kind, name in names if name]
+
+
+def name_vocabulary(games):
+    #every name of every game, keyed by its tuple of words
+    vocabulary = {}
+    for game in games:
+        for kind, name in _game_names(game):
+            vocabulary.setdefault(tuple(_words(name)), (kind, name))
+    return vocabulary
+
+
+def unresolved_names(headline, new_game, vocabulary):
+    #the longest name in the vocabulary is matched at each word, and kept if
+    #it is not a name of new_game
+    own_names = set(name for _, name in _game_names(new_game))
+    words = _words(templates.expand_nicknames(headline))
+    unresolved = []
+    position = 0
+    while position < len(words):
+        for n in range(min(_max_words, len(words) - position), 0, -1):
+            found = vocabulary.get(tuple(words[position:position + n]))
+            if found is not None:
+                if found[1] not in own_names:
+                    unresolved.append(found)
+                position += n
+                break
+        else:
+            position += 1
+    return unresolved
+
+
+def similarity(headline, actual_headline):
+    #the Jaccard similarity of the (lower case) words of two headlines
+    words = set(word.lower() for word in _words(headline))
+    actual_words = set(word.lower() for word in _words(actual_headline))
+    if not words and not actual_words:
+        return 1.0
+    return len(words & actual_words) / len(words | actual_words)
+
+
+def score(summary):
+    #one number to compare models by, higher is better: headlines should
+    #read like the games' real headlines, without names left over from
+    #other games
+    return summary['similarity'] - summary['unresolved_rate']
+
+
+class LeaveOneOut:
+
+    def __init__(self, games, headline_templates = None):
+        self.games = games
+        if headline_templates is None:
+            headline_templates = templates.compile_templates(games)
+        self.templates = headline_templates
+        self.vocabulary = name_vocabulary(games)
+        self._outcomes = {}
+
+    def _template(self, j):
+        template = self.templates.get(int(self.games[j].game_id))
+        if template is None:
+            template = self.templates[int(self.games[j].game_id)] = templates.compile_template(self.games[j])
+        return template
+
+    def outcome(self, i, j):
+        key = (i, j)
+        outcome = self._outcomes.get(key)
+        if outcome is None:
+            headline = templates.render(self._template(j), self.games[i])
+            outcome = self._outcomes[key] = (headline,
+                                             unresolved_names(headline, self.games[i], self.vocabulary),
+                                             similarity(headline, self.games[i].headline))
+        return outcome
+
+    def summary(self, distances, indices):
+        by_kind = Counter()
+        template_uses = Counter(indices.tolist())
+        n_unresolved = n_exact = n_static = 0
+        total_similarity = 0.0
+        for i, j in enumerate(indices.tolist()):
+            headline, unresolved, headline_similarity = self.outcome(i, j)
+            if unresolved:
+                n_unresolved += 1
+                by_kind.update(kind for kind, _ in unresolved)
+            n_exact += headline == self.games[i].headline
+            n_static += all(type(segment) == str for segment in self._template(j))
+            total_similarity += headline_similarity
+
+        n = len(indices)
+        summary = {'games' : n,
+                   'mean_distance' : float(distances.mean()),
+                   'median_distance' : float(np.median(distances)),
+                   'unresolved_rate' : n_unresolved / n,
+                   'unresolved_names' : sum(by_kind.values()),
+                   'unresolved_by_kind' : {kind : by_kind[kind] for kind in ['team', 'city', 'abbr', 'player']},
+                   'similarity' : total_similarity / n,
+                   'exact_rate' : n_exact / n,
+                   'static_rate' : n_static / n,
+                   'distinct_templates' : len(template_uses),
+                   'max_template_uses' : max(template_uses.values())}
+        summary['score'] = score(summary)
+        return summary
+
+    def evaluate(self, points, block_size = 512, workers = None):
+        distances, indices = nearest_others(points, block_size, workers)
+        results = []
+        for i, (distance, j) in enumerate(zip(distances.tolist(), indices.tolist())):
+            headline, unresolved, headline_similarity = self.outcome(i, j)
+            game, historical_game = self.games[i], self.games[j]
+            results.append({'game_id' : int(game.game_id),
+                            'headline' : headline,
+                            'template_id' : int(historical_game.game_id),
+                            'template_headline' : historical_game.headline,
+                            'actual_headline' : game.headline,
+                            'distance' : distance,
+                            'unresolved' : [name for _, name in unresolved],
+                            'similarity' : headline_similarity})
+        return self.summary(distances, indices), results
+
+
+if __name__ == '__main__':
+    import time
+    import game_store
+    import knn_model
+    import metrics
+    import nba_headline_generator as nhg
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-m', '--model', default=knn_model.knn_path,
+                        help='directory of the trained model (headline index) to evaluate')
+
+    parser.add_argument('-d', '--data', default=knn_model.raw_data_file_path,
+                        help='raw data the model was trained on: a .csv file, a columnar table, or a dataset partitioned by season (default: ' + knn_model.raw_data_file_path + ')')
+
+    parser.add_argument('-o', '--output',
+                        help='write the result for every game to this file, one JSON object per line')
+
+    parser.add_argument('-w', '--workers', type=int,
+                        help='number of threads searching for neighbours (default: one per CPU)')
+
+    parser.add_argument('-b', '--block_size', type=int, default=512,
+                        help='number of games whose neighbours are found with one matrix product')
+
+    metrics.add_arguments(parser)
+
+    args = parser.parse_args()
+    metrics.start(args)
+
+    start = time.perf_counter()
+    index = nhg.load_model(args.model)
+    store = game_store.load_store(args.data)
+    games = [store.get(game_id) for game_id in index.ids.tolist()]
+
+    summary, results = LeaveOneOut(games, index.templates()).evaluate(index.points, args.block_size, args.workers)
+    summary['seconds'] = round(time.perf_counter() - start, 3)
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            for result in results:
+                output_file.write(json.dumps(result) + '\n')
+    json.dump(summary, sys.stdout, indent = 1)
+    print()
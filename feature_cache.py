@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 23:05:12 2026
+
+@author: danie
+"""
+
+'''
+    Defines a class 'FeatureCache', an on-disk cache of the feature matrix of
+    the historical games, so that training does not recompute every feature
+    from the raw data each time.
+
+    The cache is a directory with one subdirectory per version of the data
+    set, named by the SHA-256 hash of the raw data file (or of the files of a
+    columnar table).  The partitions of a dataset (see dataset.py) each have
+    their own subdirectory, so adding a season only computes the features of
+    that season's games.  Each subdirectory holds
+        game_ids.npy - the game ID of each row
+        <feature name>.<hash>.npy - the values of one feature, where the hash
+            is of the feature's name and implementation: the code of its
+            value_fcn and vector_fcn and of the module-level functions and
+            constants they use, the code of game_columns (which builds the
+            columns the vector functions read), and the code of games.py that
+            builds a Game from a row of raw data and decodes its nested data
+            (Game.from_row, Game._load_row and the properties of the nested
+            data, with the functions they use). Functions are compared by
+            their bytecode, constants and names, so editing comments or
+            moving a function does not recompute anything, and neither does
+            any other change to games.py, such as to scraping or parsing
+            pages.
+        standardized.<hash>.npz - the standardized feature matrix (each
+            column minus its mean, divided by its standard deviation) along
+            with the mean and scale, for the current set of features. For a
+            selection of several partitions it is kept in a subdirectory
+            named by the hash of the partitions' hashes.
+
+    Weights are not part of any key, so changing the weight of a feature
+    reuses everything in the cache.  Changing the code of a feature, or
+    adding one, only recomputes that feature's column, and a changed data
+    file starts a new subdirectory.
+
+    Parameters: FeatureCache(path = 'feature_cache')
+        path - the cache directory
+
+    Methods:
+        .matrix(data_path) - the game IDs and the raw feature matrix of the
+            games in the data file (or columnar table, or dataset) at
+            data_path, with columns in the order of features.feature_names.
+            Missing columns are computed and saved; the data file is only
+            read if a column is missing.
+        .standardized(data_path) - the game IDs, the standardized feature
+            matrix, and the mean and scale of each column
+
+    Functions:
+        dataset_hash(data_path) - hash of the contents of a data file, or of
+            the selected partitions of a dataset
+        feature_hash(feature) - hash of a Feature's name and implementation
+'''
+
+import glob
+import hashlib
+import inspect
+import os
+import re
+import threading
+import numpy as np
+import dataset
+import features as f
+import games as g
+import metrics
+
+
+cache_path = 'feature_cache'
+
+
+def dataset_hash(data_path):
+    #the hash of a single data file, or of the hashes of the partitions of a
+    #dataset, which are read from its manifest
+    files = dataset.data_files(data_path)
+    if len(files) == 1:
+        return files[0][1]
+    return hashlib.sha256(' '.join(digest for _, digest in files).encode('utf-8')).hexdigest()
+
+
+def _names_used(code):
+    #the global names used by a code object, including those used by the
+    #comprehensions and lambdas inside it
+    names = list(code.co_names)
+    for constant in code.co_consts:
+        if inspect.iscode(constant):
+            names += _names_used(constant)
+    return names
+
+def _code_text(code):
+    #the bytecode, names and constants of a code object and of the code
+    #objects nested in it, without line numbers
+    parts = [code.co_code.hex(), repr(code.co_names), repr(code.co_varnames)]
+    for constant in code.co_consts:
+        if inspect.iscode(constant):
+            parts.append(_code_text(constant))
+        elif type(constant) == frozenset:
+            #the order of a set depends on the string hash seed
+            parts.append(repr(sorted(constant, key = repr)))
+        else:
+            parts.append(repr(constant))
+    return ' '.join(parts)
+
+def _implementation(fcn, seen):
+    #the code of a function, followed by the code of the module-level
+    #functions and the values of the module-level constants it uses
+    if fcn is None or fcn in seen:
+        return ''
+    seen.add(fcn)
+    parts = [_code_text(fcn.__code__), repr(fcn.__defaults__)]
+    for name in _names_used(fcn.__code__):
+        value = fcn.__globals__.get(name)
+        if inspect.isfunction(value) and value.__module__ == fcn.__module__:
+            parts.append(_implementation(value, seen))
+        elif type(value) in (bool, int, float, str):
+            parts.append(name + ' = ' + repr(value))
+        elif isinstance(value, re.Pattern):
+            parts.append(name + ' = ' + repr(value.pattern))
+    return '\n'.join(parts)
+
+def _game_implementation():
+    #the code that builds a Game from a row of raw data and decodes its
+    #nested data, which is all of games.py that feature values depend on
+    seen = set()
+    parts = [_implementation(g.Game.from_row.__func__, seen), _implementation(g.Game._load_row, seen)]
+    for name, value in sorted(vars(g.Game).items()):
+        if isinstance(value, property):
+            parts.append(name + ' ' + _implementation(value.fget, seen))
+    return '\n'.join(parts)
+
+def feature_hash(feature):
+    source = [feature.name,
+              _implementation(feature.value_fcn, set()),
+              _implementation(feature.vector_fcn, set()),
+              _implementation(f.game_columns, set()),
+              _game_implementation()]
+    return hashlib.sha256('\n'.join(source).encode('utf-8')).hexdigest()
+
+
+class FeatureCache:
+
+    def __init__(self, path = cache_path):
+        self.path = path
+
+    def _save(self, path, save_fcn, array):
+        #write to a temporary file and rename it, so that readers never see
+        #a partly written file
+        temp_path = path + '.' + str(os.getpid()) + '.' + str(threading.get_ident()) + '.tmp'
+        with open(temp_path, 'wb') as temp_file:
+            save_fcn(temp_file, array)
+        os.replace(temp_path, path)
+
+    def _remove_stale(self, pattern, current_path):
+        #remove the files left by earlier versions of a feature
+        for path in glob.glob(pattern):
+            if path != current_path:
+                os.remove(path)
+
+    def _column_paths(self, directory):
+        return {feature.name : os.path.join(directory, feature.name + '.' + feature_hash(feature)[:16] + '.npy')
+                for feature in f.feature_list}
+
+    def _matrix(self, directory, data_path, column_paths):
+        ids_path = os.path.join(directory, 'game_ids.npy')
+        missing = [name for name in f.feature_names if not os.path.exists(column_paths[name])]
+        metrics.count('feature_cache_hits', len(f.feature_names) - len(missing))
+        metrics.count('feature_cache_misses', len(missing))
+
+        if missing or not os.path.exists(ids_path):
+            import game_store
+            store = game_store.load_store(data_path)
+            game_ids = np.asarray(store.ids(), dtype = 'int64')
+            os.makedirs(directory, exist_ok = True)
+            self._save(ids_path, np.save, game_ids)
+            if missing:
+                #compute only the missing columns
+                X_missing = f.assemble_feature_matrix(store.games(), missing)
+                for j, name in enumerate(missing):
+                    self._save(column_paths[name], np.save, X_missing[:, j])
+                    self._remove_stale(os.path.join(directory, glob.escape(name) + '.*.npy'), column_paths[name])
+        else:
+            game_ids = np.load(ids_path)
+
+        X = np.column_stack([np.load(column_paths[name]) for name in f.feature_names])
+        return game_ids, X
+
+    def matrix(self, data_path):
+        #the columns of each partition of a dataset are cached separately, so
+        #adding a partition only computes the features of its own games
+        parts = []
+        for path, digest in dataset.data_files(data_path):
+            directory = os.path.join(self.path, digest[:16])
+            parts.append(self._matrix(directory, path, self._column_paths(directory)))
+        return np.concatenate([game_ids for game_ids, _ in parts]), np.vstack([X for _, X in parts])
+
+    def standardized(self, data_path):
+        directory = os.path.join(self.path, dataset_hash(data_path)[:16])
+        ids_path = os.path.join(directory, 'game_ids.npy')
+        column_paths = self._column_paths(directory)
+        key = hashlib.sha256(' '.join(os.path.basename(column_paths[name]) for name in f.feature_names).encode('utf-8')).hexdigest()
+        path = os.path.join(directory, 'standardized.' + key[:16] + '.npz')
+        if os.path.exists(path):
+            metrics.count('feature_cache_hits')
+            with np.load(path) as saved:
+                return np.load(ids_path), saved['standardized'], saved['mean'], saved['scale']
+
+        metrics.count('feature_cache_misses')
+        import headline_index
+        game_ids, X = self.matrix(data_path)
+        mean, scale = headline_index.fit_scaling(X)
+        standardized = (X - mean) / scale
+        os.makedirs(directory, exist_ok = True)
+        self._save(ids_path, np.save, game_ids)
+        self._save(path, lambda npz_file, arrays: np.savez(npz_file, **arrays),
+                   {'standardized' : standardized, 'mean' : mean, 'scale' : scale})
+        self._remove_stale(os.path.join(directory, 'standardized.*.npz'), path)
+        return game_ids, standardized, mean, scale
@@ -12,17 +12,23 @@ Created on Mon May 20 18:44:07 2019
     correspond to the components of a feature vector of length k). The weight
     of a Feature object is used when constructing the metric for the KNN model.
     
-    Parameters: Feature(self, name, weight, value_fcn)
+    Parameters: Feature(self, name, weight, value_fcn, vector_fcn = None)
         name = string name of the feature
         weight = int weight given to the feature when defining the model's 
             metric
         value_fcn = function that takes a Game object and returns a real number
             representing the value of the Feature for the given Game
+        vector_fcn = function that takes the columns of many games (as built
+            by game_columns) and returns a NumPy array with the value of the
+            Feature for every one of those games. It must agree exactly with 
+            value_fcn.
     
     Methods:
         .name - returns the 'name' string
         .weight - returns the 'weight' int
         .value_fnc(game) - applies the value_fcn to the Game object 'game'
+        .vector_value(columns) - applies the vector_fcn to the columns of many
+            games at once
     
     Class methods:
         .getinstances - returns the set of all instances of the Feature class. 
@@ -32,19 +38,28 @@ Created on Mon May 20 18:44:07 2019
 '''
 
 import weakref
+import numpy as np
+import metrics
 
 class Feature:
     
     _instances = []
     
-    def __init__(self,name,weight,value_fcn):
+    def __init__(self,name,weight,value_fcn,vector_fcn=None):
         self._instances.append(weakref.ref(self))
         self.name = name
         self.weight = weight
         self.value_fcn = value_fcn
+        self.vector_fcn = vector_fcn
     
     def value(self,game):
         return self.value_fcn(game)
+    
+    def vector_value(self,columns):
+        if self.vector_fcn is None:
+            #fall back to the per-game function
+            return np.array([self.value_fcn(game) for game in column_games(columns)])
+        return self.vector_fcn(columns)
 
     @classmethod
     def getinstances(cls):
@@ -70,18 +85,41 @@ class Feature:
     signed difference between top scorers pt totals
     home team wins in the series
     away team wins in the series  
+    
+    Each value_fcn 'fnc_i' is followed by 'vec_i', which computes the same 
+    value for many games at once from the columns built by game_columns.
 '''
 
+def _winner_minus_loser(columns, stat, index = None):
+    #signed difference between the winner's and the loser's value of a stat
+    home = columns['home_' + stat]
+    away = columns['away_' + stat]
+    if index is not None:
+        home = home[:, index]
+        away = away[:, index]
+    return np.where(columns['home_won'], home - away, away - home)
+
+def _contains(strings, text):
+    #boolean array, True where text is a substring of the string
+    return np.char.find(strings, text) >= 0
+
+
 def fnc_1(game):
     return game.quarters
 
-quarters = Feature('quarters', 10, fnc_1)
+def vec_1(columns):
+    return columns['quarters']
+
+quarters = Feature('quarters', 10, fnc_1, vec_1)
 
 
 def fnc_2(game):
     return abs(game.scores['away'][0] - game.scores['home'][0])
 
-point_difference = Feature('point_difference', 5, fnc_2)
+def vec_2(columns):
+    return np.abs(columns['away_scores'][:, 0] - columns['home_scores'][:, 0])
+
+point_difference = Feature('point_difference', 5, fnc_2, vec_2)
 
 
 def fnc_3(game):
@@ -90,7 +128,10 @@ def fnc_3(game):
     else:
         return game.scores['away'][1] - game.scores['home'][1]
     
-q1_difference = Feature('q1_difference', 2, fnc_3)
+def vec_3(columns):
+    return _winner_minus_loser(columns, 'scores', 1)
+
+q1_difference = Feature('q1_difference', 2, fnc_3, vec_3)
 
 
 def fnc_4(game):
@@ -99,7 +140,10 @@ def fnc_4(game):
     else:
         return game.scores['away'][2] - game.scores['home'][2]
     
-q2_difference = Feature('q2_difference', 2, fnc_4)
+def vec_4(columns):
+    return _winner_minus_loser(columns, 'scores', 2)
+
+q2_difference = Feature('q2_difference', 2, fnc_4, vec_4)
 
 
 def fnc_5(game):
@@ -108,7 +152,10 @@ def fnc_5(game):
     else:
         return game.scores['away'][3] - game.scores['home'][3]
     
-q3_difference = Feature('q3_difference', 3, fnc_5)
+def vec_5(columns):
+    return _winner_minus_loser(columns, 'scores', 3)
+
+q3_difference = Feature('q3_difference', 3, fnc_5, vec_5)
 
 
 def fnc_6(game):
@@ -117,7 +164,10 @@ def fnc_6(game):
     else:
         return game.scores['away'][4] - game.scores['home'][4]
     
-q4_difference = Feature('q4_difference', 4, fnc_6)
+def vec_6(columns):
+    return _winner_minus_loser(columns, 'scores', 4)
+
+q4_difference = Feature('q4_difference', 4, fnc_6, vec_6)
 
 
 def fnc_7(game):
@@ -126,7 +176,10 @@ def fnc_7(game):
     else:
         return 0
 
-win_at_home = Feature('win_at_home', 10, fnc_7)
+def vec_7(columns):
+    return columns['home_won'].astype(int)
+
+win_at_home = Feature('win_at_home', 10, fnc_7, vec_7)
 
 
 def fnc_8(game):
@@ -135,7 +188,10 @@ def fnc_8(game):
     else:
         return game.scores['away'][0]
 
-winner_pts = Feature('winner_pts', 4, fnc_8)
+def vec_8(columns):
+    return np.where(columns['home_won'], columns['home_scores'][:, 0], columns['away_scores'][:, 0])
+
+winner_pts = Feature('winner_pts', 4, fnc_8, vec_8)
 
 
 def fnc_9(game):
@@ -144,19 +200,28 @@ def fnc_9(game):
     else:
         return game.pts['away']['pts'] - game.pts['home']['pts']
 
-pts_leader_difference = Feature('pts_leader_difference', 4, fnc_9)
+def vec_9(columns):
+    return _winner_minus_loser(columns, 'pts_leader')
+
+pts_leader_difference = Feature('pts_leader_difference', 4, fnc_9, vec_9)
 
 
 def fnc_10(game):
     return game.home_wins
 
-home_wins = Feature('home_wins',12, fnc_10)
+def vec_10(columns):
+    return columns['home_wins']
+
+home_wins = Feature('home_wins',12, fnc_10, vec_10)
 
 
 def fnc_11(game):
     return game.away_wins
 
-away_wins = Feature('away_wins',12,fnc_11)
+def vec_11(columns):
+    return columns['away_wins']
+
+away_wins = Feature('away_wins',12,fnc_11, vec_11)
 
 
 def fnc_12(game):
@@ -167,7 +232,13 @@ def fnc_12(game):
     else:
         return 0
 
-conference = Feature('conference',5,fnc_12)
+def vec_12(columns):
+    values = np.zeros(len(columns['round']), dtype = int)
+    values[_contains(columns['round'], 'WEST')] = -1
+    values[_contains(columns['round'], 'EAST')] = 1
+    return values
+
+conference = Feature('conference',5,fnc_12, vec_12)
 
 def fnc_13(game):
     if 'NBA' in game.round:
@@ -179,7 +250,16 @@ def fnc_13(game):
     else:
         return 0
     
-playoff_round = Feature('playoff_round',5,fnc_13)
+def vec_13(columns):
+    #the conditions are applied in the reverse order of fnc_13, so that the
+    #first matching condition in fnc_13 is the one that sticks
+    values = np.zeros(len(columns['round']), dtype = int)
+    values[_contains(columns['round'], 'FINALS')] = 3
+    values[_contains(columns['round'], 'SEMIFINALS')] = 1
+    values[_contains(columns['round'], 'NBA')] = 5
+    return values
+
+playoff_round = Feature('playoff_round',5,fnc_13, vec_13)
 
 
 #maybe include the triple double feature later
@@ -198,6 +278,45 @@ for feature in feature_list:
     weights.append(feature.weight)
 
 
+'''
+    the compiled feature schema. Every feature has a fixed column index: the
+    columns of a feature matrix are in alphabetical order of feature name
+    (feature_names). The schema holds the weights in the same order, and 
+    writes the feature values of a single game straight into a preallocated
+    array, without building a dictionary or any of the batch columns.
+        .names - the feature names, in column order
+        .column - dictionary of the column index of each feature name
+        .weights - float array of the weights, in column order
+        .fill(game, out) - write the feature vector of a game into the float
+            array out (of length len(names)), and return out
+        .row(game) - the feature vector of a game, as a new array
+'''
+
+class FeatureSchema:
+    
+    def __init__(self, features):
+        by_name = {feature.name : feature for feature in features}
+        self.names = sorted(by_name)
+        self.column = {name : j for j, name in enumerate(self.names)}
+        self.weights = np.array([by_name[name].weight for name in self.names], dtype = float)
+        self._columns = [(j, by_name[name].value_fcn) for j, name in enumerate(self.names)]
+    
+    def __len__(self):
+        return len(self.names)
+    
+    def fill(self, game, out):
+        for j, value_fcn in self._columns:
+            out[j] = value_fcn(game)
+        return out
+    
+    def row(self, game):
+        return self.fill(game, np.empty(len(self.names)))
+
+schema = FeatureSchema(feature_list)
+
+feature_names = schema.names
+
+
 '''
     a function that creates a feature vector (as a dictionary) for a given game
 '''
@@ -209,10 +328,95 @@ def assemble_feature_vector(game):
     
     return feature_dictionary
 
+
+'''
+    the batch path. game_columns gathers the data the features need from many
+    games into NumPy arrays, and assemble_feature_matrix evaluates every 
+    feature on all of those games at once. Row i of the feature matrix equals 
+    the feature vector of game i from assemble_feature_vector, with columns 
+    ordered as in feature_names.
+'''
+
+#number of entries of the 'scores' lists used by the features: the total
+#score and the scores of the four quarters
+n_scores = 5
+
+def game_columns(games):
+    '''
+        games - a list of Game objects, or a columnar.ColumnarTable
+        
+        returns a dictionary of NumPy arrays, one entry per game, along
+        with the games themselves (see column_games)
+    '''
+    if hasattr(games, 'column'):
+        return _table_columns(games)
+    
+    columns = {'games' : games}
+    columns['quarters'] = np.array([game.quarters for game in games], dtype = int)
+    columns['home_won'] = np.array([game.winner == 'home' for game in games], dtype = bool)
+    columns['round'] = np.array([game.round for game in games], dtype = str)
+    columns['home_wins'] = np.array([game.home_wins for game in games], dtype = int)
+    columns['away_wins'] = np.array([game.away_wins for game in games], dtype = int)
+    for side in ['home', 'away']:
+        columns[side + '_scores'] = np.array([game.scores[side][:n_scores] for game in games], dtype = int).reshape(-1, n_scores)
+        columns[side + '_pts_leader'] = np.array([game.pts[side]['pts'] for game in games], dtype = int)
+    
+    return columns
+
+def column_games(columns):
+    #the Game objects of columns built by game_columns. For a columnar table
+    #they are only built (as GameViews) when first needed, by a feature with
+    #no vector_fcn.
+    if 'games' not in columns:
+        table = columns['table']
+        columns['games'] = [table.game(game_id) for game_id in table.ids()]
+    return columns['games']
+
+def _table_columns(table):
+    #read the columns straight from a columnar table, without building any
+    #Game objects (see column_games)
+    codes = table.column('round')
+    round_strings = np.array([table.string(code) for code in range(int(codes.max()) + 1)], dtype = str)
+    winners = table.column('winner')
+    
+    columns = {'table' : table}
+    columns['quarters'] = np.asarray(table.column('quarters'), dtype = int)
+    columns['home_won'] = np.array([table.string(code) == 'home' for code in winners], dtype = bool)
+    columns['round'] = round_strings[codes]
+    columns['home_wins'] = np.asarray(table.column('home_wins'), dtype = int)
+    columns['away_wins'] = np.asarray(table.column('away_wins'), dtype = int)
+    for side in ['home', 'away']:
+        columns[side + '_scores'] = np.asarray(table.column(side + '_scores')[:, :n_scores], dtype = int)
+        columns[side + '_pts_leader'] = np.asarray(table.column(side + '_pts_pts'), dtype = int)
+    
+    return columns
+
+def assemble_feature_matrix(games, names = None):
+    '''
+        games - a list of Game objects, a columnar.ColumnarTable, or columns
+            already built by game_columns
+        names - list of the features to compute, by default feature_names
+        
+        returns a 2D NumPy array of floats with one row per game and one 
+        column per feature, in the order of names
+    '''
+    if names is None:
+        names = feature_names
+    with metrics.timer('features'):
+        if isinstance(games, dict):
+            columns = games
+        else:
+            columns = game_columns(games)
+        
+        by_name = {feature.name : feature for feature in feature_list}
+        matrix = np.empty((len(columns['quarters']), len(names)))
+        for j, name in enumerate(names):
+            matrix[:, j] = by_name[name].vector_value(columns)
+    
+    return matrix
+
 def weight(feature_name):
-    for feature in feature_list:
-        if feature.name == feature_name:
-            return feature.weight
+    return schema.weights[schema.column[feature_name]]
 
 
 
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 10:12:44 2026
+
+@author: danie
+"""
+
+'''
+    Write the fixture corpus of game summary pages used by benchmark.py
+    (--pages, by default fixtures/pages): one page per file, named by game ID,
+    for a sample of the games of raw_data.csv spread over every season.
+
+    A page is copied from the page cache written by dataframe_builder.py
+    (--cache) when the cache holds it, so that a run after scraping gives a
+    corpus of real saved ESPN pages. Otherwise the page is rendered from the
+    game's row of raw data: the regions read by the Game class
+    (games.page_regions) carry the game's data in the markup the Game class
+    parses, and sit among the rest of a summary page (head and
+    inline scripts, navigation, scoreboard strip, team stats, news and
+    footer), so that the page has the size and the number of tags of a saved
+    page. A rendered page parses to the game's row of raw data.
+
+    Usage:
+        fixtures/make_pages.py [-n <number of pages>] [--cache <page cache>]
+                               [-o <directory>]
+'''
+
+import argparse
+import html
+import json
+import os
+import random
+import sys
+
+#the project modules are in the parent directory
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_dir)
+
+import games as g
+import game_store
+import page_cache
+
+
+#sections of the global navigation, each with its sub-menu
+nav_sections = ['NFL', 'NBA', 'MLB', 'NHL', 'NCAAF', 'NCAAM', 'Soccer', 'More Sports']
+nav_items = ['Home', 'Scores', 'Schedule', 'Standings', 'Stats', 'Teams', 'Players', 'Odds']
+team_stats = ['FG', 'Field Goal %', '3PT', 'Three Point %', 'FT', 'Free Throw %', 'Rebounds', 'Assists', 'Steals', 'Blocks',
+              'Turnovers', 'Fouls']
+play_types = ['Jump Shot', 'Layup Shot', 'Driving Layup Shot', 'Defensive Rebound', 'Offensive Rebound', 'Personal Foul',
+              'Free Throw 1 of 2', 'Free Throw 2 of 2', 'Bad Pass Turnover', 'Three Point Jumper', 'Dunk', 'Substitution']
+
+
+def sample_ids(store, n):
+    #n game IDs spread evenly over the (date ordered) games of the store
+    ids = sorted(store.ids())
+    step = max(1, len(ids) // n)
+    return ids[::step][:n]
+
+
+def _head(game, rng):
+    e = html.escape
+    title = e(game.names['away']['team'] + ' vs. ' + game.names['home']['team'] + ' - Game Summary - ' + str(game.game_id) + ' - ESPN')
+    parts = ['<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>' + title + '</title>']
+    for name in ['description', 'keywords', 'viewport', 'robots', 'news_keywords', 'apple-itunes-app', 'referrer', 'theme-color']:
+        parts.append('<meta name="' + name + '" content="' + title + '">')
+    for name in ['og:title', 'og:description', 'og:url', 'og:image', 'og:type', 'og:site_name', 'fb:app_id',
+                 'twitter:card', 'twitter:site', 'twitter:title', 'twitter:description', 'twitter:image']:
+        parts.append('<meta property="' + name + '" content="' + title + '">')
+    for i in range(14):
+        parts.append('<link rel="stylesheet" href="https://a.espncdn.com/redesign/0.452.3/css/shell-' + str(i) + '.css">')
+    for i in range(10):
+        parts.append('<script src="https://a.espncdn.com/redesign/0.452.3/js/espn-' + str(i) + '.js"></script>')
+
+    #the inline game package, most of the weight of a real page
+    plays = []
+    score = [0, 0]
+    for i in range(420):
+        side = rng.randrange(2)
+        points = rng.choice([0, 0, 1, 2, 2, 3])
+        score[side] += points
+        plays.append({'id' : str(game.game_id) + str(i).zfill(4), 'period' : 1 + i * game.quarters // 420,
+                      'clock' : str(rng.randrange(12)) + ':' + str(rng.randrange(60)).zfill(2),
+                      'text' : game.names[['away', 'home'][side]]['team'] + ' ' + rng.choice(play_types),
+                      'awayScore' : score[0], 'homeScore' : score[1], 'scoringPlay' : points > 0})
+    parts.append('<script>window.espn = window.espn || {}; espn.gamepackage = espn.gamepackage || {}; '
+                 'espn.gamepackage.gameId = "' + str(game.game_id) + '"; espn.gamepackage.data = '
+                 + json.dumps({'plays' : plays}).replace('</', '<\\/') + ';</script>')
+    parts.append('</head>')
+    return ''.join(parts)
+
+
+def _nav(rng):
+    parts = ['<header id="global-header"><nav id="global-nav"><ul class="first-group">']
+    for section in nav_sections:
+        parts.append('<li class="sports"><a href="/' + section.lower() + '/"><span class="link-text">' + section + '</span></a>'
+                     '<div class="global-nav-mobile-container"><ul>')
+        for item in nav_items:
+            parts.append('<li><a href="/' + section.lower() + '/' + item.lower().replace(' ', '') + '" name="&lpos=subnav+' + item
+                         + '"><span class="link-text">' + item + '</span></a></li>')
+        parts.append('</ul></div></li>')
+    parts.append('</ul></nav></header>')
+
+    #the scoreboard strip of the night's other games
+    parts.append('<section class="scoreboard-strip"><ul>')
+    for i in range(12):
+        parts.append('<li class="scoreboard"><a href="/nba/game?gameId=' + str(rng.randrange(10**8, 10**9)) + '">'
+                     '<span class="team-name">TM' + str(2 * i) + '</span><span class="score">' + str(rng.randrange(80, 130))
+                     + '</span><span class="team-name">TM' + str(2 * i + 1) + '</span><span class="score">'
+                     + str(rng.randrange(80, 130)) + '</span><span class="time">Final</span></a></li>')
+    parts.append('</ul></section>')
+    return ''.join(parts)
+
+
+def _scoreboard(game):
+    e = html.escape
+
+    def team(side):
+        names = game.names[side]
+        return ('<div class="team ' + side + '"><div class="team-container"><div class="team-info"><a class="team-name" href="#">'
+                '<span class="long-name">' + e(names['city']) + '</span> <span class="short-name">' + e(names['team'])
+                + '</span><span class="abbrev" title="' + e(names['city']) + '">' + e(names['abbr']) + '</span></a></div>'
+                '<div class="score-container"><div class="score">' + str(game.scores[side][0]) + '</div></div></div></div>')
+
+    def score_row(side):
+        scores = game.scores[side]
+        return ('<tr><td class="team-name">' + e(game.names[side]['abbr']) + '</td>'
+                + ''.join('<td>' + str(score) + '</td>' for score in scores[1:]) + '<td class="final-score">' + str(scores[0]) + '</td></tr>')
+
+    periods = ''.join('<th>' + str(q) + '</th>' if q <= 4 else '<th>OT' + str(q - 4) + '</th>' for q in range(1, game.quarters + 1))
+    return ('<header class="game-strip game-package ' + game.winner + '-winner"><div class="competitors">'
+            + team('away') + team('home')
+            + '<div class="game-status"><table id="linescore"><thead><tr><th class="team-name"></th>' + periods + '<th>T</th></tr></thead>'
+            + score_row('away') + score_row('home') + '</table></div></div></header>')
+
+
+def _leaders(game):
+    e = html.escape
+    parts = ['<section class="col-b"><article class="game-leaders"><header><h1>Game Leaders</h1></header>']
+    for stat, fields in [('pts', ['pts', 'fg', 'ft']), ('reb', ['reb', 'dreb', 'oreb']), ('ast', ['ast', 'to', 'min'])]:
+        parts.append('<div class="leader-column"><h3>' + stat.upper() + '</h3>')
+        for side in ['away', 'home']:
+            parts.append('<div class="player-name"><span class="long-name">' + e(getattr(game, stat)[side]['leader']) + '</span></div>')
+        for side in ['away', 'home']:
+            parts.append('<dl class="game-leader-details">' + ''.join('<dt>' + field.upper() + '</dt><dd><span class="value">'
+                         + str(getattr(game, stat)[side][field]) + '</span></dd>' for field in fields) + '</dl>')
+        parts.append('</div>')
+    parts.append('</article></section>')
+    return ''.join(parts)
+
+
+def _team_stats(game, rng):
+    e = html.escape
+    parts = ['<section class="col-a"><article class="team-stats-sub-module"><header><h1>Team Stats</h1></header><table class="mod-data">'
+             '<thead><tr><th>Matchup</th><th>' + e(game.names['away']['abbr']) + '</th><th>' + e(game.names['home']['abbr'])
+             + '</th></tr></thead><tbody>']
+    for stat in team_stats:
+        parts.append('<tr class="highlight"><td>' + stat + '</td><td>' + str(rng.randrange(5, 50)) + '</td><td>'
+                     + str(rng.randrange(5, 50)) + '</td></tr>')
+    parts.append('</tbody></table></article></section>')
+    return ''.join(parts)
+
+
+def _story(game, rng):
+    e = html.escape
+    parts = ['<section class="col-c"><article class="story-package"><div class="top-stories__story-header"><h1>'
+             + e(game.headline) + '</h1></div><div class="article-body">']
+    for i in range(8):
+        parts.append('<p>' + e(game.names['home']['city']) + ' and ' + e(game.names['away']['city'])
+                     + ' met in game ' + str(game.n_game) + ' of the series. ' + ' '.join(rng.choice(play_types).lower() for _ in range(30))
+                     + '.</p>')
+    parts.append('</div></article>')
+    #the round is in the line above the box score
+    parts.append('<div class="game-details header">' + e(game.round) + ' - Game ' + str(game.n_game) + '</div>')
+    return ''.join(parts)
+
+
+def _series(game):
+    e = html.escape
+    #one box per game of the series so far, from the current game back to
+    #game 1; each box marks the winner of that game
+    results = ['home'] * game.home_wins + ['away'] * game.away_wins
+    boxes = []
+    for k in range(game.n_game):
+        winner = results[k] if k < len(results) else 'home'
+        game_id = ' data-gameid="' + str(game.game_id) + '"' if k == 0 else ''
+        boxes.append('<div class="cscore cscore--final cscore--' + winner + '-winner"><a class="cscore_link"' + game_id + ' href="#"></a>'
+                     '<div class="cscore_series">Game ' + str(game.n_game - k) + '</div>'
+                     '<span class="cscore_name--abbrev">' + e(game.names['away']['abbr']) + '</span>'
+                     '<span class="cscore_name--abbrev">' + e(game.names['home']['abbr']) + '</span></div>')
+    return '<div class="series-wrap"><div class="carousel">' + ''.join(boxes) + '</div></div>'
+
+
+def _news_and_footer(rng):
+    parts = ['<section class="headlineStack"><h1>NBA News</h1><ul>']
+    for i in range(12):
+        parts.append('<li><a href="/nba/story/_/id/' + str(rng.randrange(10**7, 10**8)) + '" name="&lpos=nba:game:post:news:' + str(i)
+                     + '"><span class="headline">Story ' + str(i) + '</span><span class="timestamp">' + str(rng.randrange(1, 24))
+                     + 'h</span></a></li>')
+    parts.append('</ul></section></section>')
+    parts.append('<footer id="global-footer"><ul>')
+    for section in nav_sections:
+        for item in nav_items[:4]:
+            parts.append('<li><a href="/' + section.lower() + '/' + item.lower() + '">' + section + ' ' + item + '</a></li>')
+    parts.append('</ul></footer></body></html>')
+    return ''.join(parts)
+
+
+def render_page(game):
+    '''
+        the html of a game summary page for a Game, as bytes
+    '''
+    rng = random.Random(game.game_id)
+    body = ('<body class="nba gamepackage"><div id="global-viewport"><div id="pane-main"><div id="custom-nav">'
+            + _scoreboard(game) + '</div><div id="gamepackage-wrap" class="game-summary">'
+            + _team_stats(game, rng) + _leaders(game) + _story(game, rng) + _series(game) + '</div>')
+    return (_head(game, rng) + _nav(rng) + body + _news_and_footer(rng)).encode('utf-8')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--pages', type=int, default=36,
+                        help='number of pages in the corpus (default: 36)')
+
+    parser.add_argument('--cache',
+                        help='page cache written by dataframe_builder.py to copy saved pages from')
+
+    parser.add_argument('-d', '--data', default=os.path.join(project_dir, 'raw_data.csv'),
+                        help='raw data of the games (default: raw_data.csv)')
+
+    parser.add_argument('-o', '--output', default=os.path.join(project_dir, 'fixtures', 'pages'),
+                        help='directory to write the pages to (default: fixtures/pages)')
+
+    args = parser.parse_args()
+
+    cache = page_cache.PageCache(args.cache, offline = True) if args.cache else None
+    store = game_store.load_store(args.data)
+    os.makedirs(args.output, exist_ok = True)
+    n_saved = 0
+    for game_id in sample_ids(store, args.pages):
+        page = None
+        if cache is not None:
+            page = cache.get(g.game_summary_root + str(game_id))
+        n_saved += page is not None
+        if page is None:
+            page = render_page(store.get(game_id))
+        with open(os.path.join(args.output, str(game_id)), 'wb') as page_file:
+            page_file.write(page)
+    print(str(args.pages) + ' pages written to ' + args.output + ' (' + str(n_saved) + ' from the page cache)')
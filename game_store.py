@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 10:02:11 2026
+
+@author: danie
+"""
+
+'''
+    Defines a class 'GameStore'.  A GameStore reads a raw data file (the .csv
+    file written by dataframe_builder.py) exactly once and keeps its rows in
+    memory, keyed by ESPN game ID.  Game objects for historical games are then
+    handed out by ID without touching the file again.
+
+    Stores are shared: load_store(df_path) returns the same GameStore every
+    time it is called with the same path, so knn_model.py,
+    nba_headline_generator.py and any batch jobs all use one copy of the data.
+
+    Parameters: GameStore(df_path)
+        df_path - file path of a .csv file containing raw game data, or of a
+                  columnar table directory written by columnar.py. Columnar
+                  tables are memory-mapped rather than read into memory.
+                  load_store also accepts a dataset partitioned by season
+                  (see dataset.py).
+
+    Methods:
+        .ids() - list of the game IDs in the store, in file order
+        .row(game_id) - dictionary of the raw (undecoded) data for a game
+        .get(game_id) - Game object for the given ID. Game objects are built
+                        the first time they are requested and reused after
+                        that, so they should be treated as read-only.
+        .games() - list of Game objects for every game in the store
+
+    Example:
+        store = load_store('raw_data.csv')
+        game = store.get(230501002)
+        game.headline = 'Pierce, Celtics eliminate Pacers with Game 6 rout'
+'''
+
+import os
+import games as g
+import metrics
+
+
+class GameStore:
+
+    def __init__(self, df_path):
+        self.df_path = df_path
+        self._games = {}
+
+        if os.path.isdir(df_path):
+            import columnar
+            self._table = columnar.ColumnarTable(df_path)
+            self._ids = self._table.ids()
+            return
+
+        import pandas as pd
+        df = pd.read_csv(df_path, index_col = 0)
+
+        #keep each row as a plain dictionary keyed by its integer game ID, so
+        #lookups are a single dictionary access
+        self._table = None
+        self._rows = {}
+        for game_id, game_row in zip(df.index, df.to_dict('records')):
+            self._rows[int(game_id)] = game_row
+        self._ids = list(self._rows)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, game_id):
+        game_id = _clean_id(game_id)
+        if self._table is not None:
+            return game_id in self._table
+        return game_id in self._rows
+
+    def ids(self):
+        return list(self._ids)
+
+    def row(self, game_id):
+        if self._table is not None:
+            return self._table.row(_clean_id(game_id))
+        return self._rows[_clean_id(game_id)]
+
+    def get(self, game_id):
+        game_id = _clean_id(game_id)
+        game = self._games.get(game_id)
+        if game is None:
+            if self._table is not None:
+                game = self._table.game(game_id)
+            else:
+                game = g.Game.from_row(game_id, self._rows[game_id])
+            self._games[game_id] = game
+        return game
+
+    def games(self):
+        return [self.get(game_id) for game_id in self._ids]
+
+
+def _clean_id(game_id):
+    #game IDs may be given as integers or as strings read from an ID file
+    if type(game_id) == str:
+        return int(game_id.strip())
+    return int(game_id)
+
+
+#stores that have already been loaded, keyed by file path
+_stores = {}
+
+def load_store(df_path):
+    '''
+        return the shared GameStore for the file at df_path, reading the file
+        only if it has not been read before. If df_path is a partitioned 
+        dataset (see dataset.py), possibly with a selection of partitions, a
+        dataset.PartitionedStore is returned instead.
+    '''
+    store = _stores.get(df_path)
+    if store is None:
+        import dataset
+        path, selection = dataset.split_path(df_path)
+        if dataset.is_dataset(path):
+            #only the manifest is read here; each partition is loaded as a
+            #GameStore of its own when one of its games is requested
+            store = dataset.Dataset(path).store(selection)
+        else:
+            with metrics.timer('store_load'):
+                store = GameStore(df_path)
+        _stores[df_path] = store
+    return store
@@ -17,6 +17,7 @@ Created on Thu May  9 17:53:10 2019
                   possible.
  
     Attributes:
+        .game_id - integer ESPN game ID
         .headline - string containing the headline of the game
         .winner - string, either 'home' or 'away'
         .names - dictionary containing variants of the home and away team 
@@ -29,11 +30,27 @@ Created on Thu May  9 17:53:10 2019
         .n_game - integer current game in the series
         .home_wins - int current number of wins for the home team in the series
         .away_wins - int current number of wins for the away team in the series
+    
+    A Game keeps its attributes in __slots__ rather than a per-instance 
+    __dict__, so the whole history of games takes little memory. For a game 
+    read from a .csv file, the nested .names, .scores, .pts, .reb and .ast 
+    data is kept as the stored text and is only decoded the first time it is 
+    accessed, with its strings interned so that all games share one copy of 
+    each team name, player name and dictionary key.
         
     Methods:
         .to_dict - collect all attributes as a dictionary in an appropriate 
                    format to pass to a pandas dataframe as a row
     
+    Class methods:
+        .from_html(game_id, html, parser = None) - build a Game from the 
+                   already downloaded html of its game summary page, parsed
+                   with the given BeautifulSoup parser (by default 
+                   html_parser: lxml if it is installed)
+        .from_row(game_id, game_row) - build a Game from a row of raw data (a
+                   dictionary in the format written by .to_dict) without
+                   scraping or reading any files
+    
     Example: game_id = 230501002
         game summary url:  http://www.espn.com/nba/game?gameId=230501002
         
@@ -48,204 +65,343 @@ Created on Thu May  9 17:53:10 2019
 '''
 
 
-from bs4 import BeautifulSoup
-import urllib3
-import pandas as pd
 import ast
+import importlib.util
+import json
+import re
+import sys
+import metrics
+
+#BeautifulSoup and urllib3 are imported the first time a page is parsed or
+#downloaded, so programs that only build Games from stored data (e.g. from
+#raw_data.csv or JSON records) do not pay for importing them
 
-http = urllib3.PoolManager()
+#the connection pool used to download pages; made by _http() when it is first
+#needed
+http = None
 game_summary_root = 'http://www.espn.com/nba/game?gameId='
 
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+#set this to a page_cache.PageCache to read game summary pages from (and save
+#them to) an on-disk cache
+page_cache = None
+
+#the parser BeautifulSoup uses for game summary pages. The C-based lxml parser
+#is faster than Python's built-in 'html.parser', and is used whenever it is 
+#installed. (find_spec checks for lxml without importing it.)
+if importlib.util.find_spec('lxml') is not None:
+    html_parser = 'lxml'
+else:
+    html_parser = 'html.parser'
+
+#the classes of the page regions read by the Game class. Only these regions 
+#are built into a tree when a page is parsed; set this to None to parse the
+#whole page.
+page_regions = ['top-stories__story-header', 'game-details', 'competitors', 'leader-column', 'series-wrap']
+
+
+def make_soup(html, parser = None):
+    #parse the html of a game summary page with the given parser (by default
+    #html_parser), keeping only the page_regions
+    from bs4 import BeautifulSoup, SoupStrainer
+    if page_regions is None:
+        return BeautifulSoup(html, parser or html_parser)
+    #a tag is kept if any of its classes is a region. (Given the list itself,
+    #SoupStrainer would miss tags with more classes, e.g. 'game-details header'.)
+    regions = set(page_regions)
+    in_regions = lambda classes: classes is not None and not regions.isdisjoint(classes.split())
+    return BeautifulSoup(html, parser or html_parser, parse_only = SoupStrainer(class_ = in_regions))
+
+
+def _http():
+    global http
+    if http is None:
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        http = urllib3.PoolManager()
+    return http
+
+def _request(url, headers = None):
+    r = _http().request('GET' , url, headers = headers)
+    metrics.count('http_requests')
+    metrics.count('http_bytes', len(r.data))
+    return r
+
+def fetch_page(game_id):
+    #download the html of the game summary page for the given game ID
+    url = game_summary_root + str(game_id)
+    with metrics.timer('fetch'):
+        if page_cache is not None:
+            return page_cache.fetch(url, _request)
+        return _request(url).data
+
+
+#a quoted string in the repr of nested data, in single or double quotes
+_quoted = re.compile(r"'([^'\\]*)'|" + r'"[^"\\]*"')
+
+def _json_string(match):
+    if match.group(1) is None:
+        return match.group(0)
+    return '"' + match.group(1).replace('"', '\\"') + '"'
+
+def _decode(text):
+    #decode the repr of nested dictionaries and lists, as stored in the .csv
+    #file. Without backslash escapes, the only difference from JSON is the
+    #quoting of strings, so the text is requoted and read by the (much 
+    #faster) JSON decoder. Anything else goes to ast.literal_eval.
+    if '\\' not in text:
+        if '"' not in text:
+            text_json = text.replace("'", '"')
+        else:
+            text_json = _quoted.sub(_json_string, text)
+        try:
+            return json.loads(text_json)
+        except ValueError:
+            pass
+    return ast.literal_eval(text)
+
+
+def _intern(value):
+    #intern the strings in decoded nested data (names and dictionary keys)
+    if type(value) == dict:
+        return {sys.intern(key) : _intern(item) for key, item in value.items()}
+    if type(value) == list:
+        return [_intern(item) for item in value]
+    if type(value) == str:
+        return sys.intern(value)
+    return value
+
+
+def _nested(slot):
+    #a property for nested data kept in 'slot', which is decoded from its
+    #stored text the first time it is read
+    def get(self):
+        value = getattr(self, slot)
+        if type(value) == str:
+            value = _intern(_decode(value))
+            setattr(self, slot, value)
+        return value
+    
+    def set(self, value):
+        setattr(self, slot, value)
+    
+    return property(get, set)
+
 
 class Game:
     
+    __slots__ = ['game_id', 'headline', 'round', 'winner', 'quarters', 'n_game', 'home_wins', 'away_wins',
+                 '_names', '_scores', '_pts', '_reb', '_ast']
+    
+    names = _nested('_names')
+    scores = _nested('_scores')
+    pts = _nested('_pts')
+    reb = _nested('_reb')
+    ast = _nested('_ast')
+    
     def __init__(self,game_id,df_path=None):
         if type(game_id) == str:
             game_id = int(game_id.strip())
+        self.game_id = game_id
         
         if df_path == None:
+            #scrape the game summary page from espn.com
+            self._parse_page(fetch_page(game_id))
             
-            url = game_summary_root + str(game_id)
-            r = http.request('GET' , url)
-            soup = BeautifulSoup(r.data, 'html.parser')
-            
-            '''
-                The headline is pulled from the panel at the top middle, just below
-                the top banner containing the scores.
-            '''
+        else:
+            #the file is read once and shared through a GameStore, so building
+            #many games from the same file does not re-read it every time
+            import game_store
+            game_row = game_store.load_store(df_path).row(game_id)
+            self._load_row(game_row)
     
-            self.headline = soup.select('.top-stories__story-header h1')[0].text
-            
-            
-            '''
-                The playoff round of the current game is mentioned in a line of
-                text above the box score. We pull that round here.
-            '''
-            #find the tag with the relevant text
-            round_tag = soup.select('.game-details')[0]
-            #parse the text and keep only the playoff round
-            self.round = round_tag.text.split(' - ')[0]
-            
-            
-            '''
-                Here we pull data from the top banner on the game summary page. We 
-                find the home team, away team, winner, box score, and whether the 
-                game went to OT.
-            '''
-            
-            #These are the relevant HTML tags, starting with the parent tag for the
-            #top banner.
-            top_banner = soup.select('.competitors')[0]
-            #examine the tags containing the away and home team's data
-            away_tag = top_banner.find_all('div' , attrs={'class': 'team away'})[0]
-            home_tag = top_banner.find_all('div' , attrs={'class': 'team home'})[0]
-            #examine the tag containing the box score
-            score_tag = top_banner.select('.game-status')[0]
-            away_scores_tags = list(score_tag.find_all('tr')[1].children)
-            home_scores_tags = list(score_tag.find_all('tr')[2].children)
-            
-            
-            #who won the game
-            self.winner = top_banner.parent['class'][-1][:4]
-            
-            #get the variations of the home and away team's name and city
-            self.names = { 'away' : {'team' : away_tag.select('.short-name')[0].text,
-                                'city' : away_tag.select('.long-name')[0].text,
-                                'abbr' : away_tag.select('.abbrev')[0].text} ,
-                      'home' : {'team' : home_tag.select('.short-name')[0].text,
-                                 'city' : home_tag.select('.long-name')[0].text,
-                                 'abbr' : home_tag.select('.abbrev')[0].text} }
-            
-            #find the quarterly and total scores
-            number_of_quarters = len(away_scores_tags) - 2
-            
-            #build lists containing the home and away team scores. Total scores at 
-            #index 0, quarterly scores stored at the following indices.
-            away_scores = [int(away_scores_tags[number_of_quarters + 1].text)]
-            for quarter in range(number_of_quarters):
-                away_scores.append(int(away_scores_tags[quarter + 1].text))
-            
-            home_scores = [int(home_scores_tags[number_of_quarters + 1].text)]
-            for quarter in range(number_of_quarters):
-                home_scores.append(int(home_scores_tags[quarter + 1].text))
-            
-            self.scores = { 'away' : away_scores, 'home' : home_scores}
-            
-            self.quarters = number_of_quarters
-            
-            '''
-                Here we collect data from the "Game Leaders" panel appearing on the
-                left.
-            '''
-            
-            #finds game leaders in points, rebounds and assists. There are three 
-            #<div> tags with the class 'leader-column'; one for the game leaders in
-            #each of points, rebounds and assists. The beautifulsoup object 
-            #leader_panel is a list of these three tags in that order. Each of 
-            #these tags contains two tags of class 'long-name', each containing the
-            #full name of either the away or home team's leader in a stat category. 
-            leader_tags = soup.select('.leader-column')
-            
-            #examine the tags containing the leading point scorer stats        
-            away_pts_tags = leader_tags[0].select('.game-leader-details')[0].find_all('dd')
-            home_pts_tags = leader_tags[0].select('.game-leader-details')[1].find_all('dd')
-            
-            self.pts = { 'away' : {'leader' : leader_tags[0].select('.long-name')[0].text,
-                                   'pts' : int(away_pts_tags[0].select('.value')[0].text),
-                                   'fg' : away_pts_tags[1].select('.value')[0].text,
-                                   'ft' : away_pts_tags[2].select('.value')[0].text} ,
-                        'home' : {'leader' : leader_tags[0].select('.long-name')[1].text,
-                                   'pts' : int(home_pts_tags[0].select('.value')[0].text),
-                                   'fg' : home_pts_tags[1].select('.value')[0].text,
-                                   'ft' : home_pts_tags[2].select('.value')[0].text} }
     
-            away_reb_tags = leader_tags[1].select('.game-leader-details')[0].find_all('dd')
-            home_reb_tags = leader_tags[1].select('.game-leader-details')[1].find_all('dd')
-            
-            self.reb = { 'away' : {'leader' : leader_tags[1].select('.long-name')[0].text,
-                                   'reb' : int(away_reb_tags[0].select('.value')[0].text),
-                                   'dreb' : int(away_reb_tags[1].select('.value')[0].text),
-                                   'oreb' : int(away_reb_tags[2].select('.value')[0].text)} ,
-                        'home' : {'leader' : leader_tags[1].select('.long-name')[1].text,
-                                   'reb' : int(home_reb_tags[0].select('.value')[0].text),
-                                   'dreb' : int(home_reb_tags[1].select('.value')[0].text),
-                                   'oreb' : int(home_reb_tags[2].select('.value')[0].text)} }
+    #build a Game from the html of its game summary page, without fetching
+    #anything. This lets pages be downloaded and parsed separately.
+    @classmethod
+    def from_html(cls, game_id, html, parser = None):
+        if type(game_id) == str:
+            game_id = int(game_id.strip())
+        game = cls.__new__(cls)
+        game.game_id = game_id
+        game._parse_page(html, parser)
+        return game
+    
+    
+    #fill in the attributes of the Game by parsing the html of its game summary
+    #page
+    def _parse_page(self, html, parser = None):
+        with metrics.timer('parse'):
+            self._parse_soup(make_soup(html, parser))
+    
+    
+    def _parse_soup(self, soup):
+        game_id = self.game_id
         
-            away_ast_tags = leader_tags[2].select('.game-leader-details')[0].find_all('dd')
-            home_ast_tags = leader_tags[2].select('.game-leader-details')[1].find_all('dd')
-            
-            self.ast = { 'away' : {'leader' : leader_tags[2].select('.long-name')[0].text,
-                                   'ast' : int(away_ast_tags[0].select('.value')[0].text),
-                                   'to' : int(away_ast_tags[1].select('.value')[0].text),
-                                   'min' : int(away_ast_tags[2].select('.value')[0].text)} ,
-                        'home' : {'leader' : leader_tags[2].select('.long-name')[1].text,
-                                   'ast' : int(home_ast_tags[0].select('.value')[0].text),
-                                   'to' : int(home_ast_tags[1].select('.value')[0].text),
-                                   'min' : int(home_ast_tags[2].select('.value')[0].text)} }
-            
-            '''
-                To compute the standings in the playoff series at the time of the 
-                game's conclusion, data from the 'series-wrap' panel appearing on 
-                the right (just below "NBA news") is collected, and the number of 
-                wins in the series is counted for each team.
-                NOTE:
-                The "home_team_win_total" counts the number of wins for the home 
-                team of the current game. It is not the number of times a game in 
-                the series was won by the team hosting the match.
-            '''
-            
-            #examine the parent tag of the 'series-wrap' panel
-            series_wrap_tag = soup.select('.series-wrap')  
-            #find the tag containing the data for the game with the current game_id
-            current_game_tag = series_wrap_tag[0].find_all('a' , attrs={'data-gameid': str(game_id)})[0].parent
-            #find which game in the series the current game is
-            current_game_number = int(current_game_tag.find_all('div', class_='cscore_series')[0].text[-1:])
-            
-            #initialize win total counters
-            home_team_win_total = 0
-            away_team_win_total = 0
-            
-            #count the number of wins for the current home and away teams
-            for i in range(current_game_number):
-                #find the first and second names appearing in the currently 
-                #examined box of the series wrap panel.
-                first_name = current_game_tag.select('.cscore_name--abbrev')[0].text
-                second_name = current_game_tag.select('.cscore_name--abbrev')[1].text
-                #formatting in each box of the series wrap panel either bolds the 
-                #'home' or 'away' team. The variable 'bold_name' is either 'home' 
-                #or 'away', whichever is being bolded.
-                bold_name = current_game_tag['class'][2][8:12]
-            
-                if (first_name == self.names['home']['abbr'] and bold_name == 'away') or (second_name == self.names['home']['abbr'] and bold_name == 'home'):
-                    home_team_win_total += 1
-                else:
-                    away_team_win_total += 1
-                #advance to the next tag, which contains the outcome of the 
-                #previous game
-                if current_game_tag.next_sibling != None:
-                    current_game_tag = current_game_tag.next_sibling
-            
-            self.home_wins = home_team_win_total
-            self.away_wins = away_team_win_total
-            self.n_game = current_game_number
-            
+        '''
+            The headline is pulled from the panel at the top middle, just below
+            the top banner containing the scores.
+        '''
+
+        self.headline = soup.select('.top-stories__story-header h1')[0].text
+        
+        
+        '''
+            The playoff round of the current game is mentioned in a line of
+            text above the box score. We pull that round here.
+        '''
+        #find the tag with the relevant text
+        round_tag = soup.select('.game-details')[0]
+        #parse the text and keep only the playoff round
+        self.round = round_tag.text.split(' - ')[0]
+        
+        
+        '''
+            Here we pull data from the top banner on the game summary page. We 
+            find the home team, away team, winner, box score, and whether the 
+            game went to OT.
+        '''
+        
+        #These are the relevant HTML tags, starting with the parent tag for the
+        #top banner.
+        top_banner = soup.select('.competitors')[0]
+        #examine the tags containing the away and home team's data
+        away_tag = top_banner.find_all('div' , attrs={'class': 'team away'})[0]
+        home_tag = top_banner.find_all('div' , attrs={'class': 'team home'})[0]
+        #examine the tag containing the box score
+        score_tag = top_banner.select('.game-status')[0]
+        away_scores_tags = list(score_tag.find_all('tr')[1].children)
+        home_scores_tags = list(score_tag.find_all('tr')[2].children)
+        
+        
+        #who won the game. The winner is marked in the class of the banner's
+        #parent tag. When only the page regions are parsed that tag is not
+        #kept, and the winner is found from the total scores instead.
+        if top_banner.parent.get('class'):
+            self.winner = top_banner.parent['class'][-1][:4]
+        elif int(home_scores_tags[-1].text) > int(away_scores_tags[-1].text):
+            self.winner = 'home'
         else:
-            df = pd.read_csv(df_path, index_col = 0)
-            game_row = df.loc[game_id]
-            
-            self.headline = game_row['headline']
-            self.round = game_row['round']
-            self.winner = game_row['winner']            
-            self.names = ast.literal_eval(game_row['names'])
-            self.scores = ast.literal_eval(game_row['scores'])
-            self.quarters = game_row['quarters']
-            self.pts = ast.literal_eval(game_row['pts'])
-            self.reb = ast.literal_eval(game_row['reb'])
-            self.ast = ast.literal_eval(game_row['ast'])
-            self.n_game = game_row['n_game']
-            self.home_wins = game_row['home_wins']
-            self.away_wins = game_row['away_wins']
+            self.winner = 'away'
+        
+        #get the variations of the home and away team's name and city
+        self.names = { 'away' : {'team' : away_tag.select('.short-name')[0].text,
+                            'city' : away_tag.select('.long-name')[0].text,
+                            'abbr' : away_tag.select('.abbrev')[0].text} ,
+                  'home' : {'team' : home_tag.select('.short-name')[0].text,
+                             'city' : home_tag.select('.long-name')[0].text,
+                             'abbr' : home_tag.select('.abbrev')[0].text} }
+        
+        #find the quarterly and total scores
+        number_of_quarters = len(away_scores_tags) - 2
+        
+        #build lists containing the home and away team scores. Total scores at 
+        #index 0, quarterly scores stored at the following indices.
+        away_scores = [int(away_scores_tags[number_of_quarters + 1].text)]
+        for quarter in range(number_of_quarters):
+            away_scores.append(int(away_scores_tags[quarter + 1].text))
+        
+        home_scores = [int(home_scores_tags[number_of_quarters + 1].text)]
+        for quarter in range(number_of_quarters):
+            home_scores.append(int(home_scores_tags[quarter + 1].text))
+        
+        self.scores = { 'away' : away_scores, 'home' : home_scores}
+        
+        self.quarters = number_of_quarters
+        
+        '''
+            Here we collect data from the "Game Leaders" panel appearing on the
+            left.
+        '''
+        
+        #finds game leaders in points, rebounds and assists. There are three 
+        #<div> tags with the class 'leader-column'; one for the game leaders in
+        #each of points, rebounds and assists. The beautifulsoup object 
+        #leader_panel is a list of these three tags in that order. Each of 
+        #these tags contains two tags of class 'long-name', each containing the
+        #full name of either the away or home team's leader in a stat category. 
+        leader_tags = soup.select('.leader-column')
+        
+        #each leader column and its two detail panels are selected once, and
+        #each stat is converted as listed
+        self.pts = _leader_stats(leader_tags[0], [('pts', int), ('fg', str), ('ft', str)])
+        self.reb = _leader_stats(leader_tags[1], [('reb', int), ('dreb', int), ('oreb', int)])
+        self.ast = _leader_stats(leader_tags[2], [('ast', int), ('to', int), ('min', int)])
+        
+        '''
+            To compute the standings in the playoff series at the time of the 
+            game's conclusion, data from the 'series-wrap' panel appearing on 
+            the right (just below "NBA news") is collected, and the number of 
+            wins in the series is counted for each team.
+            NOTE:
+            The "home_team_win_total" counts the number of wins for the home 
+            team of the current game. It is not the number of times a game in 
+            the series was won by the team hosting the match.
+        '''
+        
+        #examine the parent tag of the 'series-wrap' panel
+        series_wrap_tag = soup.select('.series-wrap')  
+        #find the tag containing the data for the game with the current game_id
+        current_game_tag = series_wrap_tag[0].find_all('a' , attrs={'data-gameid': str(game_id)})[0].parent
+        #find which game in the series the current game is
+        current_game_number = int(current_game_tag.find_all('div', class_='cscore_series')[0].text[-1:])
+        
+        #initialize win total counters
+        home_team_win_total = 0
+        away_team_win_total = 0
+        
+        #count the number of wins for the current home and away teams
+        for i in range(current_game_number):
+            #find the first and second names appearing in the currently 
+            #examined box of the series wrap panel.
+            name_tags = current_game_tag.select('.cscore_name--abbrev')
+            first_name = name_tags[0].text
+            second_name = name_tags[1].text
+            #formatting in each box of the series wrap panel either bolds the 
+            #'home' or 'away' team. The variable 'bold_name' is either 'home' 
+            #or 'away', whichever is being bolded.
+            bold_name = current_game_tag['class'][2][8:12]
+        
+            if (first_name == self.names['home']['abbr'] and bold_name == 'away') or (second_name == self.names['home']['abbr'] and bold_name == 'home'):
+                home_team_win_total += 1
+            else:
+                away_team_win_total += 1
+            #advance to the next tag, which contains the outcome of the 
+            #previous game
+            if current_game_tag.next_sibling != None:
+                current_game_tag = current_game_tag.next_sibling
+        
+        self.home_wins = home_team_win_total
+        self.away_wins = away_team_win_total
+        self.n_game = current_game_number
+    
+    
+    #build a Game directly from a row of raw data, without scraping or
+    #reading any files
+    @classmethod
+    def from_row(cls, game_id, game_row):
+        game = cls.__new__(cls)
+        game.game_id = game_id
+        game._load_row(game_row)
+        return game
+    
+    
+    #fill in the attributes of the Game from a row of raw data, as written by
+    #the to_dict method. Nested data read from a .csv file is stored as repr
+    #strings, which are kept as they are and decoded when first accessed;
+    #rows from a columnar table or JSON records are already decoded.
+    def _load_row(self, game_row):
+        self.headline = game_row['headline']
+        self.round = sys.intern(game_row['round'])
+        self.winner = sys.intern(game_row['winner'])
+        self._names = game_row['names']
+        self._scores = game_row['scores']
+        self.quarters = game_row['quarters']
+        self._pts = game_row['pts']
+        self._reb = game_row['reb']
+        self._ast = game_row['ast']
+        self.n_game = game_row['n_game']
+        self.home_wins = game_row['home_wins']
+        self.away_wins = game_row['away_wins']
     
     
     #method to collect all attributes as a dictionary in an appropriate format
@@ -266,6 +422,21 @@ class Game:
 
 
 
+def _leader_stats(leader_tag, fields):
+    #the stats of the away and home leaders in one column of the "Game 
+    #Leaders" panel. 'fields' lists the name of each stat, in the order they 
+    #appear, along with the function used to convert its text.
+    name_tags = leader_tag.select('.long-name')
+    detail_tags = leader_tag.select('.game-leader-details')
+    stats = {}
+    for i, side in enumerate(['away', 'home']):
+        stat_tags = detail_tags[i].find_all('dd')
+        stats[side] = {'leader' : name_tags[i].text}
+        for j, (field, convert) in enumerate(fields):
+            stats[side][field] = convert(stat_tags[j].select('.value')[0].text)
+    return stats
+
+
 #meant to test the games module if it is run as the main program
 if __name__ == '__main__':
     game_id = '401029410\n'
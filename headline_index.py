@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 20:03:27 2026
+
+@author: danie
+"""
+
+'''
+    The headline model: everything needed to find the nearest historical game
+    of a new game and to write its headline, in a compact on-disk format that
+    needs only NumPy to load and query.
+
+    An index is a directory containing:
+        index.json - the format version, the feature names (in the order of
+            the feature columns), the number of games and the default search
+            algorithm
+        mean.npy, scale.npy - the mean and standard deviation of each feature
+            over the historical games, used to standardize new games
+        weights.npy - the weight of each feature
+        points.npy - float32 matrix of the historical games' standardized
+            features, each multiplied by its weight, one row per game
+        norms.npy - the squared length of each row of points.npy
+        game_ids.npy - the ESPN game ID of each row
+        headlines.npy, headline_offsets.npy - the headline of each row, as
+            one UTF-8 byte blob plus an array of offsets into it
+        templates.json - the compiled headline templates (see templates.py)
+
+    Multiplying the standardized features by their weights makes the plain
+    Euclidean distance between rows equal to the weighted Minkowski (p = 2)
+    distance between the unweighted standardized features.  The arrays are
+    memory-mapped when an index is opened, so opening an index costs almost
+    nothing, and processes that open the same index share its pages.
+
+    Functions:
+        save_index(path, X, weights, game_ids, headlines, headline_templates,
+                   algorithm = 'brute') - fit the scaling of the raw feature
+            matrix X and write an index
+        reweight_index(path, game_ids, standardized, mean, scale, weights) -
+            replace the weights (and weighted points) of an existing index,
+            given the standardized feature matrix of its games
+
+    Classes:
+        HeadlineIndex(path, mmap = True, algorithm = None) - an opened index
+            .transform(X) - scale raw feature vectors like the stored points
+            .scale_in_place(x) - scale one raw feature vector (a float
+                array) in place
+            .kneighbors(Z, n_neighbors = 1) - distances and row numbers of the
+                nearest points to the rows of a scaled matrix Z
+            .kneighbors_one(z, n_neighbors = 1) - the same for one scaled
+                vector, without allocating the distances to every point
+            .ids - the game ID of each row
+            .headline(i) - the headline of row i
+            .templates() - the compiled headline templates, keyed by game ID
+
+    The search algorithm is 'brute' (the default: a float32 matrix product
+    with the precomputed row norms, for a block of queries at a time), or
+    'kd_tree' or 'ball_tree', which build a SciKit-Learn tree over the points
+    when the index is opened.
+'''
+
+import json
+import os
+import threading
+import numpy as np
+import features as f
+import metrics
+import templates
+
+
+format_version = 1
+algorithms = ['brute', 'kd_tree', 'ball_tree']
+
+
+def fit_scaling(X):
+    #the mean and standard deviation of each column; a column that never
+    #changes keeps a scale of 1
+    mean = X.mean(axis = 0)
+    scale = X.std(axis = 0)
+    scale[scale == 0] = 1.0
+    return mean, scale
+
+
+def _save(path, array):
+    #write to a temporary file and rename it, so that a process that has the
+    #index open keeps reading the old file
+    temp_path = path + '.' + str(os.getpid()) + '.tmp'
+    with open(temp_path, 'wb') as temp_file:
+        np.save(temp_file, array)
+    os.replace(temp_path, path)
+
+
+def write_points(path, standardized, mean, scale, weights):
+    #write the scaling, the weights and the weighted points of an index
+    weights = np.asarray(weights, dtype = 'float64')
+    points = (standardized * weights).astype('float32')
+    _save(os.path.join(path, 'mean.npy'), mean)
+    _save(os.path.join(path, 'scale.npy'), scale)
+    _save(os.path.join(path, 'weights.npy'), weights)
+    _save(os.path.join(path, 'points.npy'), points)
+    _save(os.path.join(path, 'norms.npy'), (points.astype('float64') ** 2).sum(axis = 1).astype('float32'))
+
+
+def save_index(path, X, weights, game_ids, headlines, headline_templates, algorithm = 'brute'):
+    '''
+        write an index of the historical games to the directory 'path'.
+            X - raw feature matrix, one row per game, columns in the order of
+                features.feature_names
+            weights - the weight of each column
+            game_ids, headlines - the game ID and headline of each row
+            headline_templates - dictionary of compiled templates, keyed by
+                game ID
+            algorithm - the search algorithm used by default
+    '''
+    X = np.asarray(X, dtype = 'float64')
+    mean, scale = fit_scaling(X)
+
+    os.makedirs(path, exist_ok = True)
+    write_points(path, (X - mean) / scale, mean, scale, weights)
+    _save(os.path.join(path, 'game_ids.npy'), np.asarray(game_ids, dtype = 'int64'))
+
+    encoded = [headline.encode('utf-8') for headline in headlines]
+    offsets = np.zeros(len(encoded) + 1, dtype = 'int64')
+    offsets[1:] = np.cumsum([len(text) for text in encoded])
+    _save(os.path.join(path, 'headlines.npy'), np.frombuffer(b''.join(encoded), dtype = 'uint8'))
+    _save(os.path.join(path, 'headline_offsets.npy'), offsets)
+
+    templates.save_templates(headline_templates, templates.templates_path(path))
+
+    with open(os.path.join(path, 'index.json'), 'w') as info_file:
+        json.dump({'version' : format_version,
+                   'n_rows' : len(X),
+                   'feature_names' : f.feature_names,
+                   'algorithm' : algorithm}, info_file, indent = 1)
+
+
+def reweight_index(path, game_ids, standardized, mean, scale, weights):
+    '''
+        replace the weights of the index at 'path', recomputing its points
+        from the standardized feature matrix (and its mean and scale) of the
+        same games, in the same order. The headlines and templates are kept.
+    '''
+    with open(os.path.join(path, 'index.json'), 'r') as info_file:
+        info = json.load(info_file)
+    if info['feature_names'] != f.feature_names or not np.array_equal(np.load(os.path.join(path, 'game_ids.npy')), game_ids):
+        raise ValueError('the index at ' + path + ' was built from different games or features; train it again')
+    write_points(path, standardized, mean, scale, weights)
+
+
+class HeadlineIndex:
+
+    def __init__(self, path, mmap = True, algorithm = None):
+        with metrics.timer('model_load'):
+            self._open(path, mmap, algorithm)
+
+    def _open(self, path, mmap, algorithm):
+        self.path = path
+        with open(os.path.join(path, 'index.json'), 'r') as info_file:
+            self.info = json.load(info_file)
+        if self.info['version'] != format_version:
+            raise ValueError('unsupported headline index version ' + str(self.info['version']) + ' in ' + path)
+        self.feature_names = self.info['feature_names']
+        self.algorithm = algorithm or self.info['algorithm']
+        if self.algorithm not in algorithms:
+            raise ValueError('unknown search algorithm ' + repr(self.algorithm))
+
+        mmap_mode = 'r' if mmap else None
+        self.mean = np.load(os.path.join(path, 'mean.npy'))
+        self.scale = np.load(os.path.join(path, 'scale.npy'))
+        self.weights = np.load(os.path.join(path, 'weights.npy'))
+        self.points = np.load(os.path.join(path, 'points.npy'), mmap_mode = mmap_mode)
+        self.norms = np.load(os.path.join(path, 'norms.npy'), mmap_mode = mmap_mode)
+        self.ids = np.load(os.path.join(path, 'game_ids.npy'), mmap_mode = mmap_mode)
+        self._headlines = np.load(os.path.join(path, 'headlines.npy'), mmap_mode = mmap_mode)
+        self._offsets = np.load(os.path.join(path, 'headline_offsets.npy'), mmap_mode = mmap_mode)
+        self._templates = None
+        self._buffers = threading.local()
+        #plain array views of the memory-mapped points and norms (the same
+        #pages), so the search does not pay for numpy.memmap's bookkeeping
+        #on every operation
+        self._points = np.asarray(self.points)
+        self._points_t = self._points.T
+        self._norms = np.asarray(self.norms)
+
+        self._tree = None
+        if self.algorithm != 'brute':
+            from sklearn import neighbors
+            tree_class = neighbors.KDTree if self.algorithm == 'kd_tree' else neighbors.BallTree
+            self._tree = tree_class(np.asarray(self.points, dtype = 'float64'))
+
+    def __len__(self):
+        return self.info['n_rows']
+
+    def transform(self, X):
+        return (np.asarray(X, dtype = 'float64') - self.mean) / self.scale * self.weights
+
+    def kneighbors(self, Z, n_neighbors = 1, block_size = 1024):
+        '''
+            the distances to, and row numbers of, the n_neighbors nearest
+            points to each row of Z (scaled by .transform), nearest first.
+            Both are arrays with one row per row of Z.
+        '''
+        with metrics.timer('search'):
+            return self._kneighbors(np.atleast_2d(Z), min(n_neighbors, len(self)), block_size)
+
+    def _kneighbors(self, Z, n_neighbors, block_size):
+        if self._tree is not None:
+            return self._tree.query(Z, k = n_neighbors)
+
+        distances = np.empty((len(Z), n_neighbors))
+        indices = np.empty((len(Z), n_neighbors), dtype = 'int64')
+        for start in range(0, len(Z), block_size):
+            rows = Z[start:start + block_size]
+            nearest, block_distances = self._search_block(rows, rows.astype('float32'), n_neighbors)
+            indices[start:start + len(rows)] = nearest
+            distances[start:start + len(rows)] = block_distances
+        return distances, indices
+
+    def _search_block(self, rows, block, n_neighbors, squared = None):
+        #squared distances |z|^2 - 2 z.p + |p|^2, with the |p|^2 of every
+        #point computed when the index was saved. 'block' is rows in float32,
+        #and 'squared' an optional buffer for the distances to every point.
+        squared = np.matmul(block, self._points_t, out = squared)
+        squared *= -2
+        squared += self._norms
+        squared += (block * block).sum(axis = 1)[:, None]
+
+        if n_neighbors == 1:
+            nearest = squared.argmin(axis = 1)[:, None]
+        else:
+            nearest = np.argpartition(squared, n_neighbors - 1, axis = 1)[:, :n_neighbors]
+            nearest.sort(axis = 1)
+            order = np.argsort(np.take_along_axis(squared, nearest, axis = 1), axis = 1, kind = 'stable')
+            nearest = np.take_along_axis(nearest, order, axis = 1)
+
+        #the expansion above loses precision for very close points, so the
+        #distances to the chosen neighbours are computed directly
+        differences = rows[:, None, :] - self._points[nearest]
+        return nearest, np.sqrt((differences ** 2).sum(axis = 2))
+
+    def scale_in_place(self, x):
+        #the same arithmetic as transform, without allocating
+        np.subtract(x, self.mean, out = x)
+        np.divide(x, self.scale, out = x)
+        np.multiply(x, self.weights, out = x)
+        return x
+
+    def kneighbors_one(self, z, n_neighbors = 1):
+        '''
+            the distances to, and row numbers of, the n_neighbors nearest
+            points to a single scaled vector z, nearest first, as two 1D
+            arrays. The same as kneighbors for one row, with the distances to
+            every point computed in a buffer kept for each thread.
+        '''
+        with metrics.timer('search'):
+            n_neighbors = min(n_neighbors, len(self))
+            rows = z[None, :]
+            if self._tree is not None:
+                distances, indices = self._tree.query(rows, k = n_neighbors)
+                return distances[0], indices[0]
+
+            buffers = getattr(self._buffers, 'search', None)
+            if buffers is None:
+                buffers = self._buffers.search = (np.empty((1, len(self.mean)), dtype = 'float32'),
+                                                  np.empty((1, len(self)), dtype = 'float32'))
+            block, squared = buffers
+            block[0] = z
+            nearest, distances = self._search_block(rows, block, n_neighbors, squared)
+            return distances[0], nearest[0]
+
+    def headline(self, i):
+        return self._headlines[self._offsets[i]:self._offsets[i + 1]].tobytes().decode('utf-8')
+
+    def templates(self):
+        #the compiled templates are read the first time they are needed
+        if self._templates is None:
+            path = templates.templates_path(self.path)
+            self._templates = templates.load_templates(path) if os.path.exists(path) else {}
+        return self._templates
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 12:40:52 2026
+
+@author: danie
+"""
+
+'''
+    A long-running headline service.  The headline index (the historical
+    feature data, headlines and compiled templates, see headline_index.py) is
+    opened once when the service starts and stays in memory, so each request
+    only pays for the nearest neighbour search and filling in a template.
+
+    The service speaks plain HTTP/1.1 (with keep-alive) over TCP or over a
+    Unix socket, and requests are handled with asyncio.
+
+    Endpoints:
+        GET /health - returns {"status": "ok", "games": <number of
+                      historical games>, "cache_hits": ..., "cache_misses":
+                      ...}
+        GET /metrics - stage timings and counters (see metrics.py) in the
+                      Prometheus text format. Metrics are collected when the
+                      service is run as a program.
+        POST /headline - the request body is a JSON object holding either
+                      "game_id" - an ESPN game ID. The game is scraped from
+                                  espn.com in a worker thread.
+                      "game" - the game's data, in the format of the
+                               Game.to_dict method (without the single-entry
+                               lists). No scraping is done.
+                      The response is a JSON object with "game_id",
+                      "headline", "template_id", "template_headline" and
+                      "distance" (and "neighbours", if -k is more than 1).
+
+    Usage:
+        headline_server.py [-p <port>] [-s <unix socket path>] [-k <number
+                           of neighbours> --diversity <penalty>]
+                           [--profile <profile path>]
+
+        curl -X POST localhost:8080/headline -d '{"game_id": 401131840}'
+'''
+
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+import games as g
+import knn_model
+import metrics
+import nba_headline_generator as nhg
+import neighbours
+
+
+class HeadlineService:
+
+    '''
+        holds everything needed to generate headlines in memory.
+            knn_path - string - location of the KNN model saved to file
+            raw_data_file_path - string - location of the data file
+            max_scrapers - int - number of games that may be scraped from
+                espn.com at the same time
+            k - int - number of nearest historical games found per request
+            diversity - float or None - if given, the k nearest games are 
+                re-ranked, adding this penalty to the distance of a template
+                for each time it was used in the last 'window' headlines
+    
+        Neighbour lists are kept in an LRU cache, so repeated or 
+        near-identical games skip the search.
+    '''
+
+    def __init__(self, knn_path, raw_data_file_path, max_scrapers = 4, k = 1, diversity = None, window = 50):
+        self.knn_path = knn_path
+        self.raw_data_file_path = raw_data_file_path
+        #open the headline index and read its templates up front, so that 
+        #no request pays for it. The historical games themselves are not 
+        #needed: the index holds their features, headlines and templates.
+        self.model = nhg.load_model(knn_path)
+        self.templates = nhg.load_templates(knn_path)
+        self._scrapers = ThreadPoolExecutor(max_scrapers)
+        self.k = k
+        self.history = None
+        if diversity is not None:
+            self.history = neighbours.TemplateHistory(window, diversity)
+        self.cache = neighbours.NeighbourCache()
+
+    def generate(self, new_game):
+        return nhg.generate_headlines([new_game], self.knn_path, self.raw_data_file_path,
+                                      self.k, self.history, self.cache)[0]
+
+    async def handle_request(self, request):
+        if 'game' in request:
+            new_game = g.Game.from_row(request['game'].get('game_id'), request['game'])
+        elif 'game_id' in request:
+            loop = asyncio.get_running_loop()
+            new_game = await loop.run_in_executor(self._scrapers, g.Game, request['game_id'])
+        else:
+            raise ValueError('request must contain "game" or "game_id"')
+        return self.generate(new_game)
+
+    async def dispatch(self, method, path, body):
+        #returns the HTTP status line and the JSON response (or the response
+        #text, for /metrics)
+        if method == 'GET' and path == '/metrics':
+            return '200 OK', metrics.prometheus_text()
+
+        if method == 'GET' and path == '/health':
+            return '200 OK', {'status' : 'ok',
+                              'games' : len(self.model),
+                              'cache_hits' : self.cache.hits,
+                              'cache_misses' : self.cache.misses}
+
+        if method == 'POST' and path == '/headline':
+            try:
+                request = json.loads(body)
+            except ValueError:
+                return '400 Bad Request', {'error' : 'request body is not valid JSON'}
+            if not isinstance(request, dict):
+                return '400 Bad Request', {'error' : 'request body must be a JSON object'}
+            try:
+                return '200 OK', await self.handle_request(request)
+            except (ValueError, KeyError, TypeError, AttributeError) as error:
+                return '400 Bad Request', {'error' : repr(error)}
+            except Exception as error:
+                #the game page could not be fetched or parsed
+                return '502 Bad Gateway', {'error' : repr(error)}
+
+        return '404 Not Found', {'error' : 'unknown endpoint ' + method + ' ' + path}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, version = request_line.decode('latin-1').split()
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                start = time.perf_counter()
+                status, response = await self.dispatch(method, path, body)
+                metrics.observe('request', time.perf_counter() - start)
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+
+                if isinstance(response, str):
+                    payload = response.encode('utf-8')
+                    content_type = 'text/plain; version=0.0.4'
+                else:
+                    payload = json.dumps(response).encode('utf-8')
+                    content_type = 'application/json'
+                writer.write(('HTTP/1.1 ' + status + '\r\n'
+                              'Content-Type: ' + content_type + '\r\n'
+                              'Content-Length: ' + str(len(payload)) + '\r\n'
+                              'Connection: ' + ('keep-alive' if keep_alive else 'close') + '\r\n'
+                              '\r\n').encode('latin-1') + payload)
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            #malformed request or the client went away
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(service, host = '127.0.0.1', port = 8080, socket_path = None):
+    if socket_path is None:
+        server = await asyncio.start_server(service.handle_connection, host, port)
+    else:
+        server = await asyncio.start_unix_server(service.handle_connection, socket_path)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='address to listen on')
+
+    parser.add_argument('-p', '--port', type=int, default=8080,
+                        help='TCP port to listen on')
+
+    parser.add_argument('-s', '--socket',
+                        help='listen on this Unix socket path instead of a TCP port')
+
+    parser.add_argument('-m', '--model', default=knn_model.knn_path,
+                        help='directory of the trained model (headline index) to use')
+
+    parser.add_argument('-d', '--data', default=knn_model.raw_data_file_path,
+                        help='raw data the model was trained on, read only for games missing from the model: a .csv file, a columnar table, or a dataset partitioned by season, optionally with a selection of partitions such as raw_data:postseason_2010-2018 (default: ' + knn_model.raw_data_file_path + ')')
+
+    parser.add_argument('-k', '--neighbours', type=int, default=1,
+                        help='number of nearest historical games to find for each game')
+
+    parser.add_argument('--diversity', type=float,
+                        help='penalty added to the distance of a template for each of its uses among the last --window headlines (needs -k > 1)')
+
+    parser.add_argument('--window', type=int, default=50,
+                        help='number of recent headlines remembered for --diversity')
+
+    parser.add_argument('--profile',
+                        help='profile the service and write the profile to this file when it stops: folded stacks for flame graphs if the name ends in .folded, otherwise a cProfile dump')
+
+    args = parser.parse_args()
+
+    metrics.enable()
+    if args.profile:
+        import atexit
+        import signal
+        import sys
+        atexit.register(metrics.start_profile(args.profile))
+        #stop cleanly on SIGTERM too, so that the profile is written
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    service = HeadlineService(args.model, args.data,
+                              k = args.neighbours, diversity = args.diversity, window = args.window)
+    asyncio.run(serve(service, args.host, args.port, args.socket))
@@ -5,88 +5,143 @@ Created on Sat May 18 17:56:28 2019
 @author: danie
 """
 
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn import preprocessing
-from sklearn import pipeline
-from sklearn.feature_extraction import DictVectorizer
-from sklearn.externals import joblib
-import pandas as pd
-import games as g
-import features as f
-import dataframe_builder
+import argparse
+import time
+import metrics
 
 
 '''
-    given a list of dictionaries (each list entry storing a dictionary of
-    features for a sample), vectorize the list into a list of feature vectors,
-    and standardize those vectors.  Train a KNN model with K = 1.  The label of
-    each training example is the headline from that game.  The model is saved
-    to a file specified by 'knn_path'.
+    compute the feature vector of every historical game, standardize the
+    vectors and multiply each feature by its weight, and save them as a
+    headline index (see headline_index.py) in the directory 'knn_path'.  The
+    nearest neighbour (K = 1) of a new game in this index, with the plain
+    Euclidean metric, is its nearest historical game under the weighted
+    Minkowski metric.  The index also holds the game ID and headline of each
+    historical game.
+
+    The headline of each game is also compiled into a template (see
+    templates.py) and saved in the index, so that generating a headline only
+    has to fill in the template of the nearest game.
+
+    The feature matrix is kept in an on-disk cache (see feature_cache.py), so
+    only the features whose code changed are recomputed.  After changing only
+    the weights in features.py, run with --reweight to rewrite the weights of
+    the existing index from the cached standardized matrix, without reading
+    the data file at all.
+
+    Other programs import this module for knn_path and raw_data_file_path,
+    so the modules needed for training (NumPy, pandas) are only imported by
+    train().
 '''
 
-knn_path = 'headline_knn.joblib'
+knn_path = 'headline_index'
+raw_data_file_path = 'raw_data.csv'
+feature_cache_path = 'feature_cache'
 
 
-if __name__ == '__main__':
+def train(raw_data_file_path, knn_path = knn_path, algorithm = 'brute', cache_path = feature_cache_path):
 
     '''
-        Here we load the raw game data from a csv file into a pandas dataframe
+        build the headline index of the games in the data file at 
+        raw_data_file_path and save it to the directory knn_path. 'algorithm'
+        is the nearest neighbour search used by default with the index.
+        The feature matrix is read from (and saved to) the feature cache at 
+        cache_path; if cache_path is None every feature is computed.
     '''
     
-    raw_data_file_path = dataframe_builder.raw_data_file_path 
-    raw_data = pd.read_csv(raw_data_file_path, index_col = 0)
-    id_list = raw_data.index
+    import game_store
+    import features as f
+    import templates
+    import headline_index
+    import feature_cache
+    
+    start = time.perf_counter()
     
     '''
-        create the lists X and y for the feature vectors and labels respectively 
-        of the training set
+        Here we load the raw game data from a csv file into a shared GameStore.
+        The file is read once, not once per game.
     '''
     
-    X = []
-    y = []
-    
-    for game_id in id_list:
-        game = g.Game(game_id,df_path = raw_data_file_path)
-    
-        X.append(f.assemble_feature_vector(game))
-        y.append([game.headline, game_id])
-    
+    store = game_store.load_store(raw_data_file_path)
+    id_list = store.ids()
     
     '''
-        train the KNN model with K = 1 and a weighted Minkowski metric
+        create the feature matrix X of the training set. The features of all
+        games are computed at once by the batch path in features.py, and
+        only for the features missing from the feature cache; the columns of
+        X are ordered alphabetically by feature name (f.feature_names).
     '''
     
-    #instatiate the transforms and estimator we will use
-    vectorizer = DictVectorizer()
-    standardizer = preprocessing.StandardScaler()
-    knn = KNeighborsClassifier()
+    historical_games = store.games()
+    if cache_path is None:
+        X = f.assemble_feature_matrix(historical_games)
+    else:
+        _, X = feature_cache.FeatureCache(cache_path).matrix(raw_data_file_path)
     
     '''
-        construct the list of weights to be used for the Minkowski metric. The
-        vectorizer orders the features alphabetically, and we must ensure that the 
-        list of weights matches this ordering. This is done by manually 
-        constructing the list of feature names and sorting it. Then for each 
-        feature name in this sorted list, the corresponding weight is called and 
-        added to the list of weights.
+        the weights to be used for the metric. The compiled feature schema
+        holds them in the order of the columns of X.
     '''
     
-    feature_names = []
-    for feature in f.feature_list:
-        feature_names.append(feature.name)
-    feature_names.sort()
-    
-    weights = []
-    for feature in feature_names:
-        weights.append(f.weight(feature))
+    weights = f.schema.weights
     
+    #save the index, with the headlines and their compiled templates
+    headline_index.save_index(knn_path, X, weights, id_list,
+                              [game.headline for game in historical_games],
+                              templates.compile_templates(historical_games),
+                              algorithm)
+    metrics.observe('fit', time.perf_counter() - start)
+
+
+def reweight(raw_data_file_path, knn_path = knn_path, cache_path = feature_cache_path):
+
+    '''
+        rewrite the weights of the headline index at knn_path with the 
+        current weights in features.py, using the standardized feature 
+        matrix in the feature cache. The data file at raw_data_file_path is
+        only read if the cache is missing some features. The index must have
+        been built from the same data file and features.
+    '''
     
-    #ready the pipeline for the KNN model and train it
-    headline_knn = pipeline.Pipeline([('vectorizer', vectorizer) , ('standardizer' , standardizer) , ('knn', knn)])
+    import features as f
+    import headline_index
+    import feature_cache
     
-    headline_knn.set_params(vectorizer__sparse=False,
-                            knn__n_neighbors=1, 
-                            knn__metric = 'wminkowski',
-                            knn__metric_params = {'w' : weights} ).fit(X,y)
+    game_ids, standardized, mean, scale = feature_cache.FeatureCache(cache_path).standardized(raw_data_file_path)
+    headline_index.reweight_index(knn_path, game_ids, standardized, mean, scale, f.schema.weights)
+
+
+if __name__ == '__main__':
     
-    #save the model to a file 'headline_knn.joblib'
-    joblib.dump(headline_knn,knn_path)
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-a', '--algorithm', choices=['brute', 'kd_tree', 'ball_tree'], default='brute',
+                        help='nearest neighbour search used by default with this model: brute (NumPy only), kd_tree or ball_tree (need SciKit-Learn)')
+
+    parser.add_argument('-d', '--data', default=raw_data_file_path,
+                        help='raw data to train on: a .csv file, a columnar table, or a dataset partitioned by season, optionally with a selection of partitions such as raw_data:postseason_2010-2018 (default: ' + raw_data_file_path + ')')
+
+    parser.add_argument('-o', '--output', default=knn_path,
+                        help='directory to save the model to (default: ' + knn_path + ')')
+
+    parser.add_argument('--reweight', action='store_true',
+                        help='only rewrite the weights of the existing model, from the cached feature matrix')
+
+    parser.add_argument('--feature_cache', default=feature_cache_path,
+                        help='directory of the feature matrix cache (default: ' + feature_cache_path + ')')
+
+    parser.add_argument('--no_feature_cache', action='store_true',
+                        help='compute every feature instead of using the feature matrix cache')
+
+    metrics.add_arguments(parser)
+
+    args = parser.parse_args()
+    metrics.start(args)
+
+    cache_path = None if args.no_feature_cache else args.feature_cache
+
+    if args.reweight:
+        if cache_path is None:
+            parser.error('--reweight needs the feature matrix cache')
+        reweight(args.data, args.output, cache_path)
+    else:
+        train(args.data, args.output, args.algorithm, cache_path)
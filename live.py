@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 00:12:44 2026
+
+@author: danie
+"""
+
+'''
+    Live mode: generates headlines as games finish.  A scoreboard is polled
+    every 'interval' seconds.  Each game that is newly reported as final is
+    scraped (through games.Game.from_html) and its headline is printed as
+    soon as it is ready, as one JSON object per line.
+
+    Every final game gets its own asyncio task, and pages are downloaded and
+    parsed on a pool of threads, so games that finish together are scraped
+    at the same time and one slow page does not hold up the others.  A game
+    page that cannot be fetched or parsed yet (ESPN may post the recap a
+    little after the final buzzer) is tried again every 'retry_interval'
+    seconds until 'timeout' seconds after the game was seen to be final.
+
+    The scoreboard is ESPN's scoreboard API by default.  For tests, or to
+    replay a night, any JSON file or url in the same format can be used
+    instead, e.g. a file holding
+        {"events": [{"id": "401131840", "status": {"type": {"completed": true}}}]}
+    Games are final when their status is 'completed' (or their state is
+    'post').
+
+    Each output line holds the fields returned by
+    nba_headline_generator.generate_headlines ('game_id', 'headline',
+    'template_id', 'template_headline', 'distance'), or an 'error' if the
+    game could not be scraped in time, along with
+        latency - seconds from the poll that first saw the game as final to
+                  the headline being printed (at most 'timeout')
+        attempts - number of times the game page was fetched
+    Since a game may end at any time between two polls, the delay from the
+    end of a game to its headline is at most 'interval' more than this.
+
+    Usage:
+        live.py [--feed <url or JSON file>] [-i <poll interval>]
+                [--timeout <seconds>] [--root <game summary url>] [--once]
+
+    Parameters: LiveHeadlines(feed, knn_path, raw_data_file_path,
+                              root = games.game_summary_root, interval = 30,
+                              timeout = 300, retry_interval = 10,
+                              max_scrapers = 8, emit = None)
+        emit - function called with the output dictionary of each game (by
+               default it is printed as JSON)
+
+    Methods:
+        .run(once = False, new_only = False) - coroutine polling the
+            scoreboard forever, or only once if once is True (then it returns
+            when every final game has been handled). If new_only is True the
+            games that are already final at the first poll are skipped.
+'''
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import games as g
+import knn_model
+import metrics
+import nba_headline_generator as nhg
+import scraper
+
+
+espn_scoreboard_url = 'http://site.api.espn.com/apis/site/v2/sports/basketball/nba/scoreboard'
+
+
+def final_game_ids(scoreboard):
+    #the IDs of the games on a scoreboard that are over
+    ids = []
+    for event in scoreboard.get('events', []):
+        status = event.get('status', {}).get('type', {})
+        if status.get('completed') or status.get('state') == 'post':
+            ids.append(int(event['id']))
+    return ids
+
+
+def _print_json(result):
+    print(json.dumps(result))
+    sys.stdout.flush()
+
+
+class LiveHeadlines:
+
+    def __init__(self, feed, knn_path, raw_data_file_path, root = g.game_summary_root, interval = 30,
+                 timeout = 300, retry_interval = 10, max_scrapers = 8, emit = None):
+        self.feed = feed
+        self.knn_path = knn_path
+        self.raw_data_file_path = raw_data_file_path
+        self.interval = interval
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.emit = emit or _print_json
+        #open the model up front, so that the first headline does not wait
+        #for it
+        nhg.load_templates(knn_path)
+        #pages of games that just finished may still change, so they are not
+        #cached. Failed requests are retried here, until the game's deadline.
+        self.scraper = scraper.Scraper(root = root, max_in_flight = max_scrapers, retries = 1, parse_workers = 0)
+        self._scrapers = ThreadPoolExecutor(max_scrapers)
+        self.seen = set()
+
+    def _read_feed(self):
+        if self.feed.startswith('http://') or self.feed.startswith('https://'):
+            return json.loads(self.scraper.request(self.feed).data)
+        with open(self.feed, 'r') as feed_file:
+            return json.load(feed_file)
+
+    def _scrape(self, game_id):
+        #download and parse a game page, in a worker thread
+        return g.Game.from_html(game_id, self.scraper.fetch_page(game_id))
+
+    async def poll(self):
+        #the IDs of the games that became final since the last poll, and the
+        #time they were seen
+        scoreboard = await asyncio.get_running_loop().run_in_executor(None, self._read_feed)
+        detected_at = time.monotonic()
+        new_ids = [game_id for game_id in final_game_ids(scoreboard) if game_id not in self.seen]
+        self.seen.update(new_ids)
+        return new_ids, detected_at
+
+    async def headline(self, game_id, detected_at):
+        loop = asyncio.get_running_loop()
+        deadline = detected_at + self.timeout
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                new_game = await asyncio.wait_for(loop.run_in_executor(self._scrapers, self._scrape, game_id),
+                                                  deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                result = {'game_id' : game_id, 'error' : 'not scraped within ' + str(self.timeout) + ' s'}
+                break
+            except Exception as error:
+                if time.monotonic() + self.retry_interval >= deadline:
+                    result = {'game_id' : game_id, 'error' : repr(error)}
+                    break
+                await asyncio.sleep(self.retry_interval)
+                continue
+            result = nhg.generate_headlines([new_game], self.knn_path, self.raw_data_file_path)[0]
+            break
+
+        result['latency'] = round(time.monotonic() - detected_at, 3)
+        result['attempts'] = attempts
+        metrics.observe('live_latency', result['latency'])
+        metrics.count('live_failures' if 'error' in result else 'live_headlines')
+        self.emit(result)
+        return result
+
+    async def run(self, once = False, new_only = False):
+        tasks = set()
+        first = True
+        while True:
+            try:
+                new_ids, detected_at = await self.poll()
+            except Exception as error:
+                print('could not read the scoreboard ' + self.feed + ': ' + repr(error), file = sys.stderr)
+                new_ids = []
+            if first and new_only:
+                new_ids = []
+            first = False
+
+            for game_id in new_ids:
+                task = asyncio.create_task(self.headline(game_id, detected_at))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            if once:
+                if tasks:
+                    await asyncio.wait(tasks)
+                return
+            await asyncio.sleep(self.interval)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--feed', default=espn_scoreboard_url,
+                        help='scoreboard to poll: a url or JSON file in the format of the ESPN scoreboard API (default: ESPN)')
+
+    parser.add_argument('-i', '--interval', type=float, default=30,
+                        help='seconds between polls of the scoreboard')
+
+    parser.add_argument('--timeout', type=float, default=300,
+                        help='seconds after a game is seen to be final within which its headline is printed, or an error if it could not be scraped')
+
+    parser.add_argument('--retry_interval', type=float, default=10,
+                        help='seconds between attempts to scrape a game page that is not ready')
+
+    parser.add_argument('-n', '--max_scrapers', type=int, default=8,
+                        help='maximum number of game pages downloaded at once')
+
+    parser.add_argument('--root', default=g.game_summary_root,
+                        help='game summary url up to the game ID, e.g. a local server serving saved pages')
+
+    parser.add_argument('-m', '--model', default=knn_model.knn_path,
+                        help='directory of the trained model (headline index) to use')
+
+    parser.add_argument('-d', '--data', default=knn_model.raw_data_file_path,
+                        help='raw data the model was trained on, read only for games missing from the model: a .csv file, a columnar table, or a dataset partitioned by season, optionally with a selection of partitions such as raw_data:postseason_2010-2018 (default: ' + knn_model.raw_data_file_path + ')')
+
+    parser.add_argument('--once', action='store_true',
+                        help='poll the scoreboard once, print the headlines of its final games and exit')
+
+    parser.add_argument('--new_only', action='store_true',
+                        help='skip the games that are already final when live mode starts')
+
+    metrics.add_arguments(parser)
+
+    args = parser.parse_args()
+    metrics.start(args)
+
+    live = LiveHeadlines(args.feed, args.model, args.data, args.root,
+                         args.interval, args.timeout, args.retry_interval, args.max_scrapers)
+    try:
+        asyncio.run(live.run(args.once, args.new_only))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 21:34:50 2026
+
+@author: danie
+"""
+
+'''
+    Opt-in instrumentation: per-stage timers, event counters, cache hit
+    rates, and profiling.
+
+    Metrics are off by default, and while they are off the timers and
+    counters placed through the code do nothing beyond checking a flag.
+    Call enable() (or pass --metrics to a program) to collect them.
+
+    Stages timed (in seconds):
+        render - filling in a headline template (nba_headline_generator.py)
+        fetch - downloading a game summary page (games.py)
+        http_request - one HTTP request made by a Scraper
+        parse - parsing a game summary page into a Game (in the parsing
+                process; not collected from parse worker processes)
+        store_load - reading a raw data file into a GameStore
+        features - assembling a feature matrix
+        model_load - opening a headline index
+        search - a nearest neighbour search
+        generate - generate_headlines, from Games to finished headlines
+        fit - building a headline index (knn_model.train)
+        request - one request to the headline server
+        live_latency - from a game being seen as final to its headline being
+                       printed (live.py)
+
+    Events counted:
+        http_requests, http_errors, http_bytes - requests made, failed
+            attempts, and bytes of page bodies downloaded
+        page_cache_hits, page_cache_misses, page_cache_revalidations - page
+            cache lookups served from the cache, downloaded, and confirmed
+            unchanged by a conditional request (which are also hits)
+        neighbour_cache_hits, neighbour_cache_misses - neighbour list lookups
+        scrape_ok, scrape_fetch_failed, scrape_parse_failed - scrape outcomes
+        headlines - headlines generated
+        live_headlines, live_failures - games handled by live.py
+
+    Functions:
+        enable(), disable(), reset()
+        timer(stage) - context manager timing a block of code
+        observe(stage, seconds) - record a time measured elsewhere
+        count(event, n = 1) - add to a counter
+        snapshot() - the metrics as a dictionary, including the hit rate of
+            each cache
+        prometheus_text() - the metrics in the Prometheus text format
+        profile(path) - context manager profiling a block of code. If path
+            ends in '.folded' the profile is written as folded stacks (one
+            line per call stack with the microseconds spent in it, the input
+            format of flamegraph.pl and speedscope); otherwise it is written
+            as a cProfile dump, readable with pstats or snakeviz.
+        start_profile(path) - start profiling; returns the function that
+            stops and writes the profile
+        add_arguments(parser), start(args) - the --metrics and --profile
+            options of the command line programs
+
+    Example:
+        metrics.enable()
+        with metrics.timer('parse'):
+            game = Game.from_html(game_id, html)
+        metrics.count('http_bytes', len(html))
+        print(metrics.prometheus_text())
+'''
+
+import collections
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+
+#upper bounds, in seconds, of the histogram buckets of each stage
+buckets = [0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0]
+
+#prefix of the metric names in the Prometheus text format
+prometheus_prefix = 'nba_headlines'
+
+enabled = False
+
+_lock = threading.Lock()
+_counters = collections.Counter()
+_timers = {}
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _timers.clear()
+
+
+class _Timer:
+
+    #count, total, maximum and histogram of the times of one stage
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.bucket_counts = [0] * len(buckets)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        for i, bound in enumerate(buckets):
+            if seconds <= bound:
+                self.bucket_counts[i] += 1
+                break
+
+
+def observe(stage, seconds):
+    if not enabled:
+        return
+    with _lock:
+        stage_timer = _timers.get(stage)
+        if stage_timer is None:
+            stage_timer = _timers[stage] = _Timer()
+        stage_timer.add(seconds)
+
+
+def count(event, n = 1):
+    if not enabled:
+        return
+    with _lock:
+        _counters[event] += n
+
+
+class _TimedBlock:
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+_untimed = contextlib.nullcontext()
+
+def timer(stage):
+    if not enabled:
+        return _untimed
+    return _TimedBlock(stage)
+
+
+def snapshot():
+    with _lock:
+        counters = dict(_counters)
+        timers = {stage : {'count' : stage_timer.count,
+                           'total_seconds' : stage_timer.total,
+                           'mean_seconds' : stage_timer.total / stage_timer.count,
+                           'max_seconds' : stage_timer.max}
+                  for stage, stage_timer in _timers.items()}
+
+    hit_rates = {}
+    for event in counters:
+        for suffix in ['_hits', '_misses']:
+            if event.endswith(suffix):
+                cache = event[:-len(suffix)]
+                hits = counters.get(cache + '_hits', 0)
+                hit_rates[cache] = hits / (hits + counters.get(cache + '_misses', 0))
+    return {'counters' : counters, 'timers' : timers, 'hit_rates' : hit_rates}
+
+
+def prometheus_text():
+    with _lock:
+        counters = sorted(_counters.items())
+        timers = sorted((stage, stage_timer.count, stage_timer.total, list(stage_timer.bucket_counts))
+                        for stage, stage_timer in _timers.items())
+
+    lines = ['# HELP ' + prometheus_prefix + '_events_total Number of events of each kind.',
+             '# TYPE ' + prometheus_prefix + '_events_total counter']
+    for event, value in counters:
+        lines.append(prometheus_prefix + '_events_total{event="' + event + '"} ' + repr(value))
+
+    name = prometheus_prefix + '_stage_seconds'
+    lines += ['# HELP ' + name + ' Time spent in each stage.',
+              '# TYPE ' + name + ' histogram']
+    for stage, stage_count, total, bucket_counts in timers:
+        cumulative = 0
+        for bound, bucket_count in zip(buckets, bucket_counts):
+            cumulative += bucket_count
+            lines.append(name + '_bucket{stage="' + stage + '",le="' + repr(bound) + '"} ' + str(cumulative))
+        lines.append(name + '_bucket{stage="' + stage + '",le="+Inf"} ' + str(stage_count))
+        lines.append(name + '_sum{stage="' + stage + '"} ' + repr(total))
+        lines.append(name + '_count{stage="' + stage + '"} ' + str(stage_count))
+    return '\n'.join(lines) + '\n'
+
+
+class _StackTracer:
+
+    #records the time spent in every call stack, for folded stack output
+
+    def __init__(self):
+        self.stack = []
+        self.times = collections.Counter()
+        self.last = time.perf_counter()
+
+    def __call__(self, frame, event, arg):
+        now = time.perf_counter()
+        if self.stack:
+            self.times[tuple(self.stack)] += now - self.last
+        if event == 'call':
+            code = frame.f_code
+            self.stack.append(code.co_name + ' (' + os.path.basename(code.co_filename) + ':' + str(code.co_firstlineno) + ')')
+        elif event == 'c_call':
+            self.stack.append(getattr(arg, '__qualname__', repr(arg)))
+        elif self.stack:
+            #'return', 'c_return' or 'c_exception'
+            self.stack.pop()
+        self.last = time.perf_counter()
+
+    def write(self, path):
+        with open(path, 'w') as folded_file:
+            for stack, seconds in self.times.items():
+                if seconds >= 1e-6:
+                    folded_file.write(';'.join(frame.replace(';', ':') for frame in stack) + ' ' + str(int(seconds * 1e6)) + '\n')
+
+
+def start_profile(path):
+    #start profiling the current thread, and return the function that stops
+    #profiling and writes the profile to path
+    if path.endswith('.folded'):
+        tracer = _StackTracer()
+        sys.setprofile(tracer)
+
+        def stop():
+            sys.setprofile(None)
+            tracer.write(path)
+    else:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+        def stop():
+            profiler.disable()
+            profiler.dump_stats(path)
+    return stop
+
+
+@contextlib.contextmanager
+def profile(path):
+    stop = start_profile(path)
+    try:
+        yield
+    finally:
+        stop()
+
+
+'''
+    command line options shared by the programs
+'''
+
+def add_arguments(parser):
+    parser.add_argument('--metrics', action='store_true',
+                        help='collect stage timings and counters, and print them as JSON to stderr on exit')
+    
+    parser.add_argument('--profile',
+                        help='profile the run and write the profile to this file on exit: folded stacks for flame graphs if the name ends in .folded, otherwise a cProfile dump')
+
+def start(args):
+    #act on the options added by add_arguments. The metrics and the profile
+    #are written when the program exits, including through sys.exit.
+    import atexit
+    if args.metrics:
+        enable()
+        atexit.register(lambda: print(json.dumps(snapshot(), indent = 1), file = sys.stderr))
+    if args.profile:
+        atexit.register(start_profile(args.profile))
@@ -5,12 +5,101 @@ Created on Sat May 18 17:56:28 2019
 @author: danie
 """
 
-from sklearn.externals import joblib
 import games as g
-import features as f
 import knn_model
-import dataframe_builder
 import argparse
+import json
+import sys
+import time
+import metrics
+import templates
+
+#the modules that need NumPy (headline_index, features, neighbours), pandas 
+#(game_store) or urllib3 (scraper) are imported by the functions that use 
+#them, so a short run such as printing the help, or generating headlines for
+#stored game records, only imports what it needs.
+
+
+#models that have already been loaded, keyed by file path
+_models = {}
+
+def load_model(knn_path):
+
+    '''
+        open the headline index saved at 'knn_path' by 'knn_model.py'. The 
+        index is memory-mapped the first time it is needed; after that the 
+        opened index is reused.
+    '''
+    
+    index = _models.get(knn_path)
+    if index is None:
+        import headline_index
+        import features as f
+        index = headline_index.HeadlineIndex(knn_path)
+        if index.feature_names != f.feature_names:
+            raise ValueError('the model at ' + knn_path + ' was trained with different features; run knn_model.py again')
+        _models[knn_path] = index
+    return index
+
+
+def load_templates(knn_path):
+
+    '''
+        the compiled headline templates saved with the model at 'knn_path', 
+        as a dictionary keyed by game ID
+    '''
+    
+    return load_model(knn_path).templates()
+
+
+#neighbour finders, keyed by model file path
+_finders = {}
+
+def load_finder(knn_path):
+    
+    #the NeighbourFinder of the model at knn_path, made once per model
+    finder = _finders.get(knn_path)
+    if finder is None:
+        import neighbours
+        finder = neighbours.NeighbourFinder(load_model(knn_path))
+        _finders[knn_path] = finder
+    return finder
+
+
+def render_headline(historical_id, new_game, knn_path, raw_data_file_path):
+
+    '''
+        generate the headline for new_game from the precompiled template of 
+        the headline of the historical game with ID historical_id. If the 
+        model has no template for the game, the historical game is read from 
+        the data file and its headline is compiled.
+    '''
+    
+    template = load_templates(knn_path).get(historical_id)
+    if template is None:
+        import game_store
+        historical_game = game_store.load_store(raw_data_file_path).get(historical_id)
+        template = templates.compile_template(historical_game)
+    with metrics.timer('render'):
+        return templates.render(template, new_game)
+
+
+def nearest_template(new_game, knn_path):
+
+    '''
+        use the KNN model trained in 'knn_model.py' to find a suitable historical 
+        template for the new headline we will generate.
+            new_game - Game object for which we wish to find a nearest 
+                historical game
+            knn_path - string - location of the KNN model saved to file
+                
+            returns the game ID of the nearest historical game to new_game, 
+            and the distance to it. The headline of that game is in the 
+            model's headline table (load_finder(knn_path).headline), so the 
+            data file is not read.
+    '''
+    
+    return load_finder(knn_path).top_k([new_game], 1)[0][0]
 
 
 def get_nearest_game(new_game, knn_path, raw_data_file_path):
@@ -23,22 +112,107 @@ def get_nearest_game(new_game, knn_path, raw_data_file_path):
             knn_path - string - location of the KNN model saved to file
             raw_data_file_path - string - location of the data file
                 
-            returns a Game object of the nearest historical game to new_game
+            returns a Game object of the nearest historical game to new_game,
+            and its game ID
+        
+        This reads the data file to build the historical Game. Use 
+        nearest_template when only the game ID (or headline) is needed.
     '''
     
-    #assemble a feature vector for the given game
-    X_new = f.assemble_feature_vector(new_game)
+    historical_id, _ = nearest_template(new_game, knn_path)
     
-    #load the KNN model trained by 'knn_model.py'
-    headline_knn = joblib.load(knn_path)
+    #look up the historical game in the shared GameStore and return it. The
+    #data file is only read the first time it is needed.
+    import game_store
+    store = game_store.load_store(raw_data_file_path)
+    return store.get(historical_id) , historical_id
+
+
+def generate_headlines(new_games, knn_path, raw_data_file_path, k = 1, history = None, cache = None):
+
+    '''
+        generate headlines for many games at once. The feature vectors of all
+        the games are stacked into one matrix and their nearest historical
+        games are found with a single search.
+            new_games - list of Game objects
+            knn_path - string - location of the KNN model saved to file
+            raw_data_file_path - string - location of the data file, only 
+                read if the model lacks a template
+            k - int - number of nearest historical games to find per game
+            history - neighbours.TemplateHistory or None - if given, the k 
+                nearest games are re-ranked to avoid templates that were used
+                recently, and the chosen templates are recorded in it
+            cache - neighbours.NeighbourCache or None - cache of neighbour 
+                lists for repeated or near-identical games
+            
+            returns a list with a dictionary for each game, holding the 
+            'game_id', the generated 'headline', the 'template_id' and 
+            'template_headline' of the chosen historical game, and the 
+            'distance' to it. If k > 1, 'neighbours' holds the k nearest 
+            [game ID, distance] pairs, nearest first.
+    '''
     
-    #find the most similar historical game and pull its game ID for future 
-    #reference
-    prediction = headline_knn.predict(X_new)
-    historical_id = int(prediction[0][1])
+    if not new_games:
+        return []
     
-    #load the historical game's data as a Game object and return it    
-    return g.Game(historical_id,df_path = raw_data_file_path) , historical_id
+    start = time.perf_counter()
+    finder = load_finder(knn_path)
+    neighbour_lists = finder.top_k(new_games, k, cache)
+    
+    results = []
+    for new_game, nearest in zip(new_games, neighbour_lists):
+        ranked = nearest if history is None else history.rerank(nearest)
+        historical_id, distance = ranked[0]
+        if history is not None:
+            history.use(historical_id)
+        result = {'game_id' : new_game.game_id,
+                  'headline' : render_headline(historical_id, new_game, knn_path, raw_data_file_path),
+                  'template_id' : historical_id,
+                  'template_headline' : finder.headline(historical_id),
+                  'distance' : distance}
+        if k > 1:
+            result['neighbours'] = [list(neighbour) for neighbour in nearest]
+        results.append(result)
+    metrics.observe('generate', time.perf_counter() - start)
+    metrics.count('headlines', len(results))
+    return results
+
+
+def _read_records(record_file):
+    #Game objects from a file of game records, one JSON object per line, as
+    #written by dataframe_builder.py
+    for line in record_file:
+        if line.strip():
+            record = json.loads(line)
+            yield g.Game.from_row(record['game_id'], record)
+
+
+def _scraped_games(id_file, root = g.game_summary_root, max_in_flight = 8, rate_limit = None, cache = None):
+    #Game objects for the game IDs in a file, scraped concurrently (through
+    #the page cache, if given). Games that could not be scraped are reported 
+    #on stderr, so that stdout only holds headlines.
+    import scraper
+    game_scraper = scraper.Scraper(root = root,
+                                   max_in_flight = max_in_flight,
+                                   rate_limit = rate_limit,
+                                   cache = cache)
+    for result in game_scraper.scrape(id_file):
+        if result.status == 'ok':
+            yield result.game
+        else:
+            print(json.dumps({'game_id' : result.game_id, 'status' : result.status, 'error' : result.error}), file = sys.stderr)
+
+
+def _batches(items, batch_size):
+    #split an iterable into lists of at most batch_size items
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 
 def find_replace(historical_game,new_game):
@@ -51,110 +225,142 @@ def find_replace(historical_game,new_game):
             new_game - Game object for the new game whose headline is to be
                 generated from the template
         
-            returns a string of the historical game's headline after many
-            find/replace actions to update the context to the new game.
+            returns a string of the historical game's headline updated to the 
+            context of the new game.
+        
+        The historical headline is compiled into a template by the 'templates'
+        module and then rendered for the new game. Programs that generate many
+        headlines should use render_headline, which uses the templates compiled
+        once when the model was trained.
     '''
     
-    new_headline = historical_game.headline
+    return templates.render(templates.compile_template(historical_game), new_game)
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-id', '--game_id', type=int,
+                        help='input a valid ESPN game ID for a game you wish to generate a headline for. If no ID specified, the program runs with a hard-coded ID.')
     
-    #first swap out team nicknames with full names
-    nicknames = ['Celts', '6ers', 'Sixers', 'Raps', 'Cavs', 'Wiz', 'Clips', 'Mavs', 'Pels', 'Griz', 'Grizz', 'Nugs', 'Wolves', 'T-Wolves', 'Blazers']
-    full_names = ['Celtics', '76ers', '76ers', 'Raptors', 'Cavaliers', 'Wizards', 'Clippers', 'Mavericks', 'Pelicans', 'Grizzlies', 'Grizzlies', 'Nuggets', 'Timberwolves', 'Timberwolves', 'Trail Blazers']
+    parser.add_argument('-t','--template', action='store_true',
+                        help='print the template headline and game ID along with the new headline')
     
-    for i in range(len(nicknames)):
-        new_headline = new_headline.replace(nicknames[i] , full_names[i])
+    parser.add_argument('-m','--model',
+                        help='directory of the trained model (headline index) to use')
     
-    #need to use a placeholder like 'away_team' or else we might end up with the
-    #same team name for both the home and away teams. Eg consider find/replacing
-    #a historical bucks @ 76ers game with a new raptors @ bucks game.
-    new_headline = new_headline.replace(historical_game.names['away']['team'], 'away_team')
-    new_headline = new_headline.replace(historical_game.names['away']['city'], 'away_city')
-    new_headline = new_headline.replace(historical_game.names['away']['abbr'], 'away_abbr')
+    parser.add_argument('-d','--data', default=knn_model.raw_data_file_path,
+                        help='raw data the model was trained on, read only for games missing from the model: a .csv file, a columnar table, or a dataset partitioned by season, optionally with a selection of partitions such as raw_data:postseason_2010-2018 (default: ' + knn_model.raw_data_file_path + ')')
     
-    new_headline = new_headline.replace(historical_game.names['home']['team'], new_game.names['home']['team'])
-    new_headline = new_headline.replace(historical_game.names['home']['city'], new_game.names['home']['city'])
-    new_headline = new_headline.replace(historical_game.names['home']['abbr'], new_game.names['home']['abbr'])
+    parser.add_argument('-f','--id_file',
+                        help='batch mode: generate headlines for every game ID in this file (one per line, - for stdin)')
     
-    new_headline = new_headline.replace('away_team', new_game.names['away']['team'])
-    new_headline = new_headline.replace('away_city', new_game.names['away']['city'])
-    new_headline = new_headline.replace('away_abbr', new_game.names['away']['abbr'])
+    parser.add_argument('-r','--records',
+                        help='batch mode: generate headlines for the already scraped games in this file (JSON Lines game records as written by dataframe_builder.py, - for stdin)')
     
+    parser.add_argument('-b','--batch_size', type=int, default=64,
+                        help='batch mode: number of games scored together')
     
-    if str(historical_game.scores['home'][0]) + '-' + str(historical_game.scores['away'][0]) in new_headline:
-        new_headline = new_headline.replace(str(historical_game.scores['home'][0]) + '-' + str(historical_game.scores['away'][0]),
-                                            str(new_game.scores['home'][0]) + '-' + str(new_game.scores['away'][0]))
-    elif str(historical_game.scores['away'][0]) + '-' + str(historical_game.scores['home'][0]) in new_headline:
-        new_headline = new_headline.replace(str(historical_game.scores['away'][0]) + '-' + str(historical_game.scores['home'][0]),
-                                            str(new_game.scores['away'][0]) + '-' + str(new_game.scores['home'][0]))
-    else:
-        new_headline = new_headline.replace(' ' + str(historical_game.scores['away'][0]), 'away_score')
-        new_headline = new_headline.replace(' ' + str(historical_game.scores['home'][0]), ' ' + str(new_game.scores['home'][0]))
-        new_headline = new_headline.replace('away_score', ' ' + str(new_game.scores['away'][0]))
+    parser.add_argument('-k','--neighbours', type=int, default=1,
+                        help='batch mode: number of nearest historical games to find for each game')
     
+    parser.add_argument('--diversity', type=float,
+                        help='batch mode: penalty added to the distance of a template for each of its uses among the last --window headlines (needs -k > 1)')
     
-    new_headline = new_headline.replace(' ' + str(historical_game.pts['away']['pts']), 'away_pts_ldr_pts')
-    new_headline = new_headline.replace(' ' + str(historical_game.pts['home']['pts']), ' ' + str(new_game.pts['home']['pts']))
-    new_headline = new_headline.replace('away_pts_ldr_pts', ' ' + str(new_game.pts['away']['pts']))
+    parser.add_argument('--window', type=int, default=50,
+                        help='batch mode: number of recent headlines remembered for --diversity')
     
+    parser.add_argument('-n', '--max_in_flight', type=int, default=8,
+                        help='batch mode: maximum number of page requests in progress at once')
     
-    if historical_game.pts['away']['leader'] in new_headline:
-        new_headline = new_headline.replace(historical_game.pts['away']['leader'], new_game.pts['away']['leader'])
-    elif historical_game.pts['away']['leader'].split(' ')[0] in new_headline:
-        new_headline = new_headline.replace(historical_game.pts['away']['leader'].split(' ')[0], new_game.pts['away']['leader'].split(' ')[-1])
-    elif historical_game.pts['away']['leader'].split(' ')[-1] in new_headline:
-        new_headline = new_headline.replace(historical_game.pts['away']['leader'].split(' ')[-1], new_game.pts['away']['leader'].split(' ')[-1])
+    parser.add_argument('--rate_limit', type=float,
+                        help='maximum number of requests per second to espn.com')
     
-    if historical_game.pts['home']['leader'] in new_headline:
-        new_headline = new_headline.replace(historical_game.pts['home']['leader'], new_game.pts['home']['leader'])
-    elif historical_game.pts['home']['leader'].split(' ')[0] in new_headline:
-        new_headline = new_headline.replace(historical_game.pts['home']['leader'].split(' ')[0], new_game.pts['home']['leader'].split(' ')[-1])
-    elif historical_game.pts['home']['leader'].split(' ')[-1] in new_headline:
-        new_headline = new_headline.replace(historical_game.pts['home']['leader'].split(' ')[-1], new_game.pts['home']['leader'].split(' ')[-1])
-        
-    return new_headline
-
-
-
-if __name__ == '__main__':
-    parser = argparse.ArgumentParser()
-    parser.add_argument('-id', '--game_id', type=int,
-                        help='input a valid ESPN game ID for a game you wish to generate a headline for. If no ID specified, the program runs with a hard-coded ID.')
+    parser.add_argument('--root', default=g.game_summary_root,
+                        help='game summary url up to the game ID, e.g. a local server serving saved pages')
     
-    parser.add_argument('-t','--template', action='store_true',
-                        help='print the template headline and game ID along with the new headline')
+    parser.add_argument('--cache', default='page_cache',
+                        help='directory of the on-disk page cache (default: page_cache)')
     
-    parser.add_argument('-m','--model',
-                        help='filename of the trained KNN model to use')
+    parser.add_argument('--no_cache', action='store_true',
+                        help='always download pages instead of using the page cache')
+    
+    parser.add_argument('--offline', action='store_true',
+                        help='only read pages from the page cache, never from the network')
+    
+    metrics.add_arguments(parser)
     
     args = parser.parse_args()
+    metrics.start(args)
+    
+    if args.model == None:
+        knn_path = knn_model.knn_path
+    else:
+        knn_path = args.model
+    
+    raw_data_file_path = args.data
+    
+    #game pages are read through the same page cache as dataframe_builder.py
+    cache = None
+    if not args.no_cache:
+        import page_cache
+        cache = page_cache.PageCache(args.cache, offline = args.offline)
+    
+    '''
+        batch mode: read many games, and write one JSON object per game to 
+        stdout. Games are scored in batches as soon as they are scraped, so
+        scraping the next games overlaps with scoring the current batch.
+    '''
+    
+    if args.id_file != None or args.records != None:
+        input_path = args.id_file if args.id_file != None else args.records
+        input_file = sys.stdin if input_path == '-' else open(input_path, 'r')
+        
+        import neighbours
+        
+        history = None
+        if args.diversity != None:
+            history = neighbours.TemplateHistory(args.window, args.diversity)
+        neighbour_cache = neighbours.NeighbourCache()
+        
+        with input_file:
+            if args.records != None:
+                new_games = _read_records(input_file)
+            else:
+                new_games = _scraped_games(input_file, args.root, args.max_in_flight, args.rate_limit, cache)
+            
+            for batch in _batches(new_games, args.batch_size):
+                for result in generate_headlines(batch, knn_path, raw_data_file_path, args.neighbours, history, neighbour_cache):
+                    print(json.dumps(result))
+                sys.stdout.flush()
+        
+        sys.exit()
     
     #take the given game ID and create a Game object for it
     if args.game_id == None:
         game_id = 401126819
     else:
         game_id = args.game_id
-        
-    new_game = g.Game(game_id)
     
-    #get the nearest game (as a Game object), according to the saved KNN model
-    #and the saved data
-    if args.model == None:
-        knn_path = knn_model.knn_path
-    else:
-        knn_path = args.model
+    g.game_summary_root = args.root
+    g.page_cache = cache
+    new_game = g.Game(game_id)
+    if cache is not None:
+        #the page parsed, so the game is over and its page will not change
+        cache.mark_final(g.game_summary_root + str(game_id))
     
-    raw_data_file_path = dataframe_builder.raw_data_file_path
-
-    historical_game , historical_id = get_nearest_game(new_game, knn_path, raw_data_file_path)
+    #get the ID of the nearest game, according to the saved KNN model. The
+    #data file is not read.
+    historical_id, distance = nearest_template(new_game, knn_path)
     
-    #create the headline for the new game by find/replacing names in the old
-    #headline
-    new_headline = find_replace(historical_game,new_game)
+    #create the headline for the new game by filling in the compiled template
+    #of the old headline
+    new_headline = render_headline(historical_id, new_game, knn_path, raw_data_file_path)
 
     #Print the generated headline, and print the template headline and game ID 
     #if that option is enabled.
     if args.template:
-        print('\n Template headline: ' + historical_game.headline)
+        print('\n Template headline: ' + load_finder(knn_path).headline(historical_id))
         print(' Template game ID: ' + str(historical_id))
     
     print('\n Generated headline for game with ESPN ID = ' + str(game_id) + ': \n\n   ' + new_headline + '\n')
\ No newline at end of file
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 19:12:05 2026
+
+@author: danie
+"""
+
+'''
+    Top-k nearest historical games for new games, with an optional re-rank
+    that favours templates which have not been used recently, and a cache of
+    neighbour lists.
+
+    Classes:
+        NeighbourCache(max_size = 4096, resolution = 0.01) - a least recently
+            used cache of neighbour lists, keyed by the query's scaled feature
+            vector rounded to a multiple of 'resolution'.  Games whose scaled
+            features agree to within the resolution share a neighbour list, so
+            repeated or near-identical queries skip the search.  .hits and
+            .misses count lookups.
+
+        TemplateHistory(window = 50, penalty = 2.0) - the templates used for
+            the last 'window' headlines.  .rerank(neighbours) adds 'penalty'
+            to the distance of a neighbour for each time its template appears
+            in the window, and sorts the neighbours by the penalized distance.
+            .use(game_id) records that a template was used.
+
+        NeighbourFinder(index) - finds neighbours with a HeadlineIndex (see
+            headline_index.py) written by knn_model.py.
+            .top_k(new_games, k = 5, cache = None) - for each Game in
+            new_games, a list of the k nearest (historical game ID, distance)
+            pairs, nearest first.  Neighbour lists are looked up in and added
+            to 'cache', a NeighbourCache, if one is given.  A single game
+            takes a path of its own: its features are written by the compiled
+            schema (features.schema) into a preallocated row, scaled in
+            place, and searched with HeadlineIndex.kneighbors_one.
+            .headline(game_id) - the headline of a historical game
+
+    Distances are in the units of the model's scaled features (see
+    knn_model.py).  The distance from a typical playoff game to its nearest
+    historical game is around 7, and to its second nearest around 9.
+'''
+
+import threading
+from collections import Counter, OrderedDict, deque
+import numpy as np
+import features as f
+import metrics
+
+
+class NeighbourCache:
+
+    def __init__(self, max_size = 4096, resolution = 0.01):
+        self.max_size = max_size
+        self.resolution = resolution
+        self.hits = 0
+        self.misses = 0
+        self._lists = OrderedDict()
+
+    def key(self, x, k):
+        return (k,) + tuple(np.round(x / self.resolution).astype(np.int64).tolist())
+
+    def get(self, key):
+        neighbours = self._lists.get(key)
+        if neighbours is None:
+            self.misses += 1
+            metrics.count('neighbour_cache_misses')
+            return None
+        self.hits += 1
+        metrics.count('neighbour_cache_hits')
+        self._lists.move_to_end(key)
+        return neighbours
+
+    def put(self, key, neighbours):
+        self._lists[key] = neighbours
+        self._lists.move_to_end(key)
+        while len(self._lists) > self.max_size:
+            self._lists.popitem(last = False)
+
+    def __len__(self):
+        return len(self._lists)
+
+
+class TemplateHistory:
+
+    def __init__(self, window = 50, penalty = 2.0):
+        self.penalty = penalty
+        self._recent = deque(maxlen = window)
+        self._counts = Counter()
+
+    def use(self, game_id):
+        if len(self._recent) == self._recent.maxlen:
+            self._counts[self._recent[0]] -= 1
+        self._recent.append(game_id)
+        self._counts[game_id] += 1
+
+    def rerank(self, neighbours):
+        #sorted is stable, so neighbours with equal penalized distances keep
+        #their order
+        return sorted(neighbours, key = lambda neighbour: neighbour[1] + self.penalty * self._counts[neighbour[0]])
+
+
+class NeighbourFinder:
+
+    def __init__(self, index):
+        self.index = index
+        self.ids = np.asarray(index.ids)
+        self._rows = {game_id : i for i, game_id in enumerate(self.ids.tolist())}
+        self._buffers = threading.local()
+
+    def _query_row(self, new_game):
+        #the scaled feature vector of a single game, written into a buffer
+        #kept for each thread. The compiled schema fills it directly from the
+        #Game, and the scaling is applied in place.
+        x = getattr(self._buffers, 'row', None)
+        if x is None:
+            x = self._buffers.row = np.empty((1, len(f.schema)))
+        with metrics.timer('features'):
+            f.schema.fill(new_game, x[0])
+        self.index.scale_in_place(x[0])
+        return x
+
+    def top_k(self, new_games, k = 5, cache = None):
+        if not new_games:
+            return []
+        k = min(k, len(self.ids))
+        if len(new_games) == 1:
+            X_new = self._query_row(new_games[0])
+        else:
+            X_new = self.index.transform(f.assemble_feature_matrix(new_games))
+
+        results = [None] * len(X_new)
+        keys = [None] * len(X_new)
+        todo = []
+        for i, x in enumerate(X_new):
+            if cache is not None:
+                keys[i] = cache.key(x, k)
+                results[i] = cache.get(keys[i])
+            if results[i] is None:
+                todo.append(i)
+
+        #one search for all the games that were not in the cache
+        if todo:
+            if len(X_new) == 1:
+                distances, indices = self.index.kneighbors_one(X_new[0], n_neighbors = k)
+                distances, indices = distances[None], indices[None]
+            else:
+                distances, indices = self.index.kneighbors(X_new[todo], n_neighbors = k)
+            for i, row_distances, row_indices in zip(todo, distances, indices):
+                results[i] = list(zip(self.ids[row_indices].tolist(), row_distances.tolist()))
+                if cache is not None:
+                    cache.put(keys[i], results[i])
+        return results
+
+    def headline(self, game_id):
+        return self.index.headline(self._rows[game_id])
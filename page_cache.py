@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 15:21:36 2026
+
+@author: danie
+"""
+
+'''
+    Defines a class 'PageCache', an on-disk cache of web pages downloaded from
+    espn.com, so that pages only need to be downloaded once.  Re-running a
+    build after a change to the parsing code in games.py then needs no
+    network access at all.
+
+    The cache is a directory with two parts:
+        index/ - one small JSON file per url, named by the SHA-256 hash of
+                 the url. It records the url, the time the page was fetched,
+                 the ETag and Last-Modified headers sent with it, whether the
+                 page is final, and the hash of the page body.
+        objects/ - the gzip-compressed page bodies, named by the SHA-256 hash
+                 of their contents, so identical pages are stored once.
+    Files are written to a temporary name and then renamed, so the cache can
+    be shared by several threads and processes.
+
+    A page is served from the cache without asking the server if it is
+    'final' (it will never change, e.g. the summary page of a finished game)
+    or if it was fetched less than 'ttl' seconds ago.  Otherwise the server is
+    asked whether the page changed since it was cached (using If-None-Match
+    and If-Modified-Since), and the page is only downloaded again if it did.
+
+    Parameters: PageCache(path = 'page_cache', ttl = 600, offline = False)
+        path - the cache directory
+        ttl - seconds for which a page that is not final is used without
+              revalidating it
+        offline - if True, pages are only ever read from the cache, and a
+                  page that is not in the cache raises a CacheMiss error
+
+    Methods:
+        .fetch(url, request_fcn, final = False) - the body of the page at url.
+            request_fcn(url, headers) is called to make any HTTP request that
+            is needed, and must return a urllib3 response.  Only responses
+            with status 200 are cached.  If final is True the page is stored
+            as final.
+        .mark_final(url) - mark an already cached page as final
+        .get(url) - the cached body of the page, or None
+'''
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import metrics
+
+
+class CacheMiss(Exception):
+    pass
+
+
+class PageCache:
+
+    def __init__(self, path = 'page_cache', ttl = 600, offline = False):
+        self.path = path
+        self.ttl = ttl
+        self.offline = offline
+        os.makedirs(os.path.join(path, 'index'), exist_ok = True)
+        os.makedirs(os.path.join(path, 'objects'), exist_ok = True)
+
+    def _index_path(self, url):
+        return os.path.join(self.path, 'index', hashlib.sha256(url.encode('utf-8')).hexdigest() + '.json')
+
+    def _object_path(self, digest):
+        return os.path.join(self.path, 'objects', digest + '.gz')
+
+    def _write(self, path, data):
+        #write to a temporary file and rename it, so that readers never see
+        #a partly written file
+        temp_path = path + '.' + str(os.getpid()) + '.' + str(threading.get_ident()) + '.tmp'
+        with open(temp_path, 'wb') as temp_file:
+            temp_file.write(data)
+        os.replace(temp_path, path)
+
+    def entry(self, url):
+        #the index entry of a cached url, or None
+        try:
+            with open(self._index_path(url), 'r') as index_file:
+                return json.load(index_file)
+        except (OSError, ValueError):
+            return None
+
+    def _body(self, entry):
+        with open(self._object_path(entry['body']), 'rb') as object_file:
+            return gzip.decompress(object_file.read())
+
+    def _save_entry(self, entry):
+        self._write(self._index_path(entry['url']), json.dumps(entry).encode('utf-8'))
+
+    def get(self, url):
+        entry = self.entry(url)
+        if entry is None:
+            return None
+        return self._body(entry)
+
+    def put(self, url, body, headers = None, final = False):
+        digest = hashlib.sha256(body).hexdigest()
+        if not os.path.exists(self._object_path(digest)):
+            self._write(self._object_path(digest), gzip.compress(body))
+        headers = headers or {}
+        self._save_entry({'url' : url,
+                          'body' : digest,
+                          'fetched_at' : time.time(),
+                          'etag' : headers.get('ETag'),
+                          'last_modified' : headers.get('Last-Modified'),
+                          'final' : final})
+
+    def mark_final(self, url):
+        entry = self.entry(url)
+        if entry is not None and not entry['final']:
+            entry['final'] = True
+            self._save_entry(entry)
+
+    def is_fresh(self, entry):
+        return entry['final'] or time.time() - entry['fetched_at'] < self.ttl
+
+    def fetch(self, url, request_fcn, final = False):
+        entry = self.entry(url)
+        if entry is not None and (self.offline or self.is_fresh(entry)):
+            if final and not entry['final']:
+                self.mark_final(url)
+            metrics.count('page_cache_hits')
+            return self._body(entry)
+        if self.offline:
+            metrics.count('page_cache_misses')
+            raise CacheMiss('page not in cache (offline mode): ' + url)
+
+        #ask the server whether the cached copy is still current
+        headers = {}
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        r = request_fcn(url, headers)
+        if r.status == 304 and entry is not None:
+            entry['fetched_at'] = time.time()
+            entry['final'] = entry['final'] or final
+            self._save_entry(entry)
+            metrics.count('page_cache_hits')
+            metrics.count('page_cache_revalidations')
+            return self._body(entry)
+        metrics.count('page_cache_misses')
+        if r.status == 200:
+            self.put(url, r.data, r.headers, final)
+        return r.data
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 13:52:07 2026
+
+@author: danie
+"""
+
+'''
+    A concurrent scraping pipeline for building Game objects from many ESPN
+    game summary pages.
+
+    Downloading and parsing are done separately.  Pages are downloaded by a
+    pool of threads sharing one urllib3 connection pool, with a bounded number
+    of requests in flight, a per-host rate limit and retries with exponential
+    backoff.  The downloaded html is handed to a pool of processes which parse
+    it into Game objects, so parsing is not serialized behind the GIL and
+    overlaps with downloading.
+
+    Parameters: Scraper(root = games.game_summary_root, max_in_flight = 8,
+                        rate_limit = None, retries = 3, backoff = 0.5,
+                        parse_workers = None, cache = None)
+        root - the game summary url, up to the game ID. Point this at a local
+               server to scrape saved pages.
+        max_in_flight - maximum number of page requests in progress at once
+        rate_limit - maximum number of requests per second to any one host,
+                     or None for no limit
+        retries - number of times a failed request is retried
+        backoff - seconds to wait before the first retry. The wait doubles
+                  after each further failure.
+        parse_workers - number of processes used to parse pages. None uses one
+                        per CPU; 0 parses pages in the calling thread.
+        cache - a page_cache.PageCache to read pages from and save them to,
+                or None. Game pages that parse successfully are marked as
+                final in the cache, so they are never downloaded again.
+
+    Methods:
+        .fetch_url(url, final = False) - download the page at url
+        .fetch_page(game_id) - download the html of a game summary page
+        .scrape(id_list) - generator of ScrapeResult tuples, one for each game
+                           ID, in the order the games finish
+        .crawl(keys, url_fcn, parse_fcn, final_fcn = None) - the same
+                           pipeline for any kind of page (see below)
+
+    A ScrapeResult has the fields
+        game_id - integer game ID
+        game - the Game object, or None if scraping failed
+        status - 'ok', 'fetch-failed' or 'parse-failed'
+        error - string describing the failure, or None
+
+    Example:
+        scraper = Scraper(max_in_flight = 16, rate_limit = 10)
+        for result in scraper.scrape(id_list):
+            if result.status == 'ok':
+                print(result.game.headline)
+'''
+
+import collections
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit
+import games as g
+import metrics
+
+
+ScrapeResult = collections.namedtuple('ScrapeResult', ['game_id', 'game', 'status', 'error'])
+
+
+class FetchError(Exception):
+    pass
+
+
+class RateLimiter:
+
+    '''
+        spaces out requests so that no host receives more than 'rate'
+        requests per second. Safe to share between threads.
+    '''
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host):
+        #reserve the next free slot for this host, then sleep until it comes
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def parse_game(game_id, html):
+    #top-level so that it can be sent to a worker process
+    return g.Game.from_html(game_id, html)
+
+
+class _InlineExecutor:
+
+    #stands in for a process pool when parse_workers = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, fcn, *args):
+        future = Future()
+        try:
+            future.set_result(fcn(*args))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+
+class Scraper:
+
+    def __init__(self, root = g.game_summary_root, max_in_flight = 8, rate_limit = None,
+                 retries = 3, backoff = 0.5, parse_workers = None, cache = None):
+        self.root = root
+        self.cache = cache
+        self.max_in_flight = max_in_flight
+        self.retries = retries
+        self.backoff = backoff
+        self.parse_workers = parse_workers
+        self.limiter = RateLimiter(rate_limit) if rate_limit else None
+        #urllib3 is imported when a Scraper is made, so that importing this 
+        #module (e.g. for clean_ids) stays cheap. Retries are handled in 
+        #request so that they respect the rate limit and back off; urllib3 
+        #itself only follows redirects
+        import urllib3
+        self.http = urllib3.PoolManager(maxsize = max_in_flight,
+                                        retries = urllib3.Retry(total = 5, connect = 0, read = 0, redirect = 5))
+        self._http_error = urllib3.exceptions.HTTPError
+
+    def request(self, url, headers = None):
+        #make a GET request, retrying failures. Returns the response if its
+        #status is 200 (or 304, for a conditional request) and raises a
+        #FetchError otherwise.
+        host = urlsplit(url).netloc
+        for attempt in range(self.retries + 1):
+            if self.limiter is not None:
+                self.limiter.wait(host)
+            try:
+                with metrics.timer('http_request'):
+                    r = self.http.request('GET', url, headers = headers)
+            except self._http_error as error:
+                metrics.count('http_errors')
+                problem = repr(error)
+            else:
+                metrics.count('http_requests')
+                metrics.count('http_bytes', len(r.data))
+                if r.status == 200 or (r.status == 304 and headers):
+                    return r
+                metrics.count('http_errors')
+                problem = 'HTTP status ' + str(r.status)
+                #client errors other than rate limiting will not go away
+                if r.status < 500 and r.status != 429:
+                    break
+            if attempt < self.retries:
+                time.sleep(self.backoff * 2 ** attempt)
+        raise FetchError(problem + ' for ' + url)
+
+    def fetch_url(self, url, final = False):
+        if self.cache is not None:
+            return self.cache.fetch(url, self.request, final)
+        return self.request(url).data
+
+    def game_url(self, game_id):
+        return self.root + str(game_id)
+
+    def fetch_page(self, game_id):
+        return self.fetch_url(self.game_url(game_id))
+
+    def _parse_pool(self):
+        if self.parse_workers == 0:
+            return _InlineExecutor()
+        #multiprocessing is only imported when pages are parsed in processes
+        from concurrent.futures import ProcessPoolExecutor
+        return ProcessPoolExecutor(self.parse_workers)
+
+    def crawl(self, keys, url_fcn, parse_fcn, final_fcn = None):
+        '''
+            the general pipeline behind .scrape. For each key, downloads the
+            page at url_fcn(key) and parses it with parse_fcn(key, html),
+            which must be a top-level function so that it can be sent to a
+            worker process. If final_fcn(key) is True the page is cached as
+            final. Yields a ScrapeResult for each key, with the key in the
+            'game_id' field and the parsed value in the 'game' field.
+        '''
+        keys = iter(keys)
+        fetching = {}
+        parsing = {}
+
+        def fetch(key):
+            return self.fetch_url(url_fcn(key), final_fcn(key) if final_fcn else False)
+
+        with ThreadPoolExecutor(self.max_in_flight) as fetchers, self._parse_pool() as parsers:
+
+            def fill():
+                #keep max_in_flight downloads going, but do not let downloaded
+                #pages pile up if parsing falls behind
+                while len(fetching) < self.max_in_flight and len(parsing) < 2 * self.max_in_flight:
+                    key = next(keys, None)
+                    if key is None:
+                        return
+                    fetching[fetchers.submit(fetch, key)] = key
+
+            fill()
+            while fetching or parsing:
+                done, _ = wait(list(fetching) + list(parsing), return_when = FIRST_COMPLETED)
+                results = []
+                for future in done:
+                    if future in fetching:
+                        key = fetching.pop(future)
+                        if future.exception() is not None:
+                            results.append(ScrapeResult(key, None, 'fetch-failed', str(future.exception())))
+                        else:
+                            parsing[parsers.submit(parse_fcn, key, future.result())] = key
+                    else:
+                        key = parsing.pop(future)
+                        if future.exception() is not None:
+                            results.append(ScrapeResult(key, None, 'parse-failed', repr(future.exception())))
+                        else:
+                            results.append(ScrapeResult(key, future.result(), 'ok', None))
+                fill()
+                for result in results:
+                    metrics.count('scrape_' + result.status.replace('-', '_'))
+                    yield result
+
+    def scrape(self, id_list):
+        for result in self.crawl(clean_ids(id_list), self.game_url, parse_game):
+            #a game page that parses is the page of a finished game, so it
+            #will not change any more
+            if result.status == 'ok' and self.cache is not None:
+                self.cache.mark_final(self.game_url(result.game_id))
+            yield result
+
+
+def _clean_id(game_id):
+    #game IDs may be given as integers or as lines read from an ID file
+    if type(game_id) == str:
+        return int(game_id.strip())
+    return int(game_id)
+
+def clean_ids(id_list):
+    #integer game IDs from a list of IDs or lines of an ID file, skipping
+    #blank lines
+    return [_clean_id(game_id) for game_id in id_list if str(game_id).strip()]
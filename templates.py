@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 17:58:44 2026
+
+@author: danie
+"""
+
+'''
+    Headline templates.  The headline of a historical game is compiled once
+    into a template: a list of segments, each either a piece of literal text
+    or a 'slot' naming a piece of game data (a team name, a score, a points
+    leader, ...).  A headline for a new game is then rendered by filling each
+    slot with the new game's data, in a single pass over the segments, with no
+    searching or replacing.
+
+    The slots are found with the same rules as the find/replace approach in
+    nba_headline_generator.py: team nicknames are expanded to full names,
+    then the historical game's team names, cities and abbreviations, final
+    scores, points leaders' point totals, and points leaders' names are looked
+    for in the headline, in that order.  Each match is replaced by a slot
+    marker rather than by new text, so later rules can never match text that
+    an earlier rule put in.
+
+    A slot is a list:
+        ['names', side, field] - new_game.names[side][field]
+        ['score', side] - new_game.scores[side][0]
+        ['pts', side] - new_game.pts[side]['pts']
+        ['leader', side, 'full'] - the full name of the points leader
+        ['leader', side, 'last'] - the last name of the points leader
+    where side is 'home' or 'away'.
+
+    Functions:
+        compile_template(historical_game) - the template of a game's headline
+        render(template, new_game) - fill in a template for a new game
+        compile_templates(games) - templates for many games, keyed by game ID
+        save_templates(templates, path), load_templates(path) - store
+            templates as a JSON file
+        templates_path(index_path) - the template file of a headline index
+            (see headline_index.py)
+
+    Example:
+        template = compile_template(historical_game)
+        template = [['leader', 'home', 'last'], ' carries ',
+                    ['names', 'home', 'team'], ' past ',
+                    ['names', 'away', 'team'], ' in Game 7']
+        render(template, new_game) = 'Leonard carries Raptors past 76ers in Game 7'
+'''
+
+import json
+import os
+import re
+
+
+#team nicknames used in headlines, and the full names they stand for
+nicknames = {'Celts' : 'Celtics',
+             '6ers' : '76ers',
+             'Sixers' : '76ers',
+             'Raps' : 'Raptors',
+             'Cavs' : 'Cavaliers',
+             'Wiz' : 'Wizards',
+             'Clips' : 'Clippers',
+             'Mavs' : 'Mavericks',
+             'Pels' : 'Pelicans',
+             'Griz' : 'Grizzlies',
+             'Grizz' : 'Grizzlies',
+             'Nugs' : 'Nuggets',
+             'Wolves' : 'Timberwolves',
+             'T-Wolves' : 'Timberwolves',
+             'Blazers' : 'Trail Blazers'}
+
+#a nickname only matches as a whole word, so that e.g. 'Wiz' does not match
+#the start of 'Wizards' and 'Blazers' does not match in 'Trail Blazers'.
+#Longer nicknames are tried first.
+_nickname_pattern = re.compile(r'(?<!\w)(?<!Trail )(' + '|'.join(re.escape(nickname) for nickname in sorted(nicknames, key = len, reverse = True)) + r')(?!\w)')
+
+#slots are marked in the headline with characters from the Unicode private
+#use area while a template is being compiled, so they cannot collide with
+#real text
+_marker_base = 0xE000
+
+
+def expand_nicknames(headline):
+    return _nickname_pattern.sub(lambda match: nicknames[match.group(1)], headline)
+
+
+class _Compiler:
+
+    #collects the slots of one headline while it is being compiled
+
+    def __init__(self, headline):
+        self.text = headline
+        self.slots = []
+
+    def marker(self, slot):
+        self.slots.append(slot)
+        return chr(_marker_base + len(self.slots) - 1)
+
+    def replace(self, old, slot, prefix = ''):
+        #replace every occurrence of prefix + old with prefix + a slot marker
+        if old and prefix + old in self.text:
+            self.text = self.text.replace(prefix + old, prefix + self.marker(slot))
+
+    def segments(self):
+        template = []
+        literal = ''
+        for character in self.text:
+            code = ord(character) - _marker_base
+            if 0 <= code < len(self.slots):
+                if literal:
+                    template.append(literal)
+                    literal = ''
+                template.append(self.slots[code])
+            else:
+                literal += character
+        if literal:
+            template.append(literal)
+        return template
+
+
+def compile_template(historical_game):
+    '''
+        compile the headline of historical_game into a template. Returns a
+        list of segments: strings of literal text, and slots.
+    '''
+    compiler = _Compiler(expand_nicknames(historical_game.headline))
+
+    #team names, cities and abbreviations, away team first
+    for side in ['away', 'home']:
+        for field in ['team', 'city', 'abbr']:
+            compiler.replace(historical_game.names[side][field], ['names', side, field])
+
+    #final scores, either as a 'home-away' or 'away-home' pair or separately
+    home_score = str(historical_game.scores['home'][0])
+    away_score = str(historical_game.scores['away'][0])
+    if home_score + '-' + away_score in compiler.text:
+        compiler.text = compiler.text.replace(home_score + '-' + away_score,
+                                              compiler.marker(['score', 'home']) + '-' + compiler.marker(['score', 'away']))
+    elif away_score + '-' + home_score in compiler.text:
+        compiler.text = compiler.text.replace(away_score + '-' + home_score,
+                                              compiler.marker(['score', 'away']) + '-' + compiler.marker(['score', 'home']))
+    else:
+        compiler.replace(away_score, ['score', 'away'], ' ')
+        compiler.replace(home_score, ['score', 'home'], ' ')
+
+    #points scored by the points leaders
+    for side in ['away', 'home']:
+        compiler.replace(str(historical_game.pts[side]['pts']), ['pts', side], ' ')
+
+    #names of the points leaders. A full name is replaced by the new full
+    #name, and a first or last name by the new last name.
+    for side in ['away', 'home']:
+        leader = historical_game.pts[side]['leader']
+        if leader in compiler.text:
+            compiler.replace(leader, ['leader', side, 'full'])
+        elif leader.split(' ')[0] in compiler.text:
+            compiler.replace(leader.split(' ')[0], ['leader', side, 'last'])
+        elif leader.split(' ')[-1] in compiler.text:
+            compiler.replace(leader.split(' ')[-1], ['leader', side, 'last'])
+
+    return compiler.segments()
+
+
+def _slot_value(slot, new_game):
+    if slot[0] == 'names':
+        return new_game.names[slot[1]][slot[2]]
+    if slot[0] == 'score':
+        return str(new_game.scores[slot[1]][0])
+    if slot[0] == 'pts':
+        return str(new_game.pts[slot[1]]['pts'])
+    leader = new_game.pts[slot[1]]['leader']
+    if slot[2] == 'last':
+        return leader.split(' ')[-1]
+    return leader
+
+
+def render(template, new_game):
+    '''
+        fill in the slots of a template with the data of new_game, returning
+        the new headline
+    '''
+    return ''.join([segment if type(segment) == str else _slot_value(segment, new_game) for segment in template])
+
+
+def compile_templates(games):
+    return {int(game.game_id) : compile_template(game) for game in games}
+
+
+def templates_path(index_path):
+    #templates are saved in the directory of the headline index
+    return os.path.join(index_path, 'templates.json')
+
+
+def save_templates(templates, path):
+    with open(path, 'w', encoding = 'utf-8') as template_file:
+        json.dump({str(game_id) : template for game_id, template in templates.items()}, template_file, ensure_ascii = False)
+
+
+def load_templates(path):
+    with open(path, 'r', encoding = 'utf-8') as template_file:
+        return {int(game_id) : template for game_id, template in json.load(template_file).items()}
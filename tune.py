@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 16:05:33 2026
+
+@author: danie
+"""
+
+'''
+    Search for feature weights.  Each trial is a vector of weights, scored by
+    the leave-one-out evaluation of evaluate.py: every historical game gets
+    the headline of its nearest other game under those weights, and the
+    trial's score is the mean similarity of these headlines to the games'
+    own headlines, less the rate of headlines with unresolved names (see
+    evaluate.score).
+
+    Trials run on a pool of worker processes.  The standardized feature
+    matrix (from the feature cache, see feature_cache.py) is copied once into
+    shared memory, and each worker maps it instead of receiving a copy; only
+    the weight vectors and the scores pass between processes.  Each worker
+    reads the games once, and remembers the outcome of every (game, template)
+    pair it has scored, so later trials mostly reuse earlier work.
+
+    Search:
+        random - each trial draws the weight of every varied feature from
+            'values' if given, else uniformly from the integers 0 to
+            'max_weight'
+        grid - every combination of 'values' for the varied features
+    The varied features are all of them, or those given with --features;
+    the others keep their weights from features.py.  The weights in
+    features.py are always tried first, as the baseline.
+
+    The best weights are written into a copy of the model (--output, by
+    default headline_index_tuned), through headline_index.reweight_index,
+    together with tuning.json holding the best weights, score and summary
+    and the baseline's.  The model must have been built from the same data
+    as the search (see knn_model.py).  To keep the weights for later
+    retraining, copy them into features.py.
+
+    Usage:
+        tune.py [--search random|grid] [-n <trials>] [--features <names>]
+                [--values <weights>] [--max_weight <weight>] [-p <processes>]
+                [-m <model>] [-o <output model>] [-d <raw data>]
+
+    Functions:
+        search(data_path, weight_vectors, processes = None, cache_path =
+               'feature_cache') - generator of the (trial number, weights,
+            summary) of each weight vector, in the order they finish
+        random_trials(n, varied, values = None, max_weight = 15, seed =
+                      None), grid_trials(varied, values) - weight vectors,
+            starting with the weights of features.py
+'''
+
+import argparse
+import itertools
+import json
+import os
+import random
+import shutil
+import sys
+import time
+from multiprocessing import Pool, shared_memory
+import numpy as np
+import features as f
+import metrics
+
+
+#state of each worker process, set by _start_worker
+_worker = {}
+
+
+def _start_worker(memory_name, shape, dtype, data_path, game_ids):
+    import evaluate
+    import game_store
+    memory = shared_memory.SharedMemory(name = memory_name)
+    store = game_store.load_store(data_path)
+    _worker['memory'] = memory
+    _worker['standardized'] = np.ndarray(shape, dtype = dtype, buffer = memory.buf)
+    _worker['evaluation'] = evaluate.LeaveOneOut([store.get(game_id) for game_id in game_ids])
+
+
+def _trial(numbered_weights):
+    import evaluate
+    number, weights = numbered_weights
+    points = _worker['standardized'] * np.asarray(weights)
+    #one thread per process: the processes already use every core
+    distances, indices = evaluate.nearest_others(points, workers = 1)
+    return number, weights, _worker['evaluation'].summary(distances, indices)
+
+
+def baseline_weights():
+    return f.schema.weights.tolist()
+
+
+def random_trials(n, varied, values = None, max_weight = 15, seed = None):
+    generator = random.Random(seed)
+    base = baseline_weights()
+    trials = [base]
+    for _ in range(n - 1):
+        weights = list(base)
+        for name in varied:
+            choice = generator.choice(values) if values else generator.randint(0, max_weight)
+            weights[f.schema.column[name]] = float(choice)
+        trials.append(weights)
+    return trials
+
+
+def grid_trials(varied, values):
+    base = baseline_weights()
+    trials = [base]
+    for combination in itertools.product(values, repeat = len(varied)):
+        weights = list(base)
+        for name, value in zip(varied, combination):
+            weights[f.schema.column[name]] = float(value)
+        trials.append(weights)
+    return trials
+
+
+def search(data_path, weight_vectors, processes = None, cache_path = 'feature_cache'):
+    import feature_cache
+    game_ids, standardized, _, _ = feature_cache.FeatureCache(cache_path).standardized(data_path)
+
+    memory = shared_memory.SharedMemory(create = True, size = standardized.nbytes)
+    try:
+        shared = np.ndarray(standardized.shape, dtype = standardized.dtype, buffer = memory.buf)
+        shared[:] = standardized
+        init_args = (memory.name, standardized.shape, standardized.dtype.str, data_path, game_ids.tolist())
+        with Pool(processes, _start_worker, init_args) as pool:
+            for result in pool.imap_unordered(_trial, enumerate(weight_vectors), chunksize = 4):
+                yield result
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+def write_model(knn_path, output_path, data_path, weights, report, cache_path = 'feature_cache'):
+    #write the weights into a copy of the model at knn_path
+    import feature_cache
+    import headline_index
+    if os.path.abspath(output_path) != os.path.abspath(knn_path):
+        shutil.copytree(knn_path, output_path, dirs_exist_ok = True)
+    game_ids, standardized, mean, scale = feature_cache.FeatureCache(cache_path).standardized(data_path)
+    headline_index.reweight_index(output_path, game_ids, standardized, mean, scale, weights)
+    with open(os.path.join(output_path, 'tuning.json'), 'w') as report_file:
+        json.dump(report, report_file, indent = 1)
+
+
+if __name__ == '__main__':
+    import knn_model
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--search', choices=['random', 'grid'], default='random',
+                        help='random search, or a grid of every combination of --values (default: random)')
+
+    parser.add_argument('-n', '--trials', type=int, default=200,
+                        help='random search: number of weight vectors tried, including the weights of features.py')
+
+    parser.add_argument('--features', nargs='+', choices=f.feature_names, default=f.feature_names,
+                        help='the features whose weights are varied (default: all)')
+
+    parser.add_argument('--values', type=float, nargs='+',
+                        help='the weights tried for each varied feature (needed for grid search)')
+
+    parser.add_argument('--max_weight', type=int, default=15,
+                        help='random search without --values: weights are integers from 0 to this')
+
+    parser.add_argument('--seed', type=int,
+                        help='seed of the random search')
+
+    parser.add_argument('-p', '--processes', type=int,
+                        help='number of worker processes (default: one per CPU)')
+
+    parser.add_argument('-d', '--data', default=knn_model.raw_data_file_path,
+                        help='raw data to evaluate on: a .csv file, a columnar table, or a dataset partitioned by season (default: ' + knn_model.raw_data_file_path + ')')
+
+    parser.add_argument('-m', '--model', default=knn_model.knn_path,
+                        help='the model built from the same data, whose copy gets the best weights (default: ' + knn_model.knn_path + ')')
+
+    parser.add_argument('-o', '--output', default=knn_model.knn_path + '_tuned',
+                        help='directory to write the model with the best weights to (default: ' + knn_model.knn_path + '_tuned)')
+
+    parser.add_argument('--feature_cache', default=knn_model.feature_cache_path,
+                        help='directory of the feature matrix cache (default: ' + knn_model.feature_cache_path + ')')
+
+    metrics.add_arguments(parser)
+
+    args = parser.parse_args()
+    metrics.start(args)
+
+    if args.search == 'grid':
+        if not args.values:
+            parser.error('grid search needs --values')
+        weight_vectors = grid_trials(args.features, args.values)
+    else:
+        weight_vectors = random_trials(args.trials, args.features, args.values, args.max_weight, args.seed)
+
+    start = time.perf_counter()
+    best = baseline = None
+    for number, weights, summary in search(args.data, weight_vectors, args.processes, args.feature_cache):
+        if number == 0:
+            baseline = (weights, summary)
+        if best is None or (summary['score'], -number) > (best[1]['score'], -best[2]):
+            best = (weights, summary, number)
+            print('trial ' + str(number) + ': score ' + str(round(summary['score'], 4)), file = sys.stderr)
+    seconds = time.perf_counter() - start
+
+    report = {'trials' : len(weight_vectors),
+              'seconds' : round(seconds, 3),
+              'best' : {'weights' : dict(zip(f.feature_names, best[0])), 'summary' : best[1]},
+              'baseline' : {'weights' : dict(zip(f.feature_names, baseline[0])), 'summary' : baseline[1]}}
+    write_model(args.model, args.output, args.data, best[0], report, args.feature_cache)
+
+    json.dump(report, sys.stdout, indent = 1)
+    print()